@@ -0,0 +1,195 @@
+import asyncio
+import os
+import socket
+import time
+
+import httpx
+
+# Try relative imports first (for local development), fall back to absolute (for Railway)
+try:
+    from . import mention_store
+    from .rate_limiter import TokenBucket
+except ImportError:
+    import mention_store
+    from rate_limiter import TokenBucket
+
+REDDIT_OAUTH_BASE_URL = "https://oauth.reddit.com"
+USER_AGENT = os.getenv("REDDIT_USER_AGENT", "reddit-sentiment-monitor")
+# How often every connected account's karma and post count are refreshed, in seconds
+ACCOUNT_STATS_INTERVAL_SECONDS = int(os.getenv("ACCOUNT_STATS_INTERVAL_SECONDS", "3600"))
+# Accounts refreshed at the same time, and the request budget of each account's token
+ACCOUNT_STATS_CONCURRENCY = int(os.getenv("ACCOUNT_STATS_CONCURRENCY", "8"))
+ACCOUNT_REQUESTS_PER_MINUTE = int(os.getenv("ACCOUNT_REQUESTS_PER_MINUTE", "60"))
+# Reddit listings stop at 1000 items, i.e. 10 pages of 100
+MAX_SUBMISSION_PAGES = 10
+POLL_TICK_SECONDS = 30
+LEASE_SECONDS = 600
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+_client = None
+_task = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Process-wide HTTP client; requests to oauth.reddit.com reuse its pooled connections"""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            base_url=REDDIT_OAUTH_BASE_URL,
+            headers={"User-Agent": USER_AGENT},
+            limits=httpx.Limits(max_connections=ACCOUNT_STATS_CONCURRENCY * 2, max_keepalive_connections=ACCOUNT_STATS_CONCURRENCY),
+            timeout=httpx.Timeout(15.0),
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def _get(client, limiter, path, access_token, params=None):
+    await limiter.acquire_async()
+    response = await client.get(path, params=params, headers={"Authorization": f"bearer {access_token}"})
+    remaining = response.headers.get("x-ratelimit-remaining")
+    reset = response.headers.get("x-ratelimit-reset")
+    limiter.update_from_headers(float(remaining) if remaining else None, float(reset) if reset else None)
+    response.raise_for_status()
+    return response.json()
+
+
+async def count_submissions(client, limiter, username, access_token):
+    """Submissions by `username`, counted across listing pages (at most 1000, Reddit's listing cap)"""
+    total = 0
+    after = None
+    for _ in range(MAX_SUBMISSION_PAGES):
+        params = {"limit": 100, "raw_json": 1}
+        if after:
+            params["after"] = after
+        page = await _get(client, limiter, f"/user/{username}/submitted", access_token, params)
+        data = page.get("data", {})
+        total += len(data.get("children", []))
+        after = data.get("after")
+        if not after:
+            break
+    return total
+
+
+def _describe(error):
+    if isinstance(error, httpx.HTTPStatusError):
+        # 401 means the short-lived token expired and the account has to reconnect;
+        # 403 on the submitted listing means the token was granted without the history scope
+        return f"Reddit returned {error.response.status_code}"
+    return str(error)
+
+
+async def fetch_account_stats(client, account):
+    """
+    Karma and submission count for one account, using its own token and request budget.
+    If only the submission count fails, the row keeps the fresh karma, has no
+    `total_posts` and carries the failure in `total_posts_error`.
+    """
+    limiter = TokenBucket(ACCOUNT_REQUESTS_PER_MINUTE)
+    user_info = await _get(client, limiter, "/api/v1/me", account["access_token"])
+    row = {
+        "id": account["id"],
+        "username": account["username"],
+        "karma": user_info.get("total_karma", 0),
+    }
+    try:
+        row["total_posts"] = await count_submissions(client, limiter, account["username"], account["access_token"])
+    except (httpx.HTTPError, ValueError) as e:
+        row["total_posts_error"] = _describe(e)
+    return row
+
+
+def update_fields(row):
+    """The refreshed columns of a stats row; a post count that could not be fetched is left as stored"""
+    return {key: row[key] for key in ("karma", "total_posts") if key in row}
+
+
+def upsert_batches(rows):
+    """
+    Rows for bulk upserts of `id` plus the refreshed columns, grouped by column set:
+    a bulk upsert sets every listed column on every row, so rows without a post count
+    go in their own batch rather than overwriting the stored count with null.
+    """
+    batches = {}
+    for row in rows:
+        fields = update_fields(row)
+        batches.setdefault(tuple(fields), []).append({"id": row["id"], **fields})
+    return list(batches.values())
+
+
+async def refresh(accounts):
+    """
+    Fetch stats for all `accounts` ({id, username, access_token}) concurrently.
+    Returns (rows, errors): a row for every account whose karma was fetched, and
+    {account id: error} for accounts that failed or whose post count failed.
+    """
+    client = get_client()
+    semaphore = asyncio.Semaphore(ACCOUNT_STATS_CONCURRENCY)
+    errors = {}
+
+    async def one(account):
+        if not account.get("username") or not account.get("access_token"):
+            errors[account["id"]] = "Missing username or access token"
+            return None
+        async with semaphore:
+            try:
+                row = await fetch_account_stats(client, account)
+            except (httpx.HTTPError, ValueError) as e:
+                errors[account["id"]] = _describe(e)
+                return None
+        if "total_posts_error" in row:
+            errors[account["id"]] = f"Post count not refreshed: {row.pop('total_posts_error')}"
+        return row
+
+    results = await asyncio.gather(*(one(account) for account in accounts))
+    return [row for row in results if row is not None], errors
+
+
+def _claim_run():
+    last_run = float(mention_store.get_meta("account_stats_refreshed_at", "0"))
+    if time.time() - last_run < ACCOUNT_STATS_INTERVAL_SECONDS:
+        return False
+    return mention_store.acquire_lease("account_stats", WORKER_ID, LEASE_SECONDS)
+
+
+async def _run_loop(job):
+    # Store calls are blocking SQLite, so they run in threads, off the event loop
+    while True:
+        try:
+            if await asyncio.to_thread(_claim_run):
+                try:
+                    rows, errors = await job()
+                    await asyncio.to_thread(mention_store.set_meta, "account_stats_refreshed_at", str(time.time()))
+                    print(f"Account stats refreshed for {len(rows)} account(s), {len(errors)} failed")
+                finally:
+                    await asyncio.to_thread(mention_store.release_lease, "account_stats", WORKER_ID)
+        except Exception as e:
+            print(f"Account stats refresh failed: {e}")
+        await asyncio.sleep(POLL_TICK_SECONDS)
+
+
+def start(job):
+    """Run `job` (a coroutine function) every ACCOUNT_STATS_INTERVAL_SECONDS in one worker at a time"""
+    global _task
+    if _task is None and ACCOUNT_STATS_INTERVAL_SECONDS > 0:
+        _task = asyncio.create_task(_run_loop(job))
+    return _task
+
+
+async def stop():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+    await close_client()
@@ -0,0 +1,231 @@
+import json
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+# Try relative imports first (for local development), fall back to absolute (for Railway)
+try:
+    from . import mention_store
+except ImportError:
+    import mention_store
+
+# Every scored mention is kept here for good; unlike `posts` it is never pruned.
+# Rollups are kept per hour and per day for each (subreddit, keyword), with "*" standing
+# for all subreddits or all keywords. Compound scores go into fixed-width bins so
+# percentiles over any range come from summing bin counts.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS mention_archive (
+    id TEXT PRIMARY KEY,
+    day TEXT NOT NULL,
+    subreddit TEXT NOT NULL,
+    created_utc REAL NOT NULL,
+    score REAL NOT NULL,
+    status TEXT,
+    data TEXT NOT NULL,
+    archived_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_mention_archive_day ON mention_archive (day);
+CREATE TABLE IF NOT EXISTS sentiment_rollups (
+    granularity TEXT NOT NULL,
+    bucket_start REAL NOT NULL,
+    subreddit TEXT NOT NULL,
+    keyword TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    score_sum REAL NOT NULL,
+    opportunities INTEGER NOT NULL,
+    PRIMARY KEY (granularity, subreddit, keyword, bucket_start)
+);
+CREATE TABLE IF NOT EXISTS sentiment_rollup_bins (
+    granularity TEXT NOT NULL,
+    bucket_start REAL NOT NULL,
+    subreddit TEXT NOT NULL,
+    keyword TEXT NOT NULL,
+    bin INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (granularity, subreddit, keyword, bucket_start, bin)
+);
+"""
+
+mention_store.register_schema(SCHEMA)
+
+GRANULARITIES = {"hour": 3600, "day": 86400}
+ALL = "*"
+BIN_COUNT = 40
+BIN_WIDTH = 2.0 / BIN_COUNT
+PERCENTILES = (10, 50, 90)
+
+
+def _bin(score):
+    return min(max(int((score + 1.0) / BIN_WIDTH), 0), BIN_COUNT - 1)
+
+
+def _subreddit_key(subreddit):
+    return (subreddit or "").lower().removeprefix("r/")
+
+
+def _rollup_keys(post):
+    subreddit = _subreddit_key(post.get("subreddit"))
+    keywords = [keyword.lower() for keyword in dict.fromkeys(post.get("keywords") or [])]
+    for granularity, seconds in GRANULARITIES.items():
+        bucket_start = post["created_utc"] // seconds * seconds
+        for sub in (subreddit, ALL):
+            for keyword in [ALL] + keywords:
+                yield granularity, bucket_start, sub, keyword
+
+
+def _apply(conn, deltas, bins):
+    conn.executemany(
+        """
+        INSERT INTO sentiment_rollups (granularity, bucket_start, subreddit, keyword, count, score_sum, opportunities)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(granularity, subreddit, keyword, bucket_start) DO UPDATE SET
+            count = count + excluded.count,
+            score_sum = score_sum + excluded.score_sum,
+            opportunities = opportunities + excluded.opportunities
+        """,
+        [(*key, count, score_sum, opportunities) for key, (count, score_sum, opportunities) in deltas.items()],
+    )
+    conn.executemany(
+        """
+        INSERT INTO sentiment_rollup_bins (granularity, bucket_start, subreddit, keyword, bin, count)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(granularity, subreddit, keyword, bucket_start, bin) DO UPDATE SET count = count + excluded.count
+        """,
+        [(*key, count) for key, count in bins.items()],
+    )
+
+
+def _record(posts, insert_new):
+    posts = [post for post in posts if post.get("created_utc") is not None]
+    if not posts:
+        return 0
+    now = time.time()
+    deltas = defaultdict(lambda: [0, 0.0, 0])
+    bins = defaultdict(int)
+    new_rows, status_changes = [], []
+    with mention_store.connect() as conn:
+        # Read and update the archive in one write transaction so concurrent workers cannot double count
+        conn.execute("BEGIN IMMEDIATE")
+        archived = {}
+        ids = [post["id"] for post in posts]
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            rows = conn.execute(
+                f"SELECT id, status FROM mention_archive WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            archived.update((row["id"], row["status"]) for row in rows)
+
+        for post in posts:
+            is_opportunity = post.get("status") == "opportunity"
+            if post["id"] in archived:
+                # Opportunity status follows engagement and rule changes; counts and scores do not change
+                was_opportunity = archived[post["id"]] == "opportunity"
+                if is_opportunity != was_opportunity:
+                    for key in _rollup_keys(post):
+                        deltas[key][2] += 1 if is_opportunity else -1
+                    status_changes.append((post.get("status"), post["id"]))
+                continue
+            if not insert_new:
+                continue
+            score = post.get("score") or 0.0
+            for key in _rollup_keys(post):
+                delta = deltas[key]
+                delta[0] += 1
+                delta[1] += score
+                delta[2] += 1 if is_opportunity else 0
+                bins[(*key, _bin(score))] += 1
+            day = datetime.fromtimestamp(post["created_utc"], timezone.utc).strftime("%Y-%m-%d")
+            new_rows.append((post["id"], day, post.get("subreddit") or "", post["created_utc"], score,
+                             post.get("status"), json.dumps(post), now))
+            archived[post["id"]] = post.get("status")
+
+        conn.executemany(
+            """
+            INSERT INTO mention_archive (id, day, subreddit, created_utc, score, status, data, archived_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            new_rows,
+        )
+        conn.executemany("UPDATE mention_archive SET status = ? WHERE id = ?", status_changes)
+        _apply(conn, deltas, bins)
+    return len(new_rows)
+
+
+def record_mentions(posts):
+    """Archive newly scored mentions and fold them into the rollups. Returns how many were new."""
+    return _record(posts, insert_new=True)
+
+
+def update_statuses(posts):
+    """Carry opportunity status changes of already archived posts into the rollups"""
+    _record(posts, insert_new=False)
+
+
+def backfill_from_store():
+    """One-time import of the mentions that were stored before the archive existed"""
+    if mention_store.get_meta("archive_backfilled"):
+        return 0
+    count = record_mentions(mention_store.load_mentions())
+    mention_store.set_meta("archive_backfilled", str(time.time()))
+    return count
+
+
+def _percentile(bin_counts, total, percentile):
+    """Estimate a percentile from bin counts, interpolating linearly inside the bin"""
+    target = total * percentile / 100.0
+    seen = 0
+    for index in range(BIN_COUNT):
+        count = bin_counts.get(index, 0)
+        if count and seen + count >= target:
+            return round(-1.0 + BIN_WIDTH * (index + (target - seen) / count), 3)
+        seen += count
+    return 1.0
+
+
+def _summary(count, score_sum, opportunities, bin_counts):
+    summary = {
+        "count": count,
+        "mean": round(score_sum / count, 3) if count else None,
+        "opportunities": opportunities,
+    }
+    for percentile in PERCENTILES:
+        summary[f"p{percentile}"] = _percentile(bin_counts, count, percentile) if count else None
+    return summary
+
+
+def trends(granularity="day", since=None, until=None, subreddit=None, keyword=None):
+    """
+    Rollup series for [since, until) (epoch seconds) at hourly or daily granularity, for one
+    subreddit/keyword or all of them, plus a summary of the whole range
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+    until = until if until is not None else time.time()
+    since = since if since is not None else until - 30 * 86400
+    seconds = GRANULARITIES[granularity]
+    params = (granularity, _subreddit_key(subreddit) if subreddit else ALL,
+              keyword.lower() if keyword else ALL, since // seconds * seconds, until)
+    where = "granularity = ? AND subreddit = ? AND keyword = ? AND bucket_start >= ? AND bucket_start < ?"
+    with mention_store.connect() as conn:
+        rows = conn.execute(
+            f"SELECT bucket_start, count, score_sum, opportunities FROM sentiment_rollups WHERE {where} ORDER BY bucket_start",
+            params,
+        ).fetchall()
+        bin_rows = conn.execute(
+            f"SELECT bucket_start, bin, count FROM sentiment_rollup_bins WHERE {where}", params
+        ).fetchall()
+
+    bins_by_bucket = defaultdict(dict)
+    total_bins = defaultdict(int)
+    for row in bin_rows:
+        bins_by_bucket[row["bucket_start"]][row["bin"]] = row["count"]
+        total_bins[row["bin"]] += row["count"]
+
+    series = []
+    for row in rows:
+        point = _summary(row["count"], row["score_sum"], row["opportunities"], bins_by_bucket[row["bucket_start"]])
+        point["bucket_start"] = datetime.fromtimestamp(row["bucket_start"], timezone.utc).isoformat()
+        series.append(point)
+    total = _summary(sum(row["count"] for row in rows), sum(row["score_sum"] for row in rows),
+                     sum(row["opportunities"] for row in rows), total_bins)
+    return {"granularity": granularity, "series": series, "total": total}
@@ -0,0 +1,90 @@
+"""
+Process-wide Reddit and Supabase clients. Nothing connects, or even imports the client
+libraries, at import time: each client is built on first use, once per process, and
+shared by every router. Route handlers take them as FastAPI dependencies
+(`db: Client = Depends(get_supabase)`); install() swaps in stand-ins (see tests/fakes.py) so
+benchmarks and offline replays run the real code paths without network access.
+"""
+import asyncio
+import os
+import threading
+from typing import TYPE_CHECKING
+
+from dotenv import load_dotenv
+
+if TYPE_CHECKING:
+    import praw
+    from supabase import AsyncClient, Client
+
+load_dotenv()
+
+_reddit = None
+_supabase = None
+_async_supabase = None
+_installed = set()
+_lock = threading.Lock()
+_async_supabase_lock = asyncio.Lock()
+
+
+def _forget_clients():
+    # A forked worker must not share the parent's connection pools; it builds its own
+    global _reddit, _supabase, _async_supabase, _async_supabase_lock
+    if "reddit" not in _installed:
+        _reddit = None
+    if "supabase" not in _installed:
+        _supabase = None
+    if "async_supabase" not in _installed:
+        _async_supabase = None
+    _async_supabase_lock = asyncio.Lock()
+
+
+os.register_at_fork(after_in_child=_forget_clients)
+
+
+def get_reddit() -> "praw.Reddit":
+    global _reddit
+    if _reddit is None:
+        with _lock:
+            if _reddit is None:
+                import praw
+                _reddit = praw.Reddit(
+                    client_id=os.getenv("REDDIT_CLIENT_ID"),
+                    client_secret=os.getenv("REDDIT_CLIENT_SECRET"),
+                    user_agent=os.getenv("REDDIT_USER_AGENT"),
+                )
+    return _reddit
+
+
+def get_supabase() -> "Client":
+    global _supabase
+    if _supabase is None:
+        with _lock:
+            if _supabase is None:
+                from supabase import create_client
+                _supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+    return _supabase
+
+
+async def get_async_supabase() -> "AsyncClient":
+    """Async client for endpoints that issue concurrent reads; shared so requests reuse its pooled connections"""
+    global _async_supabase
+    if _async_supabase is None:
+        async with _async_supabase_lock:
+            if _async_supabase is None:
+                from supabase import acreate_client
+                _async_supabase = await acreate_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+    return _async_supabase
+
+
+def install(reddit=None, supabase=None, async_supabase=None):
+    """Use the given clients instead of building real ones; arguments left as None are unchanged"""
+    global _reddit, _supabase, _async_supabase
+    if reddit is not None:
+        _reddit = reddit
+        _installed.add("reddit")
+    if supabase is not None:
+        _supabase = supabase
+        _installed.add("supabase")
+    if async_supabase is not None:
+        _async_supabase = async_supabase
+        _installed.add("async_supabase")
@@ -0,0 +1,209 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Try relative imports first (for local development), fall back to absolute (for Railway)
+try:
+    from . import archive, clients, events, mention_store, reddit_utils, triage
+    from .keyword_matcher import get_matcher
+    from .opportunity_scoring import score_opportunities
+    from .query_planner import chunk_subreddits
+    from .sentiment_analysis import analyze_sentiment
+except ImportError:
+    import archive
+    import clients
+    import events
+    import mention_store
+    import reddit_utils
+    import triage
+    from keyword_matcher import get_matcher
+    from opportunity_scoring import score_opportunities
+    from query_planner import chunk_subreddits
+    from sentiment_analysis import analyze_sentiment
+
+# Opt-in: comment threads cost several Reddit calls each
+COMMENT_INGESTION_ENABLED = os.getenv("COMMENT_INGESTION_ENABLED", "false").lower() in ("1", "true", "yes")
+# Threads scanned per ingestion run, and how many of the newest threads per multireddit
+# query are candidates besides the matched ones (100 is one listing call; 0 disables)
+COMMENT_THREADS_PER_RUN = int(os.getenv("COMMENT_THREADS_PER_RUN", "25"))
+COMMENT_NEW_THREADS = int(os.getenv("COMMENT_NEW_THREADS", "100"))
+# Per thread: comments in the first fetch, extra "load more" calls, reply depth and comments examined
+COMMENT_FETCH_LIMIT = int(os.getenv("COMMENT_FETCH_LIMIT", "500"))
+COMMENT_MORE_BUDGET = int(os.getenv("COMMENT_MORE_BUDGET", "4"))
+COMMENT_MAX_DEPTH = int(os.getenv("COMMENT_MAX_DEPTH", "6"))
+COMMENT_MAX_PER_THREAD = int(os.getenv("COMMENT_MAX_PER_THREAD", "2000"))
+COMMENT_WORKERS = int(os.getenv("COMMENT_WORKERS", "4"))
+# Stored comment text is cut to this many characters
+COMMENT_TEXT_CHARS = 1000
+# Threads older than this are no longer rescanned
+COMMENT_WINDOW_HOURS = int(os.getenv("MENTION_STATS_WINDOW_HOURS", "48"))
+
+# Comment mentions share the posts table with submissions; the prefix keeps their IDs apart
+COMMENT_ID_PREFIX = "t1_"
+
+# Comment count of each thread at its last scan, so unchanged threads are skipped
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS comment_scans (
+    submission_id TEXT PRIMARY KEY,
+    num_comments INTEGER NOT NULL,
+    scanned_at REAL NOT NULL
+);
+"""
+
+mention_store.register_schema(SCHEMA)
+
+
+def is_comment_id(post_id):
+    return post_id.startswith(COMMENT_ID_PREFIX)
+
+
+def comment_to_mention(comment, thread, subreddit_name, keywords):
+    """Mention dict for a comment, in the same shape as submission mentions"""
+    return {
+        "id": COMMENT_ID_PREFIX + comment.id,
+        "kind": "comment",
+        "submission_id": thread["id"],
+        "thread_title": thread["title"],
+        "subreddit": f"r/{subreddit_name}",
+        "title": comment.body[:COMMENT_TEXT_CHARS],
+        "author": comment.author.name if comment.author else "anonymous",
+        "sentiment": "neutral",
+        "score": 0.0,
+        "upvotes": comment.score,
+        "comments": 0,
+        "created_utc": comment.created_utc,
+        "status": "neutral",
+        "keywords": list(keywords),
+        "permalink": comment.permalink,
+    }
+
+
+def _walk(forest):
+    """Comments breadth first, down to COMMENT_MAX_DEPTH and at most COMMENT_MAX_PER_THREAD of them"""
+    queue = deque((comment, 0) for comment in forest)
+    examined = 0
+    while queue and examined < COMMENT_MAX_PER_THREAD:
+        comment, depth = queue.popleft()
+        if getattr(comment, "body", None) is None:
+            continue  # An unexpanded "load more" placeholder
+        examined += 1
+        yield comment
+        if depth + 1 < COMMENT_MAX_DEPTH:
+            queue.extend((reply, depth + 1) for reply in comment.replies)
+
+
+def scan_thread(thread, matcher):
+    """Fetch one thread's comments within the call budget and return mentions for the matching ones"""
+    limiter = reddit_utils.reddit_limiter
+    reddit = clients.get_reddit()
+    limiter.acquire()
+    submission = reddit.submission(id=thread["id"])
+    submission.comment_sort = "new"
+    submission.comment_limit = COMMENT_FETCH_LIMIT
+    forest = submission.comments
+    limiter.sync_with_praw(reddit)
+    # One placeholder per call, so the budget is exact
+    for _ in range(COMMENT_MORE_BUDGET):
+        limiter.acquire()
+        remaining = forest.replace_more(limit=1)
+        limiter.sync_with_praw(reddit)
+        if not remaining:
+            break
+    mentions = []
+    for comment in _walk(forest):
+        matched = matcher.find_all(comment.body)
+        if matched:
+            mentions.append(comment_to_mention(comment, thread, thread["subreddit_name"], matched))
+    return mentions
+
+
+def candidate_threads(subreddits):
+    """
+    Recent submission mentions plus the newest threads in the monitored subreddits, as
+    {id, title, subreddit_name, num_comments}, skipping threads whose comment count has
+    not grown since the last scan. Most active first.
+    """
+    subreddit_names = {name.lower(): name for name in subreddits}
+    since = time.time() - COMMENT_WINDOW_HOURS * 3600
+    threads = {}
+    for post in mention_store.load_mentions(subreddits):
+        if post.get("kind") == "comment" or (post.get("created_utc") or 0) < since:
+            continue
+        threads[post["id"]] = {
+            "id": post["id"],
+            "title": post["title"],
+            "subreddit_name": post["subreddit"].removeprefix("r/"),
+            "num_comments": post.get("comments") or 0,
+        }
+    if COMMENT_NEW_THREADS:
+        for chunk in chunk_subreddits(subreddits):
+            listing = clients.get_reddit().subreddit("+".join(chunk)).new(limit=COMMENT_NEW_THREADS)
+            for post in reddit_utils.rate_limited(listing):
+                display_name = post.subreddit.display_name
+                threads.setdefault(post.id, {
+                    "id": post.id,
+                    "title": post.title,
+                    "subreddit_name": subreddit_names.get(display_name.lower(), display_name),
+                    "num_comments": post.num_comments,
+                })
+
+    ids = list(threads)
+    scanned = {}
+    with mention_store.connect() as conn:
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            rows = conn.execute(
+                f"SELECT submission_id, num_comments FROM comment_scans WHERE submission_id IN ({','.join('?' * len(chunk))})",
+                chunk,
+            ).fetchall()
+            scanned.update((row["submission_id"], row["num_comments"]) for row in rows)
+    due = [t for t in threads.values() if t["num_comments"] > scanned.get(t["id"], 0)]
+    due.sort(key=lambda t: t["num_comments"] - scanned.get(t["id"], 0), reverse=True)
+    return due
+
+
+def _mark_scanned(threads):
+    now = time.time()
+    with mention_store.connect() as conn:
+        conn.executemany(
+            """
+            INSERT INTO comment_scans (submission_id, num_comments, scanned_at) VALUES (?, ?, ?)
+            ON CONFLICT(submission_id) DO UPDATE SET num_comments = excluded.num_comments, scanned_at = excluded.scanned_at
+            """,
+            [(t["id"], t["num_comments"], now) for t in threads],
+        )
+        conn.execute("DELETE FROM comment_scans WHERE scanned_at < ?", (now - COMMENT_WINDOW_HOURS * 3600,))
+
+
+def ingest_comments(subreddits, keywords, rules=None):
+    """
+    Scan the most active candidate threads on a small worker pool and store the comments
+    that mention a keyword, scored like submissions. Returns how many comments were stored.
+    """
+    threads = candidate_threads(subreddits)[:COMMENT_THREADS_PER_RUN]
+    if not threads:
+        return 0
+    matcher = get_matcher(keywords)
+
+    def scan(thread):
+        try:
+            return thread, scan_thread(thread, matcher)
+        except Exception as e:
+            print(f"Comment scan failed for {thread['id']}: {e}")
+            return thread, None
+
+    mentions, done = [], []
+    with ThreadPoolExecutor(max_workers=min(COMMENT_WORKERS, len(threads))) as pool:
+        for thread, found in pool.map(scan, threads):
+            if found is not None:
+                mentions.extend(found)
+                done.append(thread)
+
+    mentions = score_opportunities(analyze_sentiment(mentions), rules)
+    new_ids = mention_store.save_posts(mentions, is_mention=True)
+    archive.record_mentions(mentions)
+    triage.record(mentions)
+    events.publish_mentions([post for post in mentions if post["id"] in new_ids])
+    _mark_scanned(done)
+    return len(mentions)
@@ -0,0 +1,233 @@
+import hashlib
+import itertools
+import os
+import re
+import time
+
+import numpy as np
+
+# Try relative imports first (for local development), fall back to absolute (for Railway)
+try:
+    from . import mention_store
+except ImportError:
+    import mention_store
+
+# Posts whose 64-bit SimHash signatures differ in at most this many bits are near-duplicates.
+# A one-word edit to a short post moves about 4 bits on average but often 6 or 7, so 7 catches
+# ~95% of them; unrelated texts differ in ~32 bits.
+SIMHASH_MAX_DISTANCE = max(1, int(os.getenv("SIMHASH_MAX_DISTANCE", "7")))
+# Shorter texts ("Help?") carry too little signal to be clustered
+SIMHASH_MIN_TOKENS = 8
+SHINGLE_SIZE = 4
+# Signatures older than this are dropped from the index
+DEDUP_WINDOW_DAYS = int(os.getenv("DEDUP_WINDOW_DAYS", "30"))
+
+# The signature is indexed as BANDS bands of BAND_BITS bits. Two signatures within
+# MAX_DISTANCE bits have a band that differs in at most PROBE_RADIUS bits (pigeonhole),
+# so looking up every value within PROBE_RADIUS bits of each band finds all candidates.
+BANDS = 4
+BAND_BITS = 64 // BANDS
+PROBE_RADIUS = SIMHASH_MAX_DISTANCE // BANDS
+BAND_LAYOUT = f"{BANDS}x{BAND_BITS}"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS simhash_index (
+    post_id TEXT PRIMARY KEY,
+    simhash INTEGER NOT NULL,
+    cluster_id TEXT NOT NULL,
+    created_utc REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_simhash_index_created ON simhash_index (created_utc);
+CREATE TABLE IF NOT EXISTS simhash_bands (
+    band INTEGER NOT NULL,
+    value INTEGER NOT NULL,
+    post_id TEXT NOT NULL,
+    PRIMARY KEY (band, value, post_id)
+);
+CREATE INDEX IF NOT EXISTS idx_simhash_bands_post ON simhash_bands (post_id);
+"""
+
+mention_store.register_schema(SCHEMA)
+
+_TOKEN = re.compile(r"\w+")
+
+
+def simhash(text):
+    """
+    64-bit SimHash over character shingles of the normalized text, or None when the text
+    is too short to compare. Character shingles give short posts enough features for an
+    edited word or an added "thanks!" to move only a few bits.
+    """
+    tokens = _TOKEN.findall(text.lower())
+    if len(tokens) < SIMHASH_MIN_TOKENS:
+        return None
+    normalized = " ".join(tokens)
+    shingles = [normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)]
+    digests = b"".join(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest() for shingle in shingles)
+    # One row of 64 bits per shingle; a signature bit is set where most shingles have it set
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8)).reshape(-1, 64)
+    majority = bits.sum(axis=0) * 2 > len(shingles)
+    return int("".join("1" if bit else "0" for bit in majority), 2)
+
+
+def _bands(signature):
+    mask = (1 << BAND_BITS) - 1
+    return [(band, signature >> (band * BAND_BITS) & mask) for band in range(BANDS)]
+
+
+def _probes(value):
+    """`value` and every band value within PROBE_RADIUS bits of it"""
+    values = [value]
+    for radius in range(1, PROBE_RADIUS + 1):
+        values += [value ^ sum(1 << bit for bit in bits) for bits in itertools.combinations(range(BAND_BITS), radius)]
+    return values
+
+
+def _to_sql(signature):
+    # SQLite integers are signed 64-bit
+    return signature - (1 << 64) if signature >= 1 << 63 else signature
+
+
+def _from_sql(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+def _distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+def _rebuild_bands(conn):
+    """Re-index the stored signatures if they were banded with another layout, or before layouts were recorded"""
+    row = conn.execute("SELECT value FROM meta WHERE key = 'simhash_band_layout'").fetchone()
+    if row is not None and row["value"] == BAND_LAYOUT:
+        return
+    conn.execute("DELETE FROM simhash_bands")
+    for row in conn.execute("SELECT post_id, simhash FROM simhash_index").fetchall():
+        conn.executemany(
+            "INSERT OR IGNORE INTO simhash_bands (band, value, post_id) VALUES (?, ?, ?)",
+            [(band, value, row["post_id"]) for band, value in _bands(_from_sql(row["simhash"]))],
+        )
+    conn.execute(
+        "INSERT INTO meta (key, value) VALUES ('simhash_band_layout', ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+        (BAND_LAYOUT,),
+    )
+
+
+_layout_checked = False
+
+
+def assign_clusters(mentions, texts):
+    """
+    Give each mention a `cluster_id`: the ID of the oldest indexed near-duplicate, or its
+    own ID. Near-duplicates also get `duplicate_of`. `texts` maps post ID to the title and
+    selftext the signature is computed from. Candidates come from band lookups in the
+    index, so the cost does not grow with the number of stored posts.
+    """
+    global _layout_checked
+    if not mentions:
+        return mentions
+    now = time.time()
+    ids = [mention["id"] for mention in mentions]
+    indexed = set()
+    with mention_store.connect() as conn:
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            indexed.update(row["post_id"] for row in conn.execute(
+                f"SELECT post_id FROM simhash_index WHERE post_id IN ({','.join('?' * len(chunk))})", chunk))
+    # Hashing is the expensive part, so it happens before the write lock is taken
+    signatures = {post_id: simhash(texts.get(post_id, "")) for post_id in ids if post_id not in indexed}
+
+    with mention_store.connect() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        if not _layout_checked:
+            _rebuild_bands(conn)
+            _layout_checked = True
+        for mention in sorted(mentions, key=lambda m: m.get("created_utc") or 0):
+            row = conn.execute(
+                "SELECT cluster_id FROM simhash_index WHERE post_id = ?", (mention["id"],)
+            ).fetchone()
+            if row is not None:
+                cluster_id = row["cluster_id"]
+            else:
+                # Missing only if pruned since the read above
+                signature = signatures[mention["id"]] if mention["id"] in signatures else simhash(texts.get(mention["id"], ""))
+                if signature is None:
+                    continue
+                bands = _bands(signature)
+                probes = [(band, _probes(value)) for band, value in bands]
+                # Primary-key lookups of each band's probe values
+                candidates = conn.execute(
+                    f"""
+                    SELECT i.post_id, i.simhash, i.cluster_id, i.created_utc FROM simhash_index i
+                    WHERE i.post_id IN ({' UNION '.join(
+                        f"SELECT post_id FROM simhash_bands WHERE band = ? AND value IN ({','.join('?' * len(values))})"
+                        for _, values in probes)})
+                    """,
+                    [param for band, values in probes for param in (band, *values)],
+                ).fetchall()
+                matches = [c for c in candidates if _distance(_from_sql(c["simhash"]), signature) <= SIMHASH_MAX_DISTANCE]
+                cluster_id = min(matches, key=lambda c: c["created_utc"])["cluster_id"] if matches else mention["id"]
+                conn.execute(
+                    "INSERT INTO simhash_index (post_id, simhash, cluster_id, created_utc) VALUES (?, ?, ?, ?)",
+                    (mention["id"], _to_sql(signature), cluster_id, mention.get("created_utc") or now),
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO simhash_bands (band, value, post_id) VALUES (?, ?, ?)",
+                    [(band, value, mention["id"]) for band, value in bands],
+                )
+            mention["cluster_id"] = cluster_id
+            if cluster_id != mention["id"]:
+                mention["duplicate_of"] = cluster_id
+    return mentions
+
+
+def inherit_scores(duplicates, canonical_posts):
+    """
+    Copy sentiment and opportunity fields from each duplicate's canonical post instead of
+    scoring it again. Returns the duplicates whose canonical post was not available.
+    """
+    by_id = {post["id"]: post for post in canonical_posts}
+    missing = [post["duplicate_of"] for post in duplicates if post["duplicate_of"] not in by_id]
+    if missing:
+        by_id.update((post["id"], post) for post in mention_store.load_posts(missing))
+    unscored = []
+    for post in duplicates:
+        canonical = by_id.get(post["duplicate_of"])
+        if canonical is None:
+            unscored.append(post)
+            continue
+        for field in ("sentiment", "score", "status", "opportunity_score", "opportunity_factors"):
+            if field in canonical:
+                post[field] = canonical[field]
+    return unscored
+
+
+def fold_duplicates(posts, keep_ids=()):
+    """
+    Drop near-duplicates whose canonical post is in `posts` (a list, or a dict keyed by
+    ID), listing them on the canonical post under `duplicates` so they are triaged once.
+    Posts in `keep_ids` are never dropped. Expects posts already passed through
+    mention_records.present().
+    """
+    by_id = posts if isinstance(posts, dict) else {post["id"]: post for post in posts}
+    keep_ids = keep_ids if isinstance(keep_ids, (set, dict)) else set(keep_ids)
+    folded = []
+    for post in by_id.values():
+        canonical = by_id.get(post.get("duplicate_of"))
+        if canonical is None or post["id"] in keep_ids:
+            folded.append(post)
+            continue
+        canonical.setdefault("duplicates", []).append(
+            {"id": post["id"], "subreddit": post.get("subreddit"), "url": post.get("url")}
+        )
+    return folded
+
+
+def prune(window_days=DEDUP_WINDOW_DAYS):
+    cutoff = time.time() - window_days * 86400
+    with mention_store.connect() as conn:
+        conn.execute(
+            "DELETE FROM simhash_bands WHERE post_id IN (SELECT post_id FROM simhash_index WHERE created_utc < ?)",
+            (cutoff,),
+        )
+        conn.execute("DELETE FROM simhash_index WHERE created_utc < ?", (cutoff,))
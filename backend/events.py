@@ -0,0 +1,134 @@
+import asyncio
+import json
+import os
+import time
+
+# Try relative imports first (for local development), fall back to absolute (for Railway)
+try:
+    from . import mention_records, mention_store
+except ImportError:
+    import mention_records
+    import mention_store
+
+# Append-only event log in the local store. Any worker can publish and every worker's
+# /events subscribers see it, so a flag in one worker reaches clients connected to another.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    data TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+mention_store.register_schema(SCHEMA)
+
+# How many events are kept for clients resuming with Last-Event-ID
+EVENT_RETENTION = int(os.getenv("EVENT_RETENTION", "10000"))
+# How often a subscriber checks the log for new events, in seconds
+EVENTS_POLL_SECONDS = float(os.getenv("EVENTS_POLL_SECONDS", "1"))
+# Idle connections get a comment line this often so proxies keep them open
+EVENTS_HEARTBEAT_SECONDS = 15
+# Suggested client reconnect delay, in ms
+EVENTS_RETRY_MS = 3000
+READ_BATCH_SIZE = 500
+
+
+def publish_many(events):
+    """Append (type, data) pairs to the log in one transaction and trim old events"""
+    now = time.time()
+    with mention_store.connect() as conn:
+        conn.executemany(
+            "INSERT INTO events (type, data, created_at) VALUES (?, ?, ?)",
+            [(event_type, json.dumps(data), now) for event_type, data in events],
+        )
+        conn.execute(
+            "DELETE FROM events WHERE id <= (SELECT MAX(id) FROM events) - ?", (EVENT_RETENTION,)
+        )
+
+
+def publish(event_type, data):
+    publish_many([(event_type, data)])
+
+
+def publish_mentions(posts):
+    """A `mention` event per newly stored mention plus the matching stats delta"""
+    if not posts:
+        return
+    opportunities = sum(1 for post in posts if post.get("status") == "opportunity")
+    publish_many(
+        [("mention", mention_records.present(dict(post))) for post in posts]
+        + [("stats", {"delta": {"total_mentions": len(posts), "opportunities": opportunities}})]
+    )
+
+
+def publish_state_changes(changes):
+    """A `post_state` event per applied {id, state, active} change plus one combined stats delta"""
+    if not changes:
+        return
+    delta = {}
+    for change in changes:
+        key = f"{change['state']}_count"
+        delta[key] = delta.get(key, 0) + (1 if change["active"] else -1)
+    publish_many(
+        [("post_state", {"post_id": c["id"], "state": c["state"], "active": c["active"]}) for c in changes]
+        + [("stats", {"delta": delta})]
+    )
+
+
+def latest_id():
+    with mention_store.connect() as conn:
+        row = conn.execute("SELECT MAX(id) AS id FROM events").fetchone()
+    return row["id"] or 0
+
+
+def read_since(last_id, limit=READ_BATCH_SIZE):
+    """
+    Events after `last_id`, oldest first. Returns (events, complete); complete is False
+    when events the client has not seen were already trimmed from the log.
+    """
+    with mention_store.connect() as conn:
+        bounds = conn.execute("SELECT MIN(id) AS oldest, MAX(id) AS newest FROM events").fetchone()
+        rows = conn.execute(
+            "SELECT id, type, data FROM events WHERE id > ? ORDER BY id LIMIT ?", (last_id, limit)
+        ).fetchall()
+    if bounds["oldest"] is None:
+        complete = last_id == 0
+    else:
+        # A position past the newest event means the store was recreated
+        complete = bounds["oldest"] - 1 <= last_id <= bounds["newest"]
+    return [(row["id"], row["type"], row["data"]) for row in rows], complete
+
+
+def format_event(event_id, event_type, data):
+    """One Server-Sent Events message; `data` is a JSON string"""
+    return f"id: {event_id}\nevent: {event_type}\ndata: {data}\n\n"
+
+
+async def stream(last_event_id, is_disconnected):
+    """
+    Yield SSE messages from the log, starting after `last_event_id` (or at the current end
+    when None). A client whose position was trimmed gets a `reset` event and should refetch
+    /dashboard-data before continuing.
+    """
+    yield f"retry: {EVENTS_RETRY_MS}\n\n"
+    if last_event_id is None:
+        last_event_id = await asyncio.to_thread(latest_id)
+    idle_since = time.monotonic()
+    while not await is_disconnected():
+        batch, complete = await asyncio.to_thread(read_since, last_event_id)
+        if not complete:
+            last_event_id = await asyncio.to_thread(latest_id)
+            yield format_event(last_event_id, "reset", json.dumps({"latest_id": last_event_id}))
+            continue
+        for event_id, event_type, data in batch:
+            yield format_event(event_id, event_type, data)
+            last_event_id = event_id
+        if batch:
+            idle_since = time.monotonic()
+            if len(batch) == READ_BATCH_SIZE:
+                continue
+        elif time.monotonic() - idle_since >= EVENTS_HEARTBEAT_SECONDS:
+            yield ": keepalive\n\n"
+            idle_since = time.monotonic()
+        await asyncio.sleep(EVENTS_POLL_SECONDS)
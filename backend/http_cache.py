@@ -0,0 +1,65 @@
+import hashlib
+import os
+import time
+
+import orjson
+from fastapi.responses import JSONResponse, Response
+
+# Try relative imports first (for local development), fall back to absolute (for Railway)
+try:
+    from . import mention_store, ttl_cache
+except ImportError:
+    import mention_store
+    import ttl_cache
+
+# Edits made directly in Supabase bypass the version counters; rolling the ETag over on
+# the config cache interval bounds how long such edits can be answered with 304s
+VERSION_BUCKET_SECONDS = int(os.getenv("CONFIG_CACHE_TTL_SECONDS", "300"))
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response serialized with orjson"""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def content_version():
+    """Everything the read endpoints' output depends on: stored posts, the last ingestion
+    run, triage state and the subreddit/keyword config"""
+    return (
+        mention_store.data_version(),
+        mention_store.get_meta("last_refreshed_at"),
+        ttl_cache.version("post_state"),
+        ttl_cache.version("subreddits"),
+        ttl_cache.version("keywords"),
+        int(time.time() // VERSION_BUCKET_SECONDS),
+    )
+
+
+def etag_for(request):
+    """Weak ETag for the request's path and query at the current content version"""
+    key = f"{content_version()}|{request.url.path}?{request.url.query}"
+    return 'W/"' + hashlib.blake2b(key.encode(), digest_size=12).hexdigest() + '"'
+
+
+def is_fresh(request, etag):
+    """True when the client's If-None-Match already names `etag`"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+def cache_headers(etag):
+    # no-cache: the browser keeps the body but revalidates with If-None-Match every time
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+
+def not_modified(etag):
+    return Response(status_code=304, headers=cache_headers(etag))
+
+
+def json_response(content, etag, headers=None):
+    return FastJSONResponse(content, headers={**cache_headers(etag), **(headers or {})})
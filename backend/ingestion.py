@@ -0,0 +1,215 @@
+import asyncio
+import os
+import socket
+import time
+from datetime import datetime, timezone
+
+# Try relative imports first (for local development), fall back to absolute (for Railway)
+try:
+    from . import archive, comment_ingestion, dedup, events, mention_store, shards, triage, watermarks
+    from .opportunity_scoring import score_opportunities
+    from .reddit_utils import get_recent_mentions, get_posts_by_ids
+    from .sentiment_analysis import analyze_sentiment
+except ImportError:
+    import archive
+    import comment_ingestion
+    import dedup
+    import events
+    import mention_store
+    import shards
+    import triage
+    import watermarks
+    from opportunity_scoring import score_opportunities
+    from reddit_utils import get_recent_mentions, get_posts_by_ids
+    from sentiment_analysis import analyze_sentiment
+
+# How often mentions are pulled from Reddit, in seconds
+INGESTION_INTERVAL_SECONDS = int(os.getenv("INGESTION_INTERVAL_SECONDS", "300"))
+# Per (subreddit, keyword) search depth, same as the old inline fetch
+INGESTION_SEARCH_LIMIT = int(os.getenv("INGESTION_SEARCH_LIMIT", "25"))
+# Stored mentions younger than this get their upvotes/comments refreshed each run
+MENTION_STATS_WINDOW_HOURS = int(os.getenv("MENTION_STATS_WINDOW_HOURS", "48"))
+# How often each worker checks whether a run is due or was requested
+POLL_TICK_SECONDS = 5
+# Upper bound on a single run; an abandoned lease expires after this
+LEASE_SECONDS = 900
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+_task = None
+_wake = None
+_loop = None
+
+
+def score_mentions(mentions, rules=None):
+    """Score canonical posts; near-duplicates take their canonical post's scores"""
+    canonical = [post for post in mentions if "duplicate_of" not in post]
+    duplicates = [post for post in mentions if "duplicate_of" in post]
+    score_opportunities(analyze_sentiment(canonical), rules)
+    unscored = dedup.inherit_scores(duplicates, canonical)
+    score_opportunities(analyze_sentiment(unscored), rules)
+    return mentions
+
+
+def search_mentions(subreddits, keywords, queries=None, limit=INGESTION_SEARCH_LIMIT, rules=None, limiter=None):
+    """
+    Fetch and score mentions newer than the stored watermarks and write them to the local
+    store. `queries` restricts the search to one shard's share of the planned queries.
+    """
+    archive.backfill_from_store()
+    triage.backfill_from_store()
+    marks = watermarks.load(subreddits, keywords)
+    mentions = get_recent_mentions(subreddits, keywords=keywords, limit=limit, marks=marks,
+                                   queries=queries, limiter=limiter)
+    mentions = score_mentions(mentions, rules)
+    # New is decided by the store, so a post found by two shards is published once
+    new_ids = mention_store.save_posts(mentions, is_mention=True)
+    archive.record_mentions(mentions)
+    triage.record(mentions)
+    events.publish_mentions([post for post in mentions if post["id"] in new_ids])
+    # Only advance the marks once the new mentions are safely stored
+    watermarks.save(marks)
+    return mentions
+
+
+def search_shard(subreddits, keywords, shard, shard_count=shards.INGESTION_SHARDS, limit=INGESTION_SEARCH_LIMIT, rules=None):
+    """Search one shard's (subreddit, keyword) pairs under its share of the Reddit budget"""
+    started_at = time.time()
+    shards.rebalance_if_changed(subreddits, keywords, limit, shard_count)
+    queries = shards.plan(subreddits, keywords, limit, shard_count)[shard]
+    limiter = shards.limiter(shard, shard_count)
+    mentions = search_mentions(subreddits, keywords, queries, limit, rules, limiter) if queries else []
+    shards.record_run(shard, queries, started_at, len(mentions), WORKER_ID)
+    return len(mentions)
+
+
+def refresh_tracked(subreddits, keywords, tracked_ids, rules=None):
+    """
+    Fetch tracked posts missing from the store, refresh engagement of recent mentions,
+    ingest comments and prune. Runs once per interval, after or alongside the shard searches.
+    """
+    # Flagged, engaged and ignored posts that were never stored as mentions
+    stored_ids = {post["id"] for post in mention_store.load_posts(tracked_ids)}
+    missing_ids = [pid for pid in dict.fromkeys(tracked_ids) if pid not in stored_ids]
+    if missing_ids:
+        tracked_posts = score_opportunities(analyze_sentiment(get_posts_by_ids(missing_ids)), rules)
+        mention_store.save_posts(tracked_posts)
+
+    # Keep engagement numbers current without re-scoring sentiment; the post cache TTL bounds Reddit traffic.
+    # Posts a shard search wrote during this interval already have current numbers.
+    since = time.time() - MENTION_STATS_WINDOW_HOURS * 3600
+    recent_ids = mention_store.recent_mention_ids(since)
+    candidate_ids = [pid for pid in dict.fromkeys(recent_ids + list(stored_ids))
+                     if not comment_ingestion.is_comment_id(pid)]
+    refresh_ids = mention_store.written_before(candidate_ids, time.time() - INGESTION_INTERVAL_SECONDS / 2)
+    if refresh_ids:
+        mention_store.update_stats(get_posts_by_ids(refresh_ids))
+        # Engagement is an opportunity factor, so re-apply the rules to the refreshed posts
+        refreshed = score_opportunities(mention_store.load_posts(refresh_ids), rules)
+        mention_store.save_posts(refreshed)
+        archive.update_statuses(refreshed)
+        recent_ids = set(recent_ids)
+        triage.record([post for post in refreshed if post["id"] in recent_ids])
+
+    # Runs after the stats refresh so thread comment counts are current
+    if comment_ingestion.COMMENT_INGESTION_ENABLED:
+        comment_ingestion.ingest_comments(subreddits, keywords, rules)
+
+    mention_store.prune_mentions(keep_ids=tracked_ids)
+    dedup.prune()
+    triage.prune()
+    mention_store.set_meta("last_refreshed_at", datetime.now(timezone.utc).isoformat())
+
+
+def last_refreshed_at():
+    """ISO timestamp of the last successful ingestion run, or None"""
+    return mention_store.get_meta("last_refreshed_at")
+
+
+def request_refresh():
+    """Ask the ingestion loop (in whichever workers take the leases) to run every shard now"""
+    requested_at = time.time()
+    mention_store.set_meta("refresh_requested_at", str(requested_at))
+    if _wake is not None:
+        # Callers run in request threads; asyncio.Event is only safe to set on its loop
+        _loop.call_soon_threadsafe(_wake.set)
+    return requested_at
+
+
+def _run_is_due():
+    last_attempt = float(mention_store.get_meta("last_attempt_at", "0"))
+    requested = float(mention_store.get_meta("refresh_requested_at", "0"))
+    return requested > last_attempt or time.time() - last_attempt >= INGESTION_INTERVAL_SECONDS
+
+
+def _due_shards():
+    requested = float(mention_store.get_meta("refresh_requested_at", "0"))
+    return shards.due_shards(INGESTION_INTERVAL_SECONDS, requested)
+
+
+def _claim_tracked_run():
+    """Take the tracked-posts lease when a run is due, and note the attempt"""
+    if not _run_is_due() or not mention_store.acquire_lease("ingestion", WORKER_ID, LEASE_SECONDS):
+        return False
+    mention_store.set_meta("last_attempt_at", str(time.time()))
+    return True
+
+
+# The loop runs on the event loop, so every store call (SQLite, possibly waiting on
+# another worker's write lock) goes through asyncio.to_thread like the jobs themselves.
+async def _run_shards(shard_job):
+    # Each shard has its own lease, so workers that tick at the same time take different shards
+    for shard in await asyncio.to_thread(_due_shards):
+        lease = shards.lease_name(shard)
+        if not await asyncio.to_thread(mention_store.acquire_lease, lease, WORKER_ID, LEASE_SECONDS):
+            continue
+        try:
+            count = await asyncio.to_thread(shard_job, shard)
+            print(f"Ingestion shard {shard} stored {count} mention(s)")
+        except Exception as e:
+            print(f"Ingestion shard {shard} failed: {e}")
+        finally:
+            await asyncio.to_thread(mention_store.release_lease, lease, WORKER_ID)
+
+
+async def _run_loop(job, shard_job):
+    while True:
+        try:
+            await _run_shards(shard_job)
+            if await asyncio.to_thread(_claim_tracked_run):
+                try:
+                    await asyncio.to_thread(job)
+                    print("Ingestion refreshed tracked posts")
+                finally:
+                    await asyncio.to_thread(mention_store.release_lease, "ingestion", WORKER_ID)
+        except Exception as e:
+            print(f"Ingestion run failed: {e}")
+        try:
+            await asyncio.wait_for(_wake.wait(), timeout=POLL_TICK_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        _wake.clear()
+
+
+def start(job, shard_job):
+    """
+    Start the ingestion loop on the running event loop. `shard_job(shard)` searches one
+    shard and `job` refreshes tracked posts; both are blocking callables.
+    """
+    global _task, _wake, _loop
+    if _task is None:
+        _loop = asyncio.get_running_loop()
+        _wake = asyncio.Event()
+        _task = asyncio.create_task(_run_loop(job, shard_job))
+    return _task
+
+
+async def stop():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
@@ -0,0 +1,91 @@
+from collections import deque
+from functools import lru_cache
+from typing import Iterable, List
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over a set of keywords. Finds every keyword in a text in a
+    single pass, case-insensitively, only accepting matches that start and end on word
+    boundaries (so "vs" does not match inside "canvas").
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords: List[str] = list(dict.fromkeys(k.lower().strip() for k in keywords if k and k.strip()))
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for index, keyword in enumerate(self.keywords):
+            state = 0
+            for ch in keyword:
+                next_state = self._goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][ch] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = next_state
+            self._output[state].append(index)
+        self._build_fail_links()
+        # Keywords that begin or end with punctuation ("c++", "$5") skip the boundary check on that side
+        self._check_start = [_is_word_char(k[0]) for k in self.keywords]
+        self._check_end = [_is_word_char(k[-1]) for k in self.keywords]
+
+    def _build_fail_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def _iter_matches(self, text: str):
+        text = text.lower()
+        goto, fail, output = self._goto, self._fail, self._output
+        length = len(text)
+        state = 0
+        for end, ch in enumerate(text, 1):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for index in output[state]:
+                start = end - len(self.keywords[index])
+                if self._check_start[index] and start > 0 and _is_word_char(text[start - 1]):
+                    continue
+                if self._check_end[index] and end < length and _is_word_char(text[end]):
+                    continue
+                yield index
+
+    def find_all(self, text: str) -> List[str]:
+        """Every keyword found in the text, lowercased, in keyword-list order"""
+        if not self.keywords or not text:
+            return []
+        found = set(self._iter_matches(text))
+        return [self.keywords[index] for index in sorted(found)]
+
+    def matches_any(self, text: str) -> bool:
+        if not self.keywords or not text:
+            return False
+        for _ in self._iter_matches(text):
+            return True
+        return False
+
+
+@lru_cache(maxsize=32)
+def _compiled(keywords: tuple) -> KeywordMatcher:
+    return KeywordMatcher(keywords)
+
+
+def get_matcher(keywords: Iterable[str]) -> KeywordMatcher:
+    """Shared matcher for a keyword set; rebuilt only when the set of keywords changes"""
+    return _compiled(tuple(keywords))
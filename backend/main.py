@@ -1,25 +1,49 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import Request
-from supabase import create_client, Client
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi import Request, Response
 from starlette.middleware.sessions import SessionMiddleware
+import asyncio
 import os
+import time
 from dotenv import load_dotenv
-from functools import lru_cache
 from datetime import datetime, timedelta
-from fastapi.responses import JSONResponse
+from typing import Optional
+from fastapi.responses import JSONResponse, StreamingResponse
 
 # Load environment variables from .env file
 load_dotenv()
 # Try relative imports first (for local development), fall back to absolute (for Railway)
 try:
-    from .reddit_utils import get_recent_mentions, get_posts_by_ids
-    from .sentiment_analysis import analyze_sentiment
-    from .reddit_oauth import router as reddit_oauth_router
+    from . import account_stats, archive, dedup, events, http_cache, ingestion, mention_records, mention_store, metrics, post_cache, post_state, sentiment_engine, shards, stream_monitor, triage
+    from .clients import get_async_supabase, get_supabase
+    from .opportunity_scoring import load_rules, save_rules, score_opportunities
+    from .post_queries import aggregate_posts, query_posts
+    from .rate_limiter import reddit_limiter
+    from .ttl_cache import invalidate, invalidate_all, stats as ttl_cache_stats, ttl_cache
+    from .reddit_oauth import refresh_all_account_stats, router as reddit_oauth_router
 except ImportError:
-    from reddit_utils import get_recent_mentions, get_posts_by_ids
-    from sentiment_analysis import analyze_sentiment
-    from reddit_oauth import router as reddit_oauth_router
+    import account_stats
+    import archive
+    import dedup
+    import events
+    import http_cache
+    import ingestion
+    import mention_records
+    import mention_store
+    import metrics
+    import post_cache
+    import post_state
+    import sentiment_engine
+    import shards
+    import stream_monitor
+    import triage
+    from clients import get_async_supabase, get_supabase
+    from opportunity_scoring import load_rules, save_rules, score_opportunities
+    from post_queries import aggregate_posts, query_posts
+    from rate_limiter import reddit_limiter
+    from ttl_cache import invalidate, invalidate_all, stats as ttl_cache_stats, ttl_cache
+    from reddit_oauth import refresh_all_account_stats, router as reddit_oauth_router
 
 app = FastAPI()
 
@@ -39,316 +63,536 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Compress JSON bodies; small responses are not worth the CPU
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
-# Cache for optimizing repeated queries
-@lru_cache(maxsize=32)
+# Supabase and Reddit clients are built on first use, see clients.py
+
+# /recent-mentions and /dashboard-data return the newest mentions of this window, at most
+# DASHBOARD_MAX_POSTS of them; older posts are read page by page through /posts
+DASHBOARD_WINDOW_HOURS = float(os.getenv("DASHBOARD_WINDOW_HOURS", "48"))
+DASHBOARD_MAX_POSTS = int(os.getenv("DASHBOARD_MAX_POSTS", "1000"))
+
+def recent_window(limit=None, since=None):
+    """(limit, since epoch) for a mention read: the request's values, bounded by the dashboard defaults"""
+    limit = DASHBOARD_MAX_POSTS if limit is None else max(1, min(limit, DASHBOARD_MAX_POSTS))
+    since = since.timestamp() if since else time.time() - DASHBOARD_WINDOW_HOURS * 3600
+    return limit, since
+
+def load_recent_mentions(subreddits, limit, since):
+    """The newest mentions in the window, and whether more matched than `limit`"""
+    mentions = mention_records.hot_set.load(subreddits, limit + 1, since)
+    return mentions[:limit], len(mentions) > limit
+
+# Cache for optimizing repeated queries. Invalidations reach every worker via ttl_cache's shared versions.
+CONFIG_CACHE_TTL_SECONDS = int(os.getenv("CONFIG_CACHE_TTL_SECONDS", "300"))
+
+@ttl_cache("subreddits", CONFIG_CACHE_TTL_SECONDS)
 def get_cached_subreddits():
     """Cache subreddits for 5 minutes"""
-    result = supabase.table("monitored_subreddits").select("name").execute()
+    result = metrics.execute(get_supabase().table("monitored_subreddits").select("name"), "monitored_subreddits.select")
     return [row["name"] for row in result.data] if result.data else []
 
-@lru_cache(maxsize=32)
+@ttl_cache("keywords", CONFIG_CACHE_TTL_SECONDS)
 def get_cached_keywords():
     """Cache keywords for 5 minutes"""
-    keywords_result = supabase.table("keywords").select("name").execute()
+    keywords_result = metrics.execute(get_supabase().table("keywords").select("name"), "keywords.select")
     return [row["name"] for row in keywords_result.data] if keywords_result.data else ["Cleverbridge", "Merchant of Record", "MoR", "scaling"]
 
 # Add cache invalidation endpoint
 @app.post("/cache/clear")
 def clear_cache():
-    """Clear the cache when data is updated"""
-    get_cached_subreddits.cache_clear()
-    get_cached_keywords.cache_clear()
+    """Clear the cache when data is updated, in every worker"""
+    invalidate_all()
     return {"message": "Cache cleared"}
 
+@app.get("/cache/stats")
+def cache_stats():
+    """Post and sentiment cache hit/miss counters for the worker that serves the request"""
+    return {"post_cache": post_cache.stats(), "sentiment_cache": sentiment_engine.stats()}
+
 app.add_middleware(SessionMiddleware, secret_key=os.getenv("SESSION_SECRET_KEY"))
+# Outermost, so request latency includes every other middleware
+app.add_middleware(metrics.MetricsMiddleware)
+
+def collect_metrics():
+    """Reddit call and cache counters of this worker, for /metrics"""
+    limiters = [reddit_limiter.stats()] + shards.limiter_stats()
+    samples = [
+        ("reddit_api_calls_total", {}, sum(limiter["acquired"] for limiter in limiters)),
+        ("reddit_rate_limit_waits_total", {}, sum(limiter["waits"] for limiter in limiters)),
+        ("reddit_rate_limit_wait_seconds_total", {}, sum(limiter["wait_seconds"] for limiter in limiters)),
+    ]
+    caches = {"post_cache": post_cache.stats(), "sentiment_cache": sentiment_engine.stats()}
+    caches.update(ttl_cache_stats())
+    for cache, counters in caches.items():
+        for counter, result in (("hits", "hit"), ("stale", "stale"), ("misses", "miss")):
+            if counter in counters:
+                samples.append(("cache_lookups_total", {"cache": cache, "result": result}, counters[counter]))
+    return samples
+
+metrics.register_collector(collect_metrics)
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Latency histograms, Reddit call counts and cache hit ratios of all workers, in Prometheus text format"""
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
+def load_monitoring_config():
+    """Current subreddits and keywords, read straight from Supabase so every worker sees current values"""
+    subreddits_result = metrics.execute(get_supabase().table("monitored_subreddits").select("name"), "monitored_subreddits.select")
+    subreddits = [row["name"] for row in subreddits_result.data] if subreddits_result.data else []
+    keywords_result = metrics.execute(get_supabase().table("keywords").select("name"), "keywords.select")
+    keywords = [row["name"] for row in keywords_result.data] if keywords_result.data else ["Cleverbridge", "Merchant of Record", "MoR", "scaling"]
+    return subreddits, keywords
+
+def run_ingestion_shard(shard):
+    """Background search of one shard of the (subreddit, keyword) pairs"""
+    subreddits, keywords = load_monitoring_config()
+    return ingestion.search_shard(subreddits, keywords, shard, rules=load_rules(get_supabase()))
+
+def run_ingestion():
+    """Background refresh of tracked posts, engagement stats and comments"""
+    subreddits, keywords = load_monitoring_config()
+    result = metrics.execute(post_state.select_active(get_supabase()), "post_state.select")
+    tracked_ids = [row["post_id"] for row in result.data or []]
+    triage.sync_states(result.data)
+    ingestion.refresh_tracked(subreddits, keywords, tracked_ids, rules=load_rules(get_supabase()))
+
+@app.on_event("startup")
+async def start_ingestion():
+    ingestion.start(run_ingestion, run_ingestion_shard)
+    stream_monitor.start(load_monitoring_config, lambda: load_rules(get_supabase()))
+    account_stats.start(refresh_all_account_stats)
+
+@app.on_event("shutdown")
+async def stop_ingestion():
+    stream_monitor.stop()
+    await ingestion.stop()
+    await account_stats.stop()
+
+@app.post("/refresh")
+def refresh_now():
+    """Trigger an ingestion run without waiting for the next scheduled interval"""
+    requested_at = ingestion.request_refresh()
+    last_refreshed = ingestion.last_refreshed_at()
+    return {"success": True, "refresh_requested_at": requested_at, "last_refreshed_at": last_refreshed}
+
+@app.get("/ingestion/shards")
+def ingestion_shards():
+    """Last run of each search shard and the worker currently running it"""
+    return shards.status()
+
+@app.get("/opportunity-rules")
+def get_opportunity_rules(db=Depends(get_supabase)):
+    return load_rules(db)
+
+@app.post("/opportunity-rules")
+async def set_opportunity_rules(request: Request, db=Depends(get_supabase)):
+    """Replace the opportunity rules; POST /opportunity-rules/rescore applies them to stored posts"""
+    rules = await request.json()
+    if not isinstance(rules, dict):
+        return {"success": False, "error": "Expected a rules object"}
+    try:
+        await asyncio.to_thread(save_rules, db, rules)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+    return {"success": True, "rules": rules}
+
+@app.post("/opportunity-rules/rescore")
+def rescore_opportunities(db=Depends(get_supabase)):
+    """Re-apply the current opportunity rules to every stored post"""
+    started = time.perf_counter()
+    # Rules edited straight in Supabase take effect without waiting out the cache
+    load_rules.cache_clear()
+    posts = mention_store.load_all_posts()
+    score_opportunities(posts, load_rules(db))
+    mention_store.save_posts(posts)
+    archive.update_statuses(posts)
+    triage.record(mention_store.load_mentions(), polled=False)
+    return {"success": True, "rescored": len(posts), "seconds": round(time.perf_counter() - started, 3)}
 
 @app.get("/recent-mentions")
-def recent_mentions():
+def recent_mentions(request: Request, limit: Optional[int] = None, since: Optional[datetime] = None,
+                    db=Depends(get_supabase)):
+    """
+    Mentions created in the last DASHBOARD_WINDOW_HOURS (or since `since`), newest first,
+    at most `limit` (DASHBOARD_MAX_POSTS). `truncated` means more matched; use /posts for those.
+    """
+    limit, since = recent_window(limit, since)
+    etag = http_cache.etag_for(request)
+    if http_cache.is_fresh(request, etag):
+        return http_cache.not_modified(etag)
     # Use cached data for better performance
     subreddits = get_cached_subreddits()
-    keywords = get_cached_keywords()
     
     # Get engaged posts
-    engaged_result = supabase.table("engaged_posts").select("post_id").execute()
+    engaged_result = metrics.execute(post_state.select_active(db).eq("state", "engaged"), "post_state.select")
     engaged_ids = set(row["post_id"] for row in engaged_result.data) if engaged_result.data else set()
     
-    results = get_recent_mentions(subreddits, keywords=keywords, limit=25)
-    # Mark engaged posts and identify opportunities
-    opportunity_keywords = ["help", "looking for", "alternative", "recommend", "suggestion", "vs", "compare", 
-                          "switch", "moving from", "pricing", "cost", "expensive", "cheaper","Cleverbridge","Merchant of Record","FastSpring"]
-    
+    # Mentions are fetched and scored (sentiment and opportunity) by the background ingestion worker
+    mentions, truncated = load_recent_mentions(subreddits, limit, since)
+    last_refreshed = ingestion.last_refreshed_at()
+    results = dedup.fold_duplicates(mentions)
     for post in results:
         post["engaged"] = post["id"] in engaged_ids
-        
-    results = analyze_sentiment(results)  # Add sentiment and score to each post
-    
-    # Identify opportunities based on multiple factors
-    for post in results:
-        # Initialize score for opportunity factors
-        opportunity_score = 0
-        
-        # Factor 1: Strong sentiment (either positive or negative)
-        if abs(post["score"]) > 0.5:
-            opportunity_score += 1
-        
-        # Factor 2: High engagement
-        if post["upvotes"] > 5 or post["comments"] > 3:
-            opportunity_score += 1
-            
-        # Factor 3: Keyword matching in title or content
-        post_text = post["title"].lower()
-        if any(keyword in post_text for keyword in opportunity_keywords):
-            opportunity_score += 1
-            
-        # Factor 4: Negative sentiment about competitors
-        competitor_keywords = ["stripe", "fastspring", "paddle", "gumroad"]
-        if post["score"] < -0.2 and any(comp in post_text for comp in competitor_keywords):
-            opportunity_score += 2
-            
-        # Mark as opportunity if meets threshold
-        post["status"] = "opportunity" if opportunity_score >= 2 else post.get("status", "neutral")
     # Calculate average sentiment score
     avg_score = round(sum(post["score"] for post in results) / len(results), 2) if results else 0.0
-    return {"posts": results, "average_sentiment": avg_score}
+    return http_cache.json_response(
+        {"posts": results, "truncated": truncated, "average_sentiment": avg_score,
+         "last_refreshed_at": last_refreshed}, etag)
 
 
 
-@app.post("/flag")
-async def flag_post(request: Request):
+@app.get("/triage")
+def get_triage(request: Request, limit: int = 50):
+    """
+    Un-actioned mentions, highest priority first: opportunity score boosted by engagement
+    velocity and decayed with age (see triage.py). Reads `limit` rows off the queue's index.
+    """
+    etag = http_cache.etag_for(request)
+    if http_cache.is_fresh(request, etag):
+        return http_cache.not_modified(etag)
+    posts = [mention_records.present(post) for post in triage.top(get_cached_subreddits(), limit)]
+    last_refreshed = ingestion.last_refreshed_at()
+    return http_cache.json_response({"posts": posts, "last_refreshed_at": last_refreshed}, etag)
+
+@app.get("/events")
+async def event_feed(request: Request, last_event_id: Optional[int] = None):
+    """
+    Server-Sent Events feed of new mentions, flag/engage/ignore changes and stats deltas.
+    Browsers resume after a reconnect via the Last-Event-ID header; `last_event_id` does
+    the same for clients that cannot set headers.
+    """
+    header = request.headers.get("last-event-id", "")
+    if last_event_id is None and header.isdigit():
+        last_event_id = int(header)
+    return StreamingResponse(
+        events.stream(last_event_id, request.is_disconnected),
+        media_type="text/event-stream",
+        # identity keeps GZipMiddleware from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "Content-Encoding": "identity"},
+    )
+
+async def update_post_states(db, items):
+    """Apply {id, state, active} changes in one upsert and publish the ones that took effect"""
+    changes = post_state.parse_changes(items)
+    applied = await post_state.apply_changes(db, changes)
+    if applied:
+        await asyncio.to_thread(triage.apply_state_changes, applied)
+        await asyncio.to_thread(invalidate, "post_state")
+    await asyncio.to_thread(events.publish_state_changes, applied)
+    return changes, applied
+
+@app.post("/posts/state")
+async def set_post_states(request: Request, db=Depends(get_async_supabase)):
+    """
+    Bulk triage: body is a list of {"id", "state", "active"} with state one of flagged,
+    engaged or ignored and active defaulting to true. Repeats are no-ops.
+    """
     data = await request.json()
-    post_id = data.get("id")
-    supabase.table("flagged_posts").insert({"post_id": post_id}).execute()
+    items = data.get("changes") if isinstance(data, dict) else data
+    try:
+        changes, applied = await update_post_states(db, items)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"success": False, "error": str(e)})
+    return {"success": True, "applied": len(applied), "unchanged": len(changes) - len(applied)}
+
+async def set_single_state(request: Request, db, state, active):
+    data = await request.json()
+    try:
+        await update_post_states(db, [{"id": data.get("id"), "state": state, "active": active}])
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
     return {"success": True}
 
+def get_state_ids(request: Request, db, state):
+    etag = http_cache.etag_for(request)
+    if http_cache.is_fresh(request, etag):
+        return http_cache.not_modified(etag)
+    result = metrics.execute(post_state.select_active(db).eq("state", state), "post_state.select")
+    return http_cache.json_response([row["post_id"] for row in result.data], etag)
+
+@app.post("/flag")
+async def flag_post(request: Request, db=Depends(get_async_supabase)):
+    return await set_single_state(request, db, "flagged", True)
+
 @app.get("/flagged")
-def get_flagged():
-    result = supabase.table("flagged_posts").select("post_id").execute()
-    ids = [row["post_id"] for row in result.data]
-    return ids
+def get_flagged(request: Request, db=Depends(get_supabase)):
+    return get_state_ids(request, db, "flagged")
 
 @app.post("/engage")
-async def engage_post(request: Request):
-    data = await request.json()
-    post_id = data.get("id")
-    supabase.table("engaged_posts").insert({"post_id": post_id}).execute()
-    return {"success": True}
+async def engage_post(request: Request, db=Depends(get_async_supabase)):
+    return await set_single_state(request, db, "engaged", True)
 
 @app.get("/engaged")
-def get_engaged():
-    result = supabase.table("engaged_posts").select("post_id").execute()
-    ids = [row["post_id"] for row in result.data]
-    return ids
+def get_engaged(request: Request, db=Depends(get_supabase)):
+    return get_state_ids(request, db, "engaged")
 
 @app.post("/unengage")
-async def unengage_post(request: Request):
-    data = await request.json()
-    post_id = data.get("id")
-    supabase.table("engaged_posts").delete().eq("post_id", post_id).execute()
-    return {"success": True}
+async def unengage_post(request: Request, db=Depends(get_async_supabase)):
+    return await set_single_state(request, db, "engaged", False)
 
 @app.post("/ignore")
-async def ignore_post(request: Request):
-    data = await request.json()
-    post_id = data.get("id")
-    supabase.table("ignored_posts").insert({"post_id": post_id}).execute()
-    return {"success": True}
+async def ignore_post(request: Request, db=Depends(get_async_supabase)):
+    return await set_single_state(request, db, "ignored", True)
 
 @app.get("/ignored")
-def get_ignored():
-    result = supabase.table("ignored_posts").select("post_id").execute()
-    ids = [row["post_id"] for row in result.data]
-    return ids
+def get_ignored(request: Request, db=Depends(get_supabase)):
+    return get_state_ids(request, db, "ignored")
 
 @app.post("/unignore")
-async def unignore_post(request: Request):
-    data = await request.json()
-    post_id = data.get("id")
-    supabase.table("ignored_posts").delete().eq("post_id", post_id).execute()
-    return {"success": True}
+async def unignore_post(request: Request, db=Depends(get_async_supabase)):
+    return await set_single_state(request, db, "ignored", False)
 
 @app.post("/monitored-subreddits")
-async def add_monitored_subreddit(request: Request):
+async def add_monitored_subreddit(request: Request, db=Depends(get_supabase)):
     data = await request.json()
     subreddit = data.get("subreddit")
     if subreddit:
-        supabase.table("monitored_subreddits").insert({"name": subreddit}).execute()
+        metrics.execute(db.table("monitored_subreddits").insert({"name": subreddit}), "monitored_subreddits.insert")
         # Clear cache after modification
-        get_cached_subreddits.cache_clear()
+        await asyncio.to_thread(get_cached_subreddits.cache_clear)
+        # Rebalance the shards and search the new pairs now rather than at the next interval
+        await asyncio.to_thread(ingestion.request_refresh)
         return {"success": True}
     return {"success": False, "error": "Missing subreddit"}
 
 @app.delete("/monitored-subreddits/{subreddit}")
-def remove_monitored_subreddit(subreddit: str):
+def remove_monitored_subreddit(subreddit: str, db=Depends(get_supabase)):
     # Case-insensitive match for subreddit name
-    result = supabase.table("monitored_subreddits").delete().ilike("name", subreddit).execute()
+    result = metrics.execute(db.table("monitored_subreddits").delete().ilike("name", subreddit), "monitored_subreddits.delete")
     # Clear cache after modification
     get_cached_subreddits.cache_clear()
+    ingestion.request_refresh()
     # Always return success if request completes
     return {"success": True}
 
 @app.get("/monitored-subreddits")
-def get_monitored_subreddits():
-    result = supabase.table("monitored_subreddits").select("name").execute()
+def get_monitored_subreddits(db=Depends(get_supabase)):
+    result = metrics.execute(db.table("monitored_subreddits").select("name"), "monitored_subreddits.select")
     subreddits = [row["name"] for row in result.data]
     return subreddits
 
 # Keywords management endpoints
 @app.post("/keywords")
-async def add_keyword(request: Request):
+async def add_keyword(request: Request, db=Depends(get_supabase)):
     data = await request.json()
     keyword = data.get("keyword")
     if keyword:
-        supabase.table("keywords").insert({"name": keyword}).execute()
+        metrics.execute(db.table("keywords").insert({"name": keyword}), "keywords.insert")
         # Clear cache after modification
-        get_cached_keywords.cache_clear()
+        await asyncio.to_thread(get_cached_keywords.cache_clear)
+        # Rebalance the shards and search the new pairs now rather than at the next interval
+        await asyncio.to_thread(ingestion.request_refresh)
         return {"success": True}
     return {"success": False, "error": "Missing keyword"}
 
 @app.delete("/keywords/{keyword}")
-def remove_keyword(keyword: str):
+def remove_keyword(keyword: str, db=Depends(get_supabase)):
     # Case-insensitive match for keyword name
-    result = supabase.table("keywords").delete().ilike("name", keyword).execute()
+    result = metrics.execute(db.table("keywords").delete().ilike("name", keyword), "keywords.delete")
     # Clear cache after modification
     get_cached_keywords.cache_clear()
+    ingestion.request_refresh()
     return {"success": True}
 
 @app.get("/keywords")
-def get_keywords():
-    result = supabase.table("keywords").select("name").execute()
+def get_keywords(db=Depends(get_supabase)):
+    result = metrics.execute(db.table("keywords").select("name"), "keywords.select")
     keywords = [row["name"] for row in result.data]
     # Return default keywords if none are stored in database
     if not keywords:
         return ["Cleverbridge", "Merchant of Record", "MoR", "scaling"]
     return keywords
 
+async def timed(timings, name, awaitable):
+    """Await `awaitable` and record how long it took, in ms, under `name`"""
+    started = time.perf_counter()
+    try:
+        with metrics.span(f"dashboard.{name}"):
+            return await awaitable
+    finally:
+        timings[name] = (time.perf_counter() - started) * 1000
+
+def server_timing(timings):
+    """Format stage timings as a Server-Timing header value"""
+    return ", ".join(f"{name};dur={duration:.1f}" for name, duration in timings.items())
+
+async def fetch_post_state_ids(db):
+    """Flagged, ignored and engaged post IDs from one post_state read"""
+    result = await metrics.execute_async(post_state.select_active(db), "post_state.select")
+    return post_state.split_by_state(result.data)
+
+@app.get("/posts")
+async def list_posts(
+    request: Request,
+    status: Optional[str] = None,
+    sentiment: Optional[str] = None,
+    subreddit: Optional[str] = None,
+    keyword: Optional[str] = None,
+    state: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    sort: str = "created_utc",
+    order: str = "desc",
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    include_duplicates: bool = False,
+    db=Depends(get_async_supabase),
+):
+    """
+    Paginated dashboard posts, filtered and sorted server-side. `state` is one of
+    flagged, engaged, ignored or untriaged. Pass the returned next_cursor to get the next page.
+    Near-duplicates of another post are left out unless include_duplicates is set.
+    """
+    etag = await asyncio.to_thread(http_cache.etag_for, request)
+    if http_cache.is_fresh(request, etag):
+        return http_cache.not_modified(etag)
+    subreddits, (flagged_ids, ignored_ids, engaged_ids) = await asyncio.gather(
+        asyncio.to_thread(get_cached_subreddits), fetch_post_state_ids(db))
+    state_ids = {"flagged": flagged_ids, "engaged": engaged_ids, "ignored": ignored_ids}
+    tracked_ids = flagged_ids + engaged_ids + ignored_ids
+    filters = {
+        "status": status,
+        "sentiment": sentiment,
+        "subreddit": subreddit,
+        "keyword": keyword,
+        "since": since.timestamp() if since else None,
+        "until": until.timestamp() if until else None,
+        "include_duplicates": include_duplicates,
+    }
+    if state == "untriaged":
+        filters["exclude_ids"] = tracked_ids
+    elif state in state_ids:
+        filters["include_ids"] = state_ids[state]
+    elif state:
+        return JSONResponse(status_code=400, content={"error": "state must be flagged, engaged, ignored or untriaged"})
+
+    try:
+        (posts, next_cursor), stats = await asyncio.gather(
+            asyncio.to_thread(query_posts, subreddits, tracked_ids, filters, sort, order, limit, cursor),
+            asyncio.to_thread(aggregate_posts, subreddits, tracked_ids, filters),
+        )
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    engaged_set = set(engaged_ids)
+    for post in posts:
+        mention_records.present(post)
+        post["engaged"] = post["id"] in engaged_set
+    stats.update({
+        "flagged_count": len(flagged_ids),
+        "ignored_count": len(ignored_ids),
+        "engaged_count": len(engaged_ids),
+    })
+    return http_cache.json_response({"posts": posts, "next_cursor": next_cursor, "stats": stats}, etag)
+
+@app.get("/trends")
+def get_trends(
+    request: Request,
+    granularity: str = "day",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    subreddit: Optional[str] = None,
+    keyword: Optional[str] = None,
+):
+    """
+    Mention count, mean and p10/p50/p90 compound score and opportunity count per hour or
+    day, read from the archive rollups. Defaults to the last 30 days across all subreddits
+    and keywords.
+    """
+    etag = http_cache.etag_for(request)
+    if http_cache.is_fresh(request, etag):
+        return http_cache.not_modified(etag)
+    try:
+        result = archive.trends(
+            granularity,
+            since.timestamp() if since else None,
+            until.timestamp() if until else None,
+            subreddit,
+            keyword,
+        )
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    return http_cache.json_response(result, etag)
+
 @app.get("/dashboard-data")
-def get_dashboard_data():
-    """Single endpoint that returns all dashboard data to reduce API calls"""
+async def get_dashboard_data(request: Request, response: Response, limit: Optional[int] = None,
+                             since: Optional[datetime] = None, db=Depends(get_async_supabase)):
+    """
+    Single endpoint that returns all dashboard data to reduce API calls. Posts are the
+    recent mentions windowed like /recent-mentions, plus every flagged, engaged and
+    ignored post; stats cover all stored posts.
+    """
+    limit, since = recent_window(limit, since)
+    timings = {}
+    started = time.perf_counter()
     try:
-        # Get all data in parallel
-        subreddits = get_cached_subreddits()
-        keywords = get_cached_keywords()
-        
-        # Get flagged posts
-        flagged_result = supabase.table("flagged_posts").select("post_id").execute()
-        flagged_ids = [row["post_id"] for row in flagged_result.data] if flagged_result.data else []
-        
-        # Get ignored posts
-        ignored_result = supabase.table("ignored_posts").select("post_id").execute()
-        ignored_ids = [row["post_id"] for row in ignored_result.data] if ignored_result.data else []
-        
-        # Get engaged posts
-        engaged_result = supabase.table("engaged_posts").select("post_id").execute()
-        engaged_ids = [row["post_id"] for row in engaged_result.data] if engaged_result.data else []
-        
-        # Get recent mentions
-        mentions = get_recent_mentions(subreddits, keywords=keywords, limit=25)
-        mentions = analyze_sentiment(mentions)
-        
-        # Mark engaged posts in recent mentions
-        for post in mentions:
-            post["engaged"] = post["id"] in engaged_ids
-        
-        # Get flagged posts that might not be in recent mentions
-        flagged_posts = []
-        if flagged_ids:
-            # Filter out flagged posts that are already in recent mentions
-            recent_post_ids = {post["id"] for post in mentions}
-            missing_flagged_ids = [fid for fid in flagged_ids if fid not in recent_post_ids]
-            
-            if missing_flagged_ids:
-                flagged_posts = get_posts_by_ids(missing_flagged_ids)
-                flagged_posts = analyze_sentiment(flagged_posts)
-                # Mark engaged status for flagged posts
-                for post in flagged_posts:
-                    post["engaged"] = post["id"] in engaged_ids
-        
-        # Get engaged posts that might not be in recent mentions or flagged posts
-        engaged_posts = []
-        if engaged_ids:
-            # Filter out engaged posts that are already in recent mentions or flagged posts
-            existing_post_ids = {post["id"] for post in mentions + flagged_posts}
-            missing_engaged_ids = [eid for eid in engaged_ids if eid not in existing_post_ids]
-            
-            if missing_engaged_ids:
-                engaged_posts = get_posts_by_ids(missing_engaged_ids)
-                engaged_posts = analyze_sentiment(engaged_posts)
-                # Mark engaged status for engaged posts
-                for post in engaged_posts:
-                    post["engaged"] = True
-        
-        # Get ignored posts that might not be in recent mentions, flagged posts, or engaged posts
-        ignored_posts = []
-        if ignored_ids:
-            # Filter out ignored posts that are already in recent mentions, flagged posts, or engaged posts
-            existing_post_ids = {post["id"] for post in mentions + flagged_posts + engaged_posts}
-            missing_ignored_ids = [iid for iid in ignored_ids if iid not in existing_post_ids]
-            
-            if missing_ignored_ids:
-                ignored_posts = get_posts_by_ids(missing_ignored_ids)
-                ignored_posts = analyze_sentiment(ignored_posts)
-                # Mark engaged status for ignored posts
-                for post in ignored_posts:
-                    post["engaged"] = post["id"] in engaged_ids
-        
-        # Combine recent mentions with missing flagged, engaged, and ignored posts
-        all_posts = mentions + flagged_posts + engaged_posts + ignored_posts
-        
-        # Apply opportunity detection logic to all posts
-        opportunity_keywords = ["help", "looking for", "alternative", "recommend", "suggestion", "vs", "compare", 
-                              "switch", "moving from", "pricing", "cost", "expensive", "cheaper"]
-        competitor_keywords = ["stripe", "fastspring", "paddle", "gumroad"]
-        
+        # Unchanged since the client's last poll: skip the reads and the body
+        etag = await timed(timings, "etag", asyncio.to_thread(http_cache.etag_for, request))
+        if http_cache.is_fresh(request, etag):
+            not_modified = http_cache.not_modified(etag)
+            not_modified.headers["Server-Timing"] = server_timing(timings)
+            return not_modified
+
+        # Independent reads run concurrently; mentions only wait for the subreddit list
+        subreddits_task = asyncio.ensure_future(timed(timings, "subreddits", asyncio.to_thread(get_cached_subreddits)))
+
+        async def load_mentions():
+            subreddits = await subreddits_task
+            return await asyncio.to_thread(load_recent_mentions, subreddits, limit, since)
+
+        (subreddits, keywords, (flagged_ids, ignored_ids, engaged_ids), (mentions, truncated),
+         last_refreshed) = await asyncio.gather(
+            subreddits_task,
+            timed(timings, "keywords", asyncio.to_thread(get_cached_keywords)),
+            timed(timings, "post_states", fetch_post_state_ids(db)),
+            timed(timings, "mentions", load_mentions()),
+            timed(timings, "last_refreshed", asyncio.to_thread(ingestion.last_refreshed_at)),
+        )
+        engaged_set = set(engaged_ids)
+        tracked_ids = dict.fromkeys(flagged_ids + engaged_ids + ignored_ids)
+
+        # Flagged, engaged and ignored posts that are not among the recent mentions, in one store read
+        posts_by_id = {post["id"]: post for post in mentions}
+        missing_ids = [pid for pid in tracked_ids if pid not in posts_by_id]
+        if missing_ids:
+            tracked_posts = await timed(timings, "tracked_posts", asyncio.to_thread(mention_store.load_posts, missing_ids))
+            posts_by_id.update((post["id"], mention_records.present(post)) for post in tracked_posts)
+
+        # Recent mentions plus the missing flagged, engaged, and ignored posts.
+        # Opportunity status was set by opportunity_scoring at ingestion time.
+        # Near-duplicates are listed under their canonical post
+        all_posts = dedup.fold_duplicates(posts_by_id, keep_ids=tracked_ids)
         for post in all_posts:
-            # Initialize score for opportunity factors
-            opportunity_score = 0
-            
-            # Factor 1: Strong sentiment (either positive or negative)
-            if abs(post["score"]) > 0.5:
-                opportunity_score += 1
-            
-            # Factor 2: High engagement
-            if post["upvotes"] > 5 or post["comments"] > 3:
-                opportunity_score += 1
-                
-            # Factor 3: Keyword matching in title or content
-            post_text = post["title"].lower()
-            if any(keyword in post_text for keyword in opportunity_keywords):
-                opportunity_score += 1
-                
-            # Factor 4: Negative sentiment about competitors
-            if post["score"] < -0.2 and any(comp in post_text for comp in competitor_keywords):
-                opportunity_score += 2
-                
-            # Mark as opportunity if meets threshold
-            post["status"] = "opportunity" if opportunity_score >= 2 else post.get("status", "neutral")
+            post["engaged"] = post["id"] in engaged_set
         
-        # Calculate stats
-        avg_score = round(sum(post["score"] for post in all_posts) / len(all_posts), 2) if all_posts else 0.0
-        opportunities = len([m for m in all_posts if m.get("status") == "opportunity"])
+        # Calculate stats with an aggregate query over the same post set
+        stats = await timed(timings, "stats", asyncio.to_thread(aggregate_posts, subreddits, list(tracked_ids)))
+        avg_score = stats["average_sentiment"]
+        timings["total"] = (time.perf_counter() - started) * 1000
         
-        return {
+        return http_cache.json_response({
             "posts": all_posts,
+            "truncated": truncated,
             "average_sentiment": avg_score,
             "flagged_ids": flagged_ids,
             "ignored_ids": ignored_ids,
             "engaged_ids": engaged_ids,
             "monitored_subreddits": subreddits,
             "keywords": keywords,
+            "last_refreshed_at": last_refreshed,
             "stats": {
-                "total_mentions": len(all_posts),
+                "total_mentions": stats["total_mentions"],
                 "flagged_count": len(flagged_ids),
                 "ignored_count": len(ignored_ids),
                 "engaged_count": len(engaged_ids),
-                "opportunities": opportunities,
+                "opportunities": stats["opportunities"],
                 "average_sentiment": avg_score
             }
-        }
+        }, etag, headers={"Server-Timing": server_timing(timings)})
     except Exception as e:
+        response.headers["Server-Timing"] = server_timing(timings)
         return {"error": str(e), "posts": [], "average_sentiment": 0}
 
 @app.post("/api/login")
@@ -0,0 +1,157 @@
+import datetime
+import functools
+import json
+import sys
+import threading
+import time
+
+# Try relative imports first (for local development), fall back to absolute (for Railway)
+try:
+    from . import mention_store
+except ImportError:
+    import mention_store
+
+REDDIT_URL = "https://reddit.com"
+CREATED_AT_FORMAT = "%b %d, %Y, %I:%M %p UTC"
+# Rows written this long before the last sync are read again, in case their transaction
+# committed after it; longer than the store's 30 s lock timeout
+SYNC_OVERLAP_SECONDS = 60
+
+# Mentions move through ingestion as plain dicts and are stored with raw values only:
+# epoch `created_utc` and the Reddit `permalink`. present() adds the display fields
+# (`createdAt`, `url`) when a post leaves the API.
+
+
+@functools.lru_cache(maxsize=65536)
+def _format_minute(minute):
+    return datetime.datetime.fromtimestamp(minute * 60, datetime.timezone.utc).strftime(CREATED_AT_FORMAT)
+
+
+def format_created_at(created_utc):
+    # The format stops at minutes, so posts from the same minute share one string
+    return _format_minute(int(created_utc // 60))
+
+
+def present(post):
+    """Turn a stored mention dict into its API shape, in place: add `createdAt`, swap `permalink` for `url`"""
+    if "createdAt" not in post and post.get("created_utc") is not None:
+        post["createdAt"] = format_created_at(post["created_utc"])
+    permalink = post.pop("permalink", None)
+    if "url" not in post and permalink:
+        post["url"] = REDDIT_URL + permalink
+    return post
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Mention:
+    """
+    Compact in-process form of a stored mention. Repeated strings (subreddit, author,
+    labels, keywords) are interned and fields outside the common set go to `extra`, so a
+    record costs a fraction of the equivalent dict.
+    """
+
+    __slots__ = ("id", "subreddit", "title", "author", "sentiment", "score", "upvotes", "comments",
+                 "created_utc", "status", "keywords", "permalink", "opportunity_score", "extra")
+    _FIELDS = frozenset(__slots__) - {"extra"}
+
+    @classmethod
+    def from_dict(cls, post):
+        record = cls()
+        record.id = post["id"]
+        record.subreddit = _intern(post.get("subreddit"))
+        record.title = post.get("title", "")
+        record.author = _intern(post.get("author"))
+        record.sentiment = _intern(post.get("sentiment"))
+        record.score = post.get("score")
+        record.upvotes = post.get("upvotes")
+        record.comments = post.get("comments")
+        record.created_utc = post.get("created_utc")
+        record.status = _intern(post.get("status"))
+        record.keywords = tuple(_intern(keyword) for keyword in post.get("keywords") or ())
+        # Posts stored before permalinks were kept carry the full URL instead
+        url = post.get("url") or ""
+        record.permalink = post.get("permalink") or (url[len(REDDIT_URL):] if url.startswith(REDDIT_URL) else None)
+        record.opportunity_score = post.get("opportunity_score")
+        extra = {key: value for key, value in post.items()
+                 if key not in cls._FIELDS and key not in ("createdAt", "url")}
+        record.extra = extra or None
+        return record
+
+    def to_dict(self):
+        """A new mention dict with the display fields, for the API"""
+        post = {
+            "id": self.id,
+            "subreddit": self.subreddit,
+            "title": self.title,
+            "author": self.author,
+            "sentiment": self.sentiment,
+            "score": self.score,
+            "upvotes": self.upvotes,
+            "comments": self.comments,
+            "created_utc": self.created_utc,
+            "status": self.status,
+            "keywords": list(self.keywords),
+        }
+        if self.created_utc is not None:
+            post["createdAt"] = format_created_at(self.created_utc)
+        if self.permalink:
+            post["url"] = REDDIT_URL + self.permalink
+        if self.opportunity_score is not None:
+            post["opportunity_score"] = self.opportunity_score
+        if self.extra:
+            post.update(self.extra)
+        return post
+
+
+class HotSet:
+    """
+    Every stored mention as Mention records, shared by the requests of one worker. The
+    store's data version tells when to sync; a sync reads only rows written since the
+    last one, and drops records whose post was pruned.
+    """
+
+    def __init__(self):
+        self._records = {}
+        self._newest_first = []
+        self._version = None
+        self._synced_at = 0.0
+        self._lock = threading.Lock()
+
+    def _sync(self):
+        version = mention_store.data_version()
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            started = time.time()
+            for post_id, data in mention_store.changed_mentions(self._synced_at - SYNC_OVERLAP_SECONDS):
+                self._records[post_id] = Mention.from_dict(json.loads(data))
+            if len(self._records) != mention_store.mention_count():
+                stored = mention_store.mention_ids()
+                self._records = {post_id: record for post_id, record in self._records.items() if post_id in stored}
+            self._newest_first = sorted(self._records.values(), key=lambda record: record.created_utc or 0, reverse=True)
+            self._version, self._synced_at = version, started
+
+    def load(self, subreddits=None, limit=None, since=None):
+        """
+        Mention dicts, newest first, optionally limited to the given subreddits, to posts
+        created at or after `since` and to the newest `limit`, like mention_store.load_mentions
+        """
+        self._sync()
+        names = {f"r/{name}".lower() for name in subreddits} if subreddits is not None else None
+        posts = []
+        for record in self._newest_first:
+            if limit is not None and len(posts) >= limit:
+                break
+            if since is not None and (record.created_utc or 0) < since:
+                break  # Newest first, so everything after this is older too
+            if names is None or (record.subreddit or "").lower() in names:
+                posts.append(record.to_dict())
+        return posts
+
+
+hot_set = HotSet()
@@ -0,0 +1,306 @@
+import os
+import json
+import sqlite3
+import time
+from contextlib import contextmanager
+
+# Local SQLite store for ingested mentions. Shared by all uvicorn workers on the
+# same host, so the API can serve pre-scored posts without calling Reddit.
+STORE_PATH = os.getenv("LOCAL_STORE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "local_store.db"))
+MENTION_RETENTION_DAYS = int(os.getenv("MENTION_RETENTION_DAYS", "30"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    id TEXT PRIMARY KEY,
+    subreddit TEXT,
+    sentiment TEXT,
+    score REAL,
+    upvotes INTEGER,
+    comments INTEGER,
+    status TEXT,
+    created_utc REAL,
+    is_mention INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_posts_mention_created ON posts (is_mention, created_utc DESC);
+CREATE INDEX IF NOT EXISTS idx_posts_created ON posts (created_utc, id);
+CREATE INDEX IF NOT EXISTS idx_posts_score ON posts (score, id);
+CREATE INDEX IF NOT EXISTS idx_posts_upvotes ON posts (upvotes, id);
+CREATE INDEX IF NOT EXISTS idx_posts_comments ON posts (comments, id);
+CREATE INDEX IF NOT EXISTS idx_posts_subreddit ON posts (lower(subreddit));
+CREATE TABLE IF NOT EXISTS post_keywords (
+    post_id TEXT NOT NULL,
+    keyword TEXT NOT NULL,
+    PRIMARY KEY (keyword, post_id)
+);
+CREATE INDEX IF NOT EXISTS idx_post_keywords_post ON post_keywords (post_id);
+INSERT OR IGNORE INTO post_keywords (post_id, keyword)
+    SELECT posts.id, lower(kw.value) FROM posts, json_each(posts.data, '$.keywords') AS kw
+    WHERE NOT EXISTS (SELECT 1 FROM post_keywords);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+# Other modules add their own tables to the store through register_schema()
+_schemas = [SCHEMA]
+_initialized = set()
+
+
+def register_schema(schema):
+    """Add tables that are created alongside the store's own schema"""
+    if schema not in _schemas:
+        _schemas.append(schema)
+        _initialized.clear()
+
+
+@contextmanager
+def connect():
+    """Open a connection to the local store, creating the schema on first use.
+    Commits on success and always closes the connection."""
+    conn = sqlite3.connect(STORE_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        if STORE_PATH not in _initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for schema in _schemas:
+                conn.executescript(schema)
+            _initialized.add(STORE_PATH)
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _bump_data_version(conn):
+    conn.execute(
+        """
+        INSERT INTO meta (key, value) VALUES ('data_version', '1')
+        ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+        """
+    )
+
+
+def data_version():
+    """Counter bumped by every write to the stored posts, in any worker"""
+    return int(get_meta("data_version", "0"))
+
+
+def save_posts(posts, is_mention=False):
+    """
+    Upsert scored post dicts. Posts stored as mentions stay mentions. Returns the IDs that
+    were not stored before; concurrent writers never both see the same post as new.
+    """
+    now = time.time()
+    rows = [
+        (
+            post["id"],
+            post.get("subreddit"),
+            post.get("sentiment"),
+            post.get("score"),
+            post.get("upvotes"),
+            post.get("comments"),
+            post.get("status"),
+            post.get("created_utc"),
+            1 if is_mention else 0,
+            now,
+            json.dumps(post),
+        )
+        for post in posts
+    ]
+    with connect() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        post_ids = [post["id"] for post in posts]
+        known = set()
+        for i in range(0, len(post_ids), 500):
+            chunk = post_ids[i:i + 500]
+            found = conn.execute(f"SELECT id FROM posts WHERE id IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+            known.update(row["id"] for row in found)
+        conn.executemany(
+            """
+            INSERT INTO posts (id, subreddit, sentiment, score, upvotes, comments, status,
+                               created_utc, is_mention, updated_at, data)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                subreddit = excluded.subreddit,
+                sentiment = excluded.sentiment,
+                score = excluded.score,
+                upvotes = excluded.upvotes,
+                comments = excluded.comments,
+                status = excluded.status,
+                created_utc = COALESCE(excluded.created_utc, posts.created_utc),
+                is_mention = MAX(posts.is_mention, excluded.is_mention),
+                updated_at = excluded.updated_at,
+                data = excluded.data
+            """,
+            rows,
+        )
+        # Keep the keyword index in step with each post's keyword list
+        conn.executemany("DELETE FROM post_keywords WHERE post_id = ?", [(post["id"],) for post in posts])
+        conn.executemany(
+            "INSERT OR IGNORE INTO post_keywords (post_id, keyword) VALUES (?, ?)",
+            [(post["id"], keyword.lower()) for post in posts for keyword in post.get("keywords") or []],
+        )
+        _bump_data_version(conn)
+    return set(post_ids) - known
+
+
+def load_mentions(subreddits=None, limit=None, since=None):
+    """
+    Return stored mentions, newest first, optionally limited to the given subreddits, to
+    posts created at or after `since` (epoch seconds) and to the newest `limit`
+    """
+    query = "SELECT data FROM posts WHERE is_mention = 1"
+    params = []
+    if subreddits is not None:
+        names = [f"r/{name}".lower() for name in subreddits]
+        query += f" AND lower(subreddit) IN ({','.join('?' * len(names))})"
+        params.extend(names)
+    if since is not None:
+        query += " AND created_utc >= ?"
+        params.append(since)
+    query += " ORDER BY created_utc DESC"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+    with connect() as conn:
+        rows = conn.execute(query, params).fetchall()
+    return [json.loads(row["data"]) for row in rows]
+
+
+def changed_mentions(since):
+    """(id, data) of mentions written at or after `since`"""
+    with connect() as conn:
+        rows = conn.execute("SELECT id, data FROM posts WHERE is_mention = 1 AND updated_at >= ?", (since,)).fetchall()
+    return [(row["id"], row["data"]) for row in rows]
+
+
+def mention_ids():
+    with connect() as conn:
+        return {row["id"] for row in conn.execute("SELECT id FROM posts WHERE is_mention = 1")}
+
+
+def mention_count():
+    with connect() as conn:
+        return conn.execute("SELECT COUNT(*) FROM posts WHERE is_mention = 1").fetchone()[0]
+
+
+def load_all_posts():
+    """Every stored post, mentions and tracked posts alike"""
+    with connect() as conn:
+        rows = conn.execute("SELECT data FROM posts").fetchall()
+    return [json.loads(row["data"]) for row in rows]
+
+
+def load_posts(post_ids):
+    """Return stored posts for the given IDs, skipping any that are not stored yet"""
+    post_ids = list(post_ids)
+    posts = []
+    with connect() as conn:
+        # Stay well below SQLite's bound-parameter limit
+        for i in range(0, len(post_ids), 500):
+            chunk = post_ids[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT id, data FROM posts WHERE id IN ({placeholders})", chunk
+            ).fetchall()
+            posts.extend(rows)
+    by_id = {row["id"]: json.loads(row["data"]) for row in posts}
+    return [by_id[pid] for pid in post_ids if pid in by_id]
+
+
+def recent_mention_ids(since_utc):
+    """IDs of stored mentions created after `since_utc`"""
+    with connect() as conn:
+        rows = conn.execute(
+            "SELECT id FROM posts WHERE is_mention = 1 AND created_utc > ?", (since_utc,)
+        ).fetchall()
+    return [row["id"] for row in rows]
+
+
+def written_before(post_ids, before):
+    """The stored `post_ids` last written before `before`, in the given order"""
+    post_ids = list(post_ids)
+    stale = set()
+    with connect() as conn:
+        for i in range(0, len(post_ids), 500):
+            chunk = post_ids[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT id FROM posts WHERE id IN ({placeholders}) AND updated_at < ?", chunk + [before]
+            ).fetchall()
+            stale.update(row["id"] for row in rows)
+    return [pid for pid in post_ids if pid in stale]
+
+
+def update_stats(posts):
+    """Refresh upvotes/comments of stored posts without touching their scores"""
+    with connect() as conn:
+        conn.executemany(
+            """
+            UPDATE posts SET upvotes = ?, comments = ?, updated_at = ?,
+                data = json_set(data, '$.upvotes', ?, '$.comments', ?)
+            WHERE id = ?
+            """,
+            [(p["upvotes"], p["comments"], time.time(), p["upvotes"], p["comments"], p["id"]) for p in posts],
+        )
+        _bump_data_version(conn)
+
+
+def prune_mentions(keep_ids=()):
+    """Drop mentions older than the retention window unless they are still tracked"""
+    cutoff = time.time() - MENTION_RETENTION_DAYS * 86400
+    keep_ids = list(keep_ids)
+    with connect() as conn:
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS keep_ids (id TEXT PRIMARY KEY)")
+        conn.execute("DELETE FROM keep_ids")
+        conn.executemany("INSERT OR IGNORE INTO keep_ids (id) VALUES (?)", [(pid,) for pid in keep_ids])
+        deleted = conn.execute(
+            "DELETE FROM posts WHERE created_utc < ? AND id NOT IN (SELECT id FROM keep_ids)",
+            (cutoff,),
+        ).rowcount
+        if deleted:
+            conn.execute("DELETE FROM post_keywords WHERE post_id NOT IN (SELECT id FROM posts)")
+            _bump_data_version(conn)
+
+
+def set_meta(key, value):
+    with connect() as conn:
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+
+
+def get_meta(key, default=None):
+    with connect() as conn:
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row["value"] if row else default
+
+
+def acquire_lease(name, owner, ttl_seconds):
+    """Take or renew a named lease. Returns True if `owner` holds it afterwards."""
+    now = time.time()
+    with connect() as conn:
+        conn.execute(
+            """
+            INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+            WHERE leases.expires_at < ? OR leases.owner = excluded.owner
+            """,
+            (name, owner, now + ttl_seconds, now),
+        )
+        row = conn.execute("SELECT owner FROM leases WHERE name = ?", (name,)).fetchone()
+    return row is not None and row["owner"] == owner
+
+
+def release_lease(name, owner):
+    with connect() as conn:
+        conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
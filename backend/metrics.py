@@ -0,0 +1,341 @@
+import asyncio
+import bisect
+import contextvars
+import functools
+import inspect
+import json
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import parse_qs
+
+from starlette.responses import JSONResponse
+
+# Try relative imports first (for local development), fall back to absolute (for Railway)
+try:
+    from . import mention_store
+except ImportError:
+    import mention_store
+
+try:
+    # Optional: adds a sampled call-stack breakdown to ?profile=1 responses
+    from pyinstrument import Profiler
+except ImportError:
+    Profiler = None
+
+# Latency histogram buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Each worker publishes its metrics to the local store at most this often; /metrics sums
+# the snapshots of all workers, so a scrape sees the whole deployment whichever worker serves it
+METRICS_FLUSH_SECONDS = int(os.getenv("METRICS_FLUSH_SECONDS", "15"))
+# Snapshots of workers that stopped reporting are dropped after this long
+METRICS_WORKER_TTL_SECONDS = 3600
+# ?profile=1 returns a timing breakdown instead of the response; opt-in, since it lets any
+# client see internal stage names and timings
+REQUEST_PROFILING_ENABLED = os.getenv("REQUEST_PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metrics_snapshots (
+    worker TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+mention_store.register_schema(SCHEMA)
+
+FAMILIES = {
+    "http_request_duration_seconds": ("histogram", "HTTP request latency by route"),
+    "stage_duration_seconds": ("histogram", "Latency of instrumented stages: Reddit fetches, scoring and Supabase queries"),
+    "reddit_api_calls_total": ("counter", "Reddit API requests made"),
+    "reddit_rate_limit_waits_total": ("counter", "Reddit requests that had to wait for the rate limiter"),
+    "reddit_rate_limit_wait_seconds_total": ("counter", "Time spent waiting for the Reddit rate limiter"),
+    "cache_lookups_total": ("counter", "Cache lookups by cache and result"),
+    "cache_hit_ratio": ("gauge", "Share of cache lookups answered from the cache"),
+}
+
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+# (family, labels) -> per-bucket counts, the count above the last bucket, then the sum
+_histograms = {}
+_collectors = []
+_last_flush = 0.0
+# Flushes running in threads for the event loop, referenced until they finish
+_pending_flushes = set()
+# Innermost span of the request being profiled, if any
+_profile = contextvars.ContextVar("metrics_profile", default=None)
+
+
+def observe(family, labels, seconds):
+    key = (family, tuple(sorted(labels.items())))
+    index = bisect.bisect_left(BUCKETS, seconds)
+    with _lock:
+        values = _histograms.get(key)
+        if values is None:
+            values = _histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+        values[index] += 1
+        values[-1] += seconds
+    if not _claim_flush():
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # A worker thread: writing the snapshot here only delays this thread's own work
+        _write_snapshot()
+        return
+    # On the event loop (request middleware, async spans) the SQLite write goes to a thread
+    task = loop.create_task(asyncio.to_thread(_write_snapshot))
+    _pending_flushes.add(task)
+    task.add_done_callback(_pending_flushes.discard)
+
+
+def register_collector(collect):
+    """`collect()` returns [(family, labels, value)]: counters this process has accumulated"""
+    _collectors.append(collect)
+
+
+@contextmanager
+def span(stage):
+    """Time a block into stage_duration_seconds and the profile of the current request"""
+    parent = _profile.get()
+    node = token = None
+    if parent is not None:
+        node = {"name": stage, "ms": None, "children": []}
+        parent["children"].append(node)
+        token = _profile.set(node)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        if node is not None:
+            node["ms"] = round(elapsed * 1000, 2)
+            _profile.reset(token)
+        observe("stage_duration_seconds", {"stage": stage}, elapsed)
+
+
+def timed(stage):
+    """Decorator form of span() for plain and async functions"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def execute(query, name):
+    """Run a Supabase query builder inside a `supabase.<name>` span"""
+    with span(f"supabase.{name}"):
+        return query.execute()
+
+
+async def execute_async(query, name):
+    with span(f"supabase.{name}"):
+        return await query.execute()
+
+
+def _snapshot():
+    with _lock:
+        histograms = [[family, list(labels), list(values)] for (family, labels), values in _histograms.items()]
+    counters = []
+    for collect in _collectors:
+        try:
+            counters.extend([family, sorted(labels.items()), value] for family, labels, value in collect())
+        except Exception as e:
+            print(f"Metrics collector failed: {e}")
+    return {"histograms": histograms, "counters": counters}
+
+
+def _claim_flush():
+    """True for the one caller that should flush now, if the last flush is old enough"""
+    global _last_flush
+    now = time.time()
+    with _lock:
+        if now - _last_flush < METRICS_FLUSH_SECONDS:
+            return False
+        _last_flush = now
+        return True
+
+
+def _write_snapshot():
+    if not _flush_lock.acquire(blocking=False):
+        return
+    try:
+        now = time.time()
+        data = json.dumps(_snapshot())
+        with mention_store.connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO metrics_snapshots (worker, data, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(worker) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at
+                """,
+                (WORKER_ID, data, now),
+            )
+            conn.execute("DELETE FROM metrics_snapshots WHERE updated_at < ?", (now - METRICS_WORKER_TTL_SECONDS,))
+    except Exception as e:
+        print(f"Metrics flush failed: {e}")
+    finally:
+        _flush_lock.release()
+
+
+def flush(force=False):
+    """Publish this worker's metrics to the local store if the last flush is old enough. Blocking."""
+    global _last_flush
+    if force:
+        with _lock:
+            _last_flush = time.time()
+    elif not _claim_flush():
+        return
+    _write_snapshot()
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n"))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """All workers' metrics in the Prometheus text exposition format"""
+    flush(force=True)
+    with mention_store.connect() as conn:
+        rows = conn.execute(
+            "SELECT data FROM metrics_snapshots WHERE updated_at >= ?", (time.time() - METRICS_WORKER_TTL_SECONDS,)
+        ).fetchall()
+
+    histograms, counters = {}, {}
+    for row in rows:
+        data = json.loads(row["data"])
+        for family, labels, values in data["histograms"]:
+            merged = histograms.setdefault((family, tuple(map(tuple, labels))), [0] * len(values))
+            for index, value in enumerate(values):
+                merged[index] += value
+        for family, labels, value in data["counters"]:
+            key = (family, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+
+    lookups = {}
+    for (family, labels), value in counters.items():
+        if family == "cache_lookups_total":
+            labels = dict(labels)
+            hits_total = lookups.setdefault(labels["cache"], [0, 0])
+            hits_total[0] += value if labels["result"] == "hit" else 0
+            hits_total[1] += value
+    gauges = {
+        ("cache_hit_ratio", (("cache", cache),)): round(hits / total, 4) if total else 0.0
+        for cache, (hits, total) in lookups.items()
+    }
+
+    lines = []
+    for family, (kind, help_text) in FAMILIES.items():
+        lines += [f"# HELP {family} {help_text}", f"# TYPE {family} {kind}"]
+        if kind == "histogram":
+            for (name, labels), values in sorted(histograms.items()):
+                if name != family:
+                    continue
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ("+Inf",), values[:-1]):
+                    cumulative += count
+                    lines.append(f"{family}_bucket{_format_labels(labels + (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{family}_sum{_format_labels(labels)} {_format_value(values[-1])}")
+                lines.append(f"{family}_count{_format_labels(labels)} {cumulative}")
+        else:
+            samples = counters if kind == "counter" else gauges
+            for (name, labels), value in sorted(samples.items()):
+                if name == family:
+                    lines.append(f"{family}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _route(scope):
+    # The route template, not the raw path, keeps label cardinality bounded
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+def _wants_profile(scope):
+    values = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("profile", [])
+    return bool(values) and values[-1].lower() in ("1", "true", "yes")
+
+
+class MetricsMiddleware:
+    """
+    Records every HTTP request into http_request_duration_seconds. With ?profile=1 the
+    request runs as usual but the client gets its span tree (and a pyinstrument report
+    when pyinstrument is installed) instead of the response body.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        if REQUEST_PROFILING_ENABLED and _wants_profile(scope):
+            return await self._profile(scope, receive, send)
+
+        started = time.perf_counter()
+        status, streaming = 500, False
+
+        async def send_wrapper(message):
+            nonlocal status, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                streaming = any(name == b"content-type" and value.startswith(b"text/event-stream")
+                                for name, value in message.get("headers", []))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # A stream's duration is how long the client stayed connected, not latency
+            if not streaming:
+                labels = {"method": scope["method"], "route": _route(scope), "status": str(status)}
+                observe("http_request_duration_seconds", labels, time.perf_counter() - started)
+
+    async def _profile(self, scope, receive, send):
+        root = {"name": f"{scope['method']} {scope['path']}", "ms": None, "children": []}
+        token = _profile.set(root)
+        status = 500
+
+        async def capture(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        profiler = Profiler(async_mode="enabled") if Profiler is not None else None
+        started = time.perf_counter()
+        try:
+            if profiler is not None:
+                profiler.start()
+            await self.app(scope, receive, capture)
+        finally:
+            if profiler is not None:
+                profiler.stop()
+            _profile.reset(token)
+        root["ms"] = round((time.perf_counter() - started) * 1000, 2)
+        content = {"route": _route(scope), "status": status, "profile": root}
+        if profiler is not None:
+            content["pyinstrument"] = profiler.output_text(unicode=True, color=False)
+        await JSONResponse(content, headers={"Cache-Control": "no-store"})(scope, receive, send)
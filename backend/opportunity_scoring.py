@@ -0,0 +1,138 @@
+import json
+import os
+from typing import Dict, List
+
+import numpy as np
+
+# Try relative imports first (for local development), fall back to absolute (for Railway)
+try:
+    from . import metrics
+    from .keyword_matcher import get_matcher
+    from .ttl_cache import invalidate, ttl_cache
+except ImportError:
+    import metrics
+    from keyword_matcher import get_matcher
+    from ttl_cache import invalidate, ttl_cache
+
+# Optional JSON file with rules in the same shape as DEFAULT_RULES
+OPPORTUNITY_RULES_PATH = os.getenv("OPPORTUNITY_RULES_PATH")
+# Loaded rules are cached like the monitored subreddits and keywords
+RULES_CACHE_TTL_SECONDS = int(os.getenv("CONFIG_CACHE_TTL_SECONDS", "300"))
+# PostgREST's error codes for a table that does not exist (newer, then older versions)
+MISSING_TABLE_CODES = ("PGRST205", "42P01")
+
+# A post is an opportunity when the weights of the factors it meets add up to the threshold.
+# Factor types:
+#   abs_score_above  |score| > value
+#   engagement       upvotes > upvotes_above or comments > comments_above
+#   keywords         title/body contains one of `keywords`; optional score_below / score_at_least
+DEFAULT_RULES = {
+    "threshold": 2,
+    "factors": [
+        {"name": "strong_sentiment", "type": "abs_score_above", "value": 0.5, "weight": 1},
+        {"name": "high_engagement", "type": "engagement", "upvotes_above": 5, "comments_above": 3, "weight": 1},
+        {"name": "opportunity_keywords", "type": "keywords", "weight": 1, "keywords": [
+            "help", "looking for", "alternative", "recommend", "suggestion", "vs", "compare",
+            "switch", "moving from", "pricing", "cost", "expensive", "cheaper"]},
+        {"name": "competitor_complaint", "type": "keywords", "weight": 2, "score_below": -0.2, "keywords": [
+            "stripe", "fastspring", "paddle", "gumroad"]},
+        {"name": "buying_intent", "type": "keywords", "weight": 2, "score_at_least": -0.05, "keywords": [
+            "looking for payment solution", "need merchant of record", "recommend SaaS billing",
+            "suggest payment provider", "best payment platform", "scaling payments", "international expansion",
+            "how to sell globally", "MoR recommendation", "SaaS payment advice", "billing solution"]},
+    ],
+}
+
+
+_missing_table_reported = False
+
+
+@ttl_cache("opportunity_rules", RULES_CACHE_TTL_SECONDS)
+def load_rules(supabase=None) -> Dict:
+    """
+    Rules from OPPORTUNITY_RULES_PATH, else the newest row of the Supabase
+    `opportunity_rules` table (see sql/opportunity_rules.sql), else DEFAULT_RULES.
+    """
+    global _missing_table_reported
+    if OPPORTUNITY_RULES_PATH:
+        try:
+            with open(OPPORTUNITY_RULES_PATH) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Could not read opportunity rules from {OPPORTUNITY_RULES_PATH}: {e}")
+    if supabase is not None:
+        try:
+            query = supabase.table("opportunity_rules").select("rules").order("id", desc=True).limit(1)
+            result = metrics.execute(query, "opportunity_rules.select")
+            if result.data:
+                rules = result.data[0]["rules"]
+                return json.loads(rules) if isinstance(rules, str) else rules
+        except Exception as e:
+            if getattr(e, "code", None) not in MISSING_TABLE_CODES:
+                print(f"Could not load opportunity rules from Supabase: {e}")
+            elif not _missing_table_reported:
+                _missing_table_reported = True
+                print("No opportunity_rules table in Supabase, using the default rules (see sql/opportunity_rules.sql)")
+    return DEFAULT_RULES
+
+
+def save_rules(supabase, rules: Dict) -> Dict:
+    """Store `rules` as the newest opportunity_rules row and drop the cached rules in every worker"""
+    if not isinstance(rules.get("factors"), list) or "threshold" not in rules:
+        raise ValueError("Rules need a threshold and a list of factors")
+    for factor in rules["factors"]:
+        if factor.get("type") not in ("abs_score_above", "engagement", "keywords"):
+            raise ValueError(f"Unknown opportunity factor type: {factor.get('type')}")
+    metrics.execute(supabase.table("opportunity_rules").insert({"rules": rules}), "opportunity_rules.insert")
+    invalidate("opportunity_rules")
+    return rules
+
+
+def _factor_mask(factor, scores, upvotes, comments, texts):
+    kind = factor["type"]
+    if kind == "abs_score_above":
+        mask = np.abs(scores) > factor["value"]
+    elif kind == "engagement":
+        mask = (upvotes > factor.get("upvotes_above", np.inf)) | (comments > factor.get("comments_above", np.inf))
+    elif kind == "keywords":
+        matcher = get_matcher(factor["keywords"])
+        mask = np.fromiter((matcher.matches_any(text) for text in texts), dtype=bool, count=len(texts))
+    else:
+        raise ValueError(f"Unknown opportunity factor type: {kind}")
+    if "score_below" in factor:
+        mask &= scores < factor["score_below"]
+    if "score_at_least" in factor:
+        mask &= scores >= factor["score_at_least"]
+    return mask
+
+
+@metrics.timed("score_opportunities")
+def score_opportunities(posts: List[Dict], rules: Dict = None) -> List[Dict]:
+    """
+    Evaluate the rules over a batch of scored posts at once. Sets 'status',
+    'opportunity_score' and 'opportunity_factors' (weight per factor met) on each post.
+    """
+    if not posts:
+        return posts
+    rules = rules or DEFAULT_RULES
+    count = len(posts)
+    scores = np.fromiter((post.get("score") or 0.0 for post in posts), dtype=float, count=count)
+    upvotes = np.fromiter((post.get("upvotes") or 0 for post in posts), dtype=float, count=count)
+    comments = np.fromiter((post.get("comments") or 0 for post in posts), dtype=float, count=count)
+    texts = [post.get("title", "") + " " + post.get("body", "") for post in posts]
+
+    names = [factor["name"] for factor in rules["factors"]]
+    weights = np.array([factor.get("weight", 1) for factor in rules["factors"]], dtype=float)
+    # One row per factor, one column per post
+    hits = np.vstack([_factor_mask(factor, scores, upvotes, comments, texts) for factor in rules["factors"]])
+    contributions = hits * weights[:, None]
+    totals = contributions.sum(axis=0)
+    is_opportunity = totals >= rules["threshold"]
+
+    for i, post in enumerate(posts):
+        post["opportunity_score"] = float(totals[i])
+        post["opportunity_factors"] = {
+            name: float(contributions[f, i]) for f, name in enumerate(names) if hits[f, i]
+        }
+        post["status"] = "opportunity" if is_opportunity[i] else "neutral"
+    return posts
@@ -0,0 +1,134 @@
+import os
+import json
+import threading
+import time
+
+# Try relative imports first (for local development), fall back to absolute (for Railway)
+try:
+    from . import mention_store
+except ImportError:
+    import mention_store
+
+# Title, author, subreddit and permalink never change, so they are cached until evicted.
+# upvotes/comments are re-fetched once they are older than the TTL.
+POST_CACHE_TTL_SECONDS = int(os.getenv("POST_CACHE_TTL_SECONDS", "900"))
+POST_CACHE_MAX_ENTRIES = int(os.getenv("POST_CACHE_MAX_ENTRIES", "50000"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS post_cache (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    upvotes INTEGER,
+    comments INTEGER,
+    stats_refreshed_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_post_cache_last_access ON post_cache (last_access);
+"""
+
+mention_store.register_schema(SCHEMA)
+
+_lock = threading.Lock()
+_counters = {"hits": 0, "stale": 0, "misses": 0, "evictions": 0}
+
+
+def _count(name, amount):
+    with _lock:
+        _counters[name] += amount
+
+
+def lookup(post_ids):
+    """
+    Split post IDs by cache state. Returns (fresh, stale, missing): `fresh` maps ID to a
+    mention dict, `stale` maps ID to a cached mention whose stats need refreshing, and
+    `missing` lists IDs that must be fetched in full.
+    """
+    post_ids = list(dict.fromkeys(post_ids))
+    now = time.time()
+    rows = {}
+    with mention_store.connect() as conn:
+        for i in range(0, len(post_ids), 500):
+            chunk = post_ids[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for row in conn.execute(
+                f"SELECT id, data, upvotes, comments, stats_refreshed_at FROM post_cache WHERE id IN ({placeholders})",
+                chunk,
+            ):
+                rows[row["id"]] = row
+            conn.execute(f"UPDATE post_cache SET last_access = ? WHERE id IN ({placeholders})", [now, *chunk])
+
+    fresh, stale, missing = {}, {}, []
+    for post_id in post_ids:
+        row = rows.get(post_id)
+        if row is None:
+            missing.append(post_id)
+            continue
+        mention = json.loads(row["data"])
+        mention["upvotes"] = row["upvotes"]
+        mention["comments"] = row["comments"]
+        if now - row["stats_refreshed_at"] < POST_CACHE_TTL_SECONDS:
+            fresh[post_id] = mention
+        else:
+            stale[post_id] = mention
+    _count("hits", len(fresh))
+    _count("stale", len(stale))
+    _count("misses", len(missing))
+    return fresh, stale, missing
+
+
+def store(mentions):
+    """Cache freshly fetched mentions in full"""
+    now = time.time()
+    with mention_store.connect() as conn:
+        conn.executemany(
+            """
+            INSERT INTO post_cache (id, data, upvotes, comments, stats_refreshed_at, last_access)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                data = excluded.data,
+                upvotes = excluded.upvotes,
+                comments = excluded.comments,
+                stats_refreshed_at = excluded.stats_refreshed_at,
+                last_access = excluded.last_access
+            """,
+            [(m["id"], json.dumps(m), m["upvotes"], m["comments"], now, now) for m in mentions],
+        )
+    _evict()
+
+
+def refresh_stats(mentions):
+    """Update only the volatile fields of already cached posts"""
+    now = time.time()
+    with mention_store.connect() as conn:
+        conn.executemany(
+            "UPDATE post_cache SET upvotes = ?, comments = ?, stats_refreshed_at = ? WHERE id = ?",
+            [(m["upvotes"], m["comments"], now, m["id"]) for m in mentions],
+        )
+
+
+def _evict():
+    """Drop least recently used entries beyond POST_CACHE_MAX_ENTRIES"""
+    with mention_store.connect() as conn:
+        total = conn.execute("SELECT COUNT(*) FROM post_cache").fetchone()[0]
+        excess = total - POST_CACHE_MAX_ENTRIES
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM post_cache WHERE id IN (SELECT id FROM post_cache ORDER BY last_access LIMIT ?)",
+                (excess,),
+            )
+            _count("evictions", excess)
+
+
+def stats():
+    """Hit/miss counters for this worker process plus the shared cache size"""
+    with mention_store.connect() as conn:
+        size = conn.execute("SELECT COUNT(*) FROM post_cache").fetchone()[0]
+    with _lock:
+        counters = dict(_counters)
+    lookups = counters["hits"] + counters["stale"] + counters["misses"]
+    counters["hit_ratio"] = round(counters["hits"] / lookups, 3) if lookups else 0.0
+    counters["size"] = size
+    counters["max_entries"] = POST_CACHE_MAX_ENTRIES
+    counters["ttl_seconds"] = POST_CACHE_TTL_SECONDS
+    counters["worker_pid"] = os.getpid()
+    return counters
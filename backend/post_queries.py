@@ -0,0 +1,127 @@
+import base64
+import json
+
+# Try relative imports first (for local development), fall back to absolute (for Railway)
+try:
+    from . import mention_store
+except ImportError:
+    import mention_store
+
+SORT_COLUMNS = ("created_utc", "score", "upvotes", "comments")
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(sort_value, post_id):
+    return base64.urlsafe_b64encode(json.dumps([sort_value, post_id]).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        sort_value, post_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return sort_value, post_id
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def _fill_temp_ids(conn, table, ids):
+    conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS {table} (id TEXT PRIMARY KEY)")
+    conn.execute(f"DELETE FROM {table}")
+    conn.executemany(f"INSERT OR IGNORE INTO {table} (id) VALUES (?)", [(pid,) for pid in ids])
+
+
+def _where(conn, subreddits, tracked_ids, filters):
+    """
+    WHERE clause for the dashboard's post set (mentions in the monitored subreddits plus
+    tracked posts) narrowed by `filters`. ID lists go through temp tables so they can be
+    any size.
+    """
+    _fill_temp_ids(conn, "scope_tracked", tracked_ids)
+    names = [f"r/{name}".lower() for name in subreddits]
+    clauses = [
+        f"((is_mention = 1 AND lower(subreddit) IN ({','.join('?' * len(names))}))"
+        " OR id IN (SELECT id FROM scope_tracked))"
+    ]
+    params = list(names)
+
+    if filters.get("status"):
+        clauses.append("status = ?")
+        params.append(filters["status"])
+    if filters.get("sentiment"):
+        clauses.append("sentiment = ?")
+        params.append(filters["sentiment"])
+    if filters.get("subreddit"):
+        clauses.append("lower(subreddit) = ?")
+        params.append("r/" + filters["subreddit"].lower().removeprefix("r/"))
+    if filters.get("keyword"):
+        clauses.append("id IN (SELECT post_id FROM post_keywords WHERE keyword = ?)")
+        params.append(filters["keyword"].lower())
+    if filters.get("since") is not None:
+        clauses.append("created_utc >= ?")
+        params.append(filters["since"])
+    if filters.get("until") is not None:
+        clauses.append("created_utc < ?")
+        params.append(filters["until"])
+    if not filters.get("include_duplicates"):
+        # Near-duplicates are triaged through their canonical post unless already tracked
+        clauses.append("(json_extract(data, '$.duplicate_of') IS NULL OR id IN (SELECT id FROM scope_tracked))")
+    if filters.get("include_ids") is not None:
+        _fill_temp_ids(conn, "filter_include", filters["include_ids"])
+        clauses.append("id IN (SELECT id FROM filter_include)")
+    if filters.get("exclude_ids"):
+        _fill_temp_ids(conn, "filter_exclude", filters["exclude_ids"])
+        clauses.append("id NOT IN (SELECT id FROM filter_exclude)")
+    return " AND ".join(clauses), params
+
+
+def query_posts(subreddits, tracked_ids, filters, sort="created_utc", order="desc", limit=50, cursor=None):
+    """
+    One page of posts using keyset pagination on (sort column, id).
+    Returns (posts, next_cursor); next_cursor is None on the last page.
+    """
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f"sort must be one of {', '.join(SORT_COLUMNS)}")
+    if order not in ("asc", "desc"):
+        raise ValueError("order must be asc or desc")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    with mention_store.connect() as conn:
+        where, params = _where(conn, subreddits, tracked_ids, filters)
+        if cursor:
+            sort_value, post_id = decode_cursor(cursor)
+            comparison = "<" if order == "desc" else ">"
+            where += f" AND ({sort}, id) {comparison} (?, ?)"
+            params += [sort_value, post_id]
+        rows = conn.execute(
+            f"""
+            SELECT id, {sort} AS sort_value, data FROM posts
+            WHERE {where}
+            ORDER BY {sort} {order}, id {order}
+            LIMIT ?
+            """,
+            params + [limit + 1],
+        ).fetchall()
+    posts = [json.loads(row["data"]) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor(last["sort_value"], last["id"])
+    return posts, next_cursor
+
+
+def aggregate_posts(subreddits, tracked_ids, filters=None):
+    """Count, average sentiment and opportunities over the same post set, computed in SQL"""
+    with mention_store.connect() as conn:
+        where, params = _where(conn, subreddits, tracked_ids, filters or {})
+        row = conn.execute(
+            f"""
+            SELECT COUNT(*) AS total,
+                   AVG(score) AS average_score,
+                   SUM(CASE WHEN status = 'opportunity' THEN 1 ELSE 0 END) AS opportunities
+            FROM posts WHERE {where}
+            """,
+            params,
+        ).fetchone()
+    return {
+        "total_mentions": row["total"],
+        "opportunities": row["opportunities"] or 0,
+        "average_sentiment": round(row["average_score"], 2) if row["average_score"] is not None else 0.0,
+    }
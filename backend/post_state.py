@@ -0,0 +1,73 @@
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+# Try relative imports first (for local development), fall back to absolute (for Railway)
+try:
+    from . import metrics
+except ImportError:
+    import metrics
+
+# One Supabase row per (post, state), see sql/post_state.sql. Clearing a state sets
+# active = false rather than deleting, so setting and clearing are the same upsert.
+TABLE = "post_state"
+STATES = ("flagged", "engaged", "ignored")
+MAX_CHANGES_PER_REQUEST = 1000
+# Post IDs per lookup, keeps the PostgREST query string short
+LOOKUP_CHUNK_SIZE = 200
+
+
+def select_active(db):
+    """Query for the active (post_id, state) rows; works with the sync and the async client"""
+    return db.table(TABLE).select("post_id,state").eq("active", True)
+
+
+def split_by_state(rows) -> Tuple[List[str], List[str], List[str]]:
+    """(flagged_ids, ignored_ids, engaged_ids) from post_state rows"""
+    ids = {state: [] for state in STATES}
+    for row in rows or []:
+        if row["state"] in ids:
+            ids[row["state"]].append(row["post_id"])
+    return ids["flagged"], ids["ignored"], ids["engaged"]
+
+
+def parse_changes(items) -> List[Dict]:
+    """
+    Validate a list of {"id", "state", "active"} (active defaults to true). When the same
+    post and state appear more than once, the last entry wins.
+    """
+    if not isinstance(items, list):
+        raise ValueError("Expected a list of {id, state} objects")
+    if len(items) > MAX_CHANGES_PER_REQUEST:
+        raise ValueError(f"At most {MAX_CHANGES_PER_REQUEST} changes per request")
+    changes = {}
+    for item in items:
+        if not isinstance(item, dict) or not item.get("id"):
+            raise ValueError("Each change needs an id")
+        if item.get("state") not in STATES:
+            raise ValueError(f"state must be one of {', '.join(STATES)}")
+        post_id, state = str(item["id"]), item["state"]
+        changes[(post_id, state)] = {"id": post_id, "state": state, "active": bool(item.get("active", True))}
+    return list(changes.values())
+
+
+async def apply_changes(db, changes: List[Dict]) -> List[Dict]:
+    """
+    Write `changes` with a single upsert, leaving out the ones that already match the
+    stored state, so repeated requests are no-ops. Returns the changes that took effect.
+    """
+    post_ids = list(dict.fromkeys(change["id"] for change in changes))
+    current = set()
+    for i in range(0, len(post_ids), LOOKUP_CHUNK_SIZE):
+        query = select_active(db).in_("post_id", post_ids[i:i + LOOKUP_CHUNK_SIZE])
+        result = await metrics.execute_async(query, "post_state.select")
+        current.update((row["post_id"], row["state"]) for row in result.data or [])
+
+    applied = [change for change in changes if ((change["id"], change["state"]) in current) != change["active"]]
+    if applied:
+        updated_at = datetime.now(timezone.utc).isoformat()
+        query = db.table(TABLE).upsert(
+            [{"post_id": c["id"], "state": c["state"], "active": c["active"], "updated_at": updated_at} for c in applied],
+            on_conflict="post_id,state",
+        )
+        await metrics.execute_async(query, "post_state.upsert")
+    return applied
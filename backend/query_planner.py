@@ -0,0 +1,85 @@
+from typing import List, NamedTuple, Tuple
+
+# Reddit rejects search queries longer than 512 characters
+MAX_QUERY_LENGTH = 512
+# Keep multireddit paths (r/a+b+c) to a size Reddit reliably accepts in the URL
+MAX_SUBREDDIT_PATH_LENGTH = 1000
+MAX_SUBREDDITS_PER_QUERY = 50
+# Reddit listings stop paginating after 1000 items
+MAX_RESULTS_PER_QUERY = 1000
+
+
+class SearchQuery(NamedTuple):
+    subreddits: Tuple[str, ...]
+    keywords: Tuple[str, ...]
+
+    @property
+    def subreddit_path(self) -> str:
+        """Multireddit name for reddit.subreddit(), e.g. 'SaaS+startups'"""
+        return "+".join(self.subreddits)
+
+    @property
+    def query(self) -> str:
+        """OR'd search expression with every keyword quoted as a phrase"""
+        return " OR ".join(quote_keyword(kw) for kw in self.keywords)
+
+
+def quote_keyword(keyword: str) -> str:
+    return '"' + keyword.replace('"', " ").strip() + '"'
+
+
+def _chunk(items, max_items, max_length, item_length, separator_length):
+    chunks, current, current_length = [], [], 0
+    for item in items:
+        length = item_length(item)
+        added = length if not current else length + separator_length
+        if current and (len(current) >= max_items or current_length + added > max_length):
+            chunks.append(tuple(current))
+            current, current_length = [], 0
+            added = length
+        current.append(item)
+        current_length += added
+    if current:
+        chunks.append(tuple(current))
+    return chunks
+
+
+def chunk_subreddits(subreddits: List[str]) -> List[Tuple[str, ...]]:
+    """Group subreddits into multireddit-sized chunks"""
+    return _chunk(subreddits, MAX_SUBREDDITS_PER_QUERY, MAX_SUBREDDIT_PATH_LENGTH, len, len("+"))
+
+
+def plan_queries(subreddits: List[str], keywords: List[str]) -> List[SearchQuery]:
+    """
+    Collapse the subreddits x keywords search space into as few Reddit searches as possible.
+    Subreddits are merged into multireddits and keywords into OR'd expressions, each
+    chunked to stay within Reddit's limits. Every (subreddit, keyword) pair is covered
+    by exactly one query.
+    """
+    subreddits = list(dict.fromkeys(s for s in subreddits if s))
+    keywords = list(dict.fromkeys(k for k in keywords if k and k.strip()))
+    subreddit_chunks = chunk_subreddits(subreddits)
+    keyword_chunks = _chunk(
+        keywords, len(keywords) or 1, MAX_QUERY_LENGTH, lambda kw: len(quote_keyword(kw)), len(" OR ")
+    )
+    return [SearchQuery(subs, kws) for subs in subreddit_chunks for kws in keyword_chunks]
+
+
+def results_limit(query: SearchQuery, limit_per_pair: int) -> int:
+    """Listing size for a batched query that keeps roughly `limit_per_pair` results per pair"""
+    return min(limit_per_pair * len(query.subreddits) * len(query.keywords), MAX_RESULTS_PER_QUERY)
+
+
+def assign_shards(queries: List[SearchQuery], shard_count: int, limit_per_pair: int) -> List[List[SearchQuery]]:
+    """
+    Spread queries over `shard_count` shards so each shard's expected listing pages are
+    about equal. Deterministic for a given plan, so every worker computes the same split.
+    """
+    shards = [[] for _ in range(max(1, shard_count))]
+    loads = [0] * len(shards)
+    pages = lambda query: -(-results_limit(query, limit_per_pair) // 100)
+    for query in sorted(queries, key=lambda query: (-pages(query), query)):
+        index = min(range(len(shards)), key=lambda i: (loads[i], i))
+        shards[index].append(query)
+        loads[index] += pages(query)
+    return shards
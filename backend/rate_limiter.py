@@ -0,0 +1,113 @@
+import asyncio
+import os
+import threading
+import time
+
+# Reddit's OAuth budget is 100 requests per minute per client id
+REDDIT_REQUESTS_PER_MINUTE = int(os.getenv("REDDIT_REQUESTS_PER_MINUTE", "100"))
+# Mention search shards, see shards.py. It sizes the budget split below.
+INGESTION_SHARDS = max(1, int(os.getenv("INGESTION_SHARDS", "1")))
+# Processes sharing the Reddit client id; the buckets below live in process memory, so each
+# one only gets its share. Defaults to uvicorn's WEB_CONCURRENCY (its --workers count).
+REDDIT_BUDGET_WORKERS = max(1, int(os.getenv("REDDIT_BUDGET_WORKERS", os.getenv("WEB_CONCURRENCY", "1"))))
+
+
+def budget_share(shard_count=INGESTION_SHARDS, workers=REDDIT_BUDGET_WORKERS):
+    """
+    Requests per minute of each shard's limiter and of the shared one, in one process.
+    With several shards the budget is split evenly between them and the shared limiter,
+    which the tracked-post refresh, comment ingestion, the stream monitor and request-time
+    fetches draw from. A single shard searches under the shared limiter, so nothing is
+    split. Every worker process has its own buckets, so each share is also divided by
+    `workers`; the X-Ratelimit headers still clamp any process that overspends.
+    """
+    if shard_count <= 1:
+        return REDDIT_REQUESTS_PER_MINUTE / workers
+    return REDDIT_REQUESTS_PER_MINUTE / (shard_count + 1) / workers
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Refills continuously at `rate_per_minute` up to
+    `capacity` tokens, and can be clamped by the X-Ratelimit-* values Reddit
+    returns so we never spend more than the server says is left.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1, rate_per_minute // 6)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        # Set when the server reports an exhausted budget; no tokens are handed out before it
+        self.blocked_until = 0.0
+        self.acquired = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate_per_second)
+        self.updated_at = now
+
+    def _take(self, tokens, waited):
+        """Take `tokens` and return None, or return how long to wait before trying again"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now >= self.blocked_until and self.tokens >= tokens:
+                self.tokens -= tokens
+                self.acquired += tokens
+                return None
+            if now < self.blocked_until:
+                delay = self.blocked_until - now
+            else:
+                delay = (tokens - self.tokens) / self.rate_per_second
+            if not waited:
+                self.waits += 1
+            self.wait_seconds += delay
+            return delay
+
+    def acquire(self, tokens=1):
+        """Block until `tokens` are available, then take them"""
+        waited = False
+        while (delay := self._take(tokens, waited)) is not None:
+            waited = True
+            time.sleep(delay)
+
+    async def acquire_async(self, tokens=1):
+        """acquire() for coroutines: waits without blocking the event loop"""
+        waited = False
+        while (delay := self._take(tokens, waited)) is not None:
+            waited = True
+            await asyncio.sleep(delay)
+
+    def update_from_headers(self, remaining, reset_seconds):
+        """Clamp the bucket to Reddit's X-Ratelimit-Remaining / X-Ratelimit-Reset values"""
+        if remaining is None:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens = min(self.tokens, float(remaining))
+            if remaining < 1 and reset_seconds:
+                self.blocked_until = max(self.blocked_until, now + float(reset_seconds))
+
+    def sync_with_praw(self, reddit):
+        """Read the rate-limit headers PRAW recorded for its last request"""
+        try:
+            limits = reddit.auth.limits
+        except AttributeError:
+            return
+        remaining = limits.get("remaining")
+        reset_timestamp = limits.get("reset_timestamp")
+        reset_seconds = max(0.0, reset_timestamp - time.time()) if reset_timestamp else None
+        self.update_from_headers(remaining, reset_seconds)
+
+    def stats(self):
+        with self._lock:
+            return {"acquired": self.acquired, "waits": self.waits, "wait_seconds": round(self.wait_seconds, 3), "tokens": round(self.tokens, 2)}
+
+
+# Shared by every Reddit caller in this process that has no shard limiter
+reddit_limiter = TokenBucket(budget_share())
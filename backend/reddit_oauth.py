@@ -1,8 +1,20 @@
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Depends, Request
 from fastapi.responses import RedirectResponse, HTMLResponse
 from authlib.integrations.starlette_client import OAuth
+import asyncio
+import httpx
 import os
-from supabase import create_client, Client
+
+# Try relative imports first (for local development), fall back to absolute (for Railway)
+try:
+    from . import account_stats, metrics
+    from .clients import get_supabase
+    from .rate_limiter import TokenBucket
+except ImportError:
+    import account_stats
+    import metrics
+    from clients import get_supabase
+    from rate_limiter import TokenBucket
 
 router = APIRouter()
 
@@ -10,9 +22,6 @@ router = APIRouter()
 OAUTH_CLIENT_ID = os.getenv("REDDIT_CLIENT_ID")
 OAUTH_CLIENT_SECRET = os.getenv("REDDIT_CLIENT_SECRET")
 OAUTH_REDIRECT_URI = os.getenv("REDDIT_REDIRECT_URI", "http://localhost:8000/auth/callback")
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
 oauth = OAuth()
 oauth.register(
@@ -23,7 +32,8 @@ oauth.register(
     authorize_url='https://www.reddit.com/api/v1/authorize',
     api_base_url='https://oauth.reddit.com/api/v1/',
     client_kwargs={
-        'scope': 'identity',
+        # history is needed to read /user/{name}/submitted for the post count
+        'scope': 'identity history',
         'token_endpoint_auth_method': 'client_secret_basic',
     },
 )
@@ -34,19 +44,23 @@ async def login(request: Request):
     return await oauth.reddit.authorize_redirect(request, redirect_uri)
 
 @router.get('/auth/callback')
-async def auth_callback(request: Request):
+async def auth_callback(request: Request, db=Depends(get_supabase)):
     token = await oauth.reddit.authorize_access_token(request)
     user_response = await oauth.reddit.get('me', token=token)
     user_info = user_response.json()
     # Fetch karma and total posts
     karma = user_info.get("total_karma", 0)
-    # Fetch total posts
-    posts_response = await oauth.reddit.get(f"user/{user_info.get('name')}/submitted", token=token)
-    posts_data = posts_response.json()
-    total_posts = len(posts_data.get("data", {}).get("children", []))
+    # Fetch total posts across all listing pages; linking still succeeds without it
+    total_posts = None
+    try:
+        total_posts = await account_stats.count_submissions(
+            account_stats.get_client(), TokenBucket(account_stats.ACCOUNT_REQUESTS_PER_MINUTE),
+            user_info.get("name"), token.get("access_token"))
+    except (httpx.HTTPError, ValueError) as e:
+        print(f"Could not count posts of u/{user_info.get('name')}: {e}")
     # Store user info, karma, and total_posts in Supabase
     # NOTE: No refresh tokens stored for security - users re-authenticate as needed
-    supabase.table("reddit_accounts").upsert({
+    account = {
         "username": user_info.get("name"),
         "access_token": token.get("access_token"),  # Short-lived only
         # Refresh token deliberately omitted for security
@@ -55,9 +69,10 @@ async def auth_callback(request: Request):
         "scope": token.get("scope"),
         "status": "active",
         "karma": karma,
-        "total_posts": total_posts,
+        **({"total_posts": total_posts} if total_posts is not None else {}),
         "last_connected": "now()"  # Track when user last connected
-    }).execute()
+    }
+    await asyncio.to_thread(lambda: metrics.execute(db.table("reddit_accounts").upsert(account), "reddit_accounts.upsert"))
     html_content = """
     <html>
       <head>
@@ -75,44 +90,63 @@ async def auth_callback(request: Request):
     return HTMLResponse(content=html_content)
 
 @router.get('/accounts')
-def list_accounts():
-    result = supabase.table("reddit_accounts").select("id", "username", "created_at", "status").execute()
+def list_accounts(db=Depends(get_supabase)):
+    result = metrics.execute(db.table("reddit_accounts").select("id", "username", "created_at", "status"), "reddit_accounts.select")
     return result.data
 
 @router.delete('/accounts/{account_id}')
-def delete_account(account_id: int):
-    supabase.table("reddit_accounts").delete().eq("id", account_id).execute()
+def delete_account(account_id: int, db=Depends(get_supabase)):
+    metrics.execute(db.table("reddit_accounts").delete().eq("id", account_id), "reddit_accounts.delete")
     return {"success": True}
 
 @router.post('/accounts/{account_id}/status')
-async def update_account_status(account_id: int, request: Request):
+async def update_account_status(account_id: int, request: Request, db=Depends(get_supabase)):
     data = await request.json()
     new_status = data.get("status")
     if new_status not in ["active", "paused", "cooldown", "flagged"]:
         return {"success": False, "error": "Invalid status"}
-    supabase.table("reddit_accounts").update({"status": new_status}).eq("id", account_id).execute()
+    await asyncio.to_thread(lambda: metrics.execute(
+        db.table("reddit_accounts").update({"status": new_status}).eq("id", account_id), "reddit_accounts.update"))
     return {"success": True, "status": new_status}
 
+async def refresh_all_account_stats(db=None):
+    """Refresh karma and post counts of every connected account and write them back in one upsert"""
+    if db is None:
+        db = get_supabase()
+    result = await asyncio.to_thread(
+        lambda: metrics.execute(db.table("reddit_accounts").select("id", "username", "access_token"), "reddit_accounts.select"))
+    rows, errors = await account_stats.refresh(result.data or [])
+
+    def write():
+        # Only id and the stat columns are sent, so PostgREST leaves the other columns as they are.
+        # A second batch is needed only when some post counts failed.
+        for batch in account_stats.upsert_batches(rows):
+            metrics.execute(db.table("reddit_accounts").upsert(batch, on_conflict="id"), "reddit_accounts.upsert")
+
+    if rows:
+        await asyncio.to_thread(write)
+    return rows, errors
+
+@router.post('/accounts/refresh_stats')
+async def refresh_all_accounts(db=Depends(get_supabase)):
+    rows, errors = await refresh_all_account_stats(db)
+    return {"success": not errors, "refreshed": len(rows), "accounts": rows, "errors": errors}
+
 @router.post('/accounts/{account_id}/refresh_stats')
-async def refresh_account_stats(account_id: int):
+async def refresh_account_stats(account_id: int, db=Depends(get_supabase)):
     # Get account info from Supabase
-    result = supabase.table("reddit_accounts").select("username", "access_token").eq("id", account_id).execute()
+    result = await asyncio.to_thread(lambda: metrics.execute(
+        db.table("reddit_accounts").select("id", "username", "access_token").eq("id", account_id), "reddit_accounts.select"))
     if not result.data or len(result.data) == 0:
         return {"success": False, "error": "Account not found"}
-    account = result.data[0]
-    username = account.get("username")
-    access_token = account.get("access_token")
-    if not username or not access_token:
-        return {"success": False, "error": "Missing username or access token"}
-    # Fetch latest karma
-    oauth_client = oauth.reddit
-    user_response = await oauth_client.get('me', token={"access_token": access_token, "token_type": "bearer"})
-    user_info = user_response.json()
-    karma = user_info.get("total_karma", 0)
-    # Fetch latest total posts
-    posts_response = await oauth_client.get(f"user/{username}/submitted", token={"access_token": access_token, "token_type": "bearer"})
-    posts_data = posts_response.json()
-    total_posts = len(posts_data.get("data", {}).get("children", []))
-    # Update Supabase
-    supabase.table("reddit_accounts").update({"karma": karma, "total_posts": total_posts}).eq("id", account_id).execute()
-    return {"success": True, "karma": karma, "total_posts": total_posts}
+    rows, errors = await account_stats.refresh(result.data)
+    if not rows:
+        return {"success": False, "error": errors[account_id]}
+    stats = rows[0]
+    # Update Supabase; karma is kept even when only the post count failed
+    await asyncio.to_thread(lambda: metrics.execute(
+        db.table("reddit_accounts").update(account_stats.update_fields(stats)).eq("id", account_id), "reddit_accounts.update"))
+    response = {"success": account_id not in errors, "karma": stats["karma"], "total_posts": stats.get("total_posts")}
+    if account_id in errors:
+        response["error"] = errors[account_id]
+    return response
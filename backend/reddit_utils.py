@@ -1,101 +1,175 @@
 import os
-from dotenv import load_dotenv
-import praw
-from textblob import TextBlob
 import time
-import datetime
+from concurrent.futures import ThreadPoolExecutor
 
-load_dotenv()
+# Try relative imports first (for local development), fall back to absolute (for Railway)
+try:
+    from .keyword_matcher import get_matcher
+    from .query_planner import plan_queries, results_limit
+    from .rate_limiter import reddit_limiter
+    from . import clients, dedup, metrics, post_cache
+except ImportError:
+    from keyword_matcher import get_matcher
+    from query_planner import plan_queries, results_limit
+    from rate_limiter import reddit_limiter
+    import clients
+    import dedup
+    import metrics
+    import post_cache
 
-reddit = praw.Reddit(
-    client_id=os.getenv("REDDIT_CLIENT_ID"),
-    client_secret=os.getenv("REDDIT_CLIENT_SECRET"),
-    user_agent=os.getenv("REDDIT_USER_AGENT")
-)
+# Reddit's /api/info accepts up to 100 fullnames per call
+MAX_INFO_IDS = 100
+# Listings are fetched in pages of 100, one API call each
+LISTING_PAGE_SIZE = 100
+REDDIT_FETCH_WORKERS = int(os.getenv("REDDIT_FETCH_WORKERS", "4"))
+
+def submission_to_mention(post, subreddit_name=None, keywords=()):
+    """
+    Build the mention dict for a PRAW submission. Timestamps and links stay raw;
+    mention_records.present() formats them for the API. Sentiment is left neutral here;
+    callers score mentions in batches with analyze_sentiment.
+    """
+    return {
+        "id": post.id,
+        "subreddit": f"r/{subreddit_name or post.subreddit.display_name}",
+        "title": post.title,
+        "author": post.author.name if post.author else "anonymous",
+        "sentiment": "neutral",
+        "score": 0.0,
+        "upvotes": post.score,
+        "comments": post.num_comments,
+        "created_utc": post.created_utc,
+        "status": "neutral",
+        "keywords": list(keywords),
+        "permalink": post.permalink,
+    }
+
+def rate_limited(listing, page_size=LISTING_PAGE_SIZE, limiter=None):
+    """Iterate a lazy PRAW listing, taking a rate-limit token before each page is fetched"""
+    limiter = limiter or reddit_limiter
+    iterator = iter(listing)
+    count = 0
+    while True:
+        if count % page_size == 0:
+            limiter.acquire()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            if count % page_size == 0:
+                limiter.sync_with_praw(clients.get_reddit())
+        count += 1
+        yield item
 
 def get_post_by_id(post_id):
-    """Fetch a specific Reddit post by its ID"""
+    """Fetch a specific Reddit post by its ID, served from the post cache when possible"""
+    posts = get_posts_by_ids([post_id])
+    return posts[0] if posts else None
+
+def _fetch_info_chunk(post_ids):
+    """One bulk /api/info call for up to MAX_INFO_IDS posts"""
     try:
-        post = reddit.submission(id=post_id)
-        
-        # Calculate sentiment
-        sentiment_score = TextBlob(post.title + " " + (post.selftext or "")).sentiment.polarity
-        sentiment = (
-            "positive" if sentiment_score > 0.2 else
-            "negative" if sentiment_score < -0.2 else
-            "neutral"
-        )
-
-        mention = {
-            "id": post.id,
-            "subreddit": f"r/{post.subreddit.display_name}",
-            "title": post.title,
-            "author": post.author.name if post.author else "anonymous",
-            "sentiment": sentiment,
-            "score": round(sentiment_score, 2),
-            "upvotes": post.score,
-            "comments": post.num_comments,
-            "createdAt": datetime.datetime.utcfromtimestamp(post.created_utc).strftime("%b %d, %Y, %I:%M %p UTC"),
-            "status": "neutral",
-            "keywords": [],  # We'll need to determine which keywords matched
-            "url": f"https://reddit.com{post.permalink}"
-        }
-        
-        return mention
+        reddit_limiter.acquire()
+        posts = list(clients.get_reddit().info(fullnames=[f"t3_{post_id}" for post_id in post_ids]))
+        reddit_limiter.sync_with_praw(clients.get_reddit())
+        return [submission_to_mention(post) for post in posts]
     except Exception as e:
-        print(f"Error fetching post {post_id}: {e}")
-        return None
+        print(f"Error fetching posts {post_ids[0]}..{post_ids[-1]}: {e}")
+        return []
 
+@metrics.timed("reddit.get_posts_by_ids")
 def get_posts_by_ids(post_ids):
-    """Fetch multiple Reddit posts by their IDs"""
-    posts = []
-    for post_id in post_ids:
-        post = get_post_by_id(post_id)
-        if post:
-            posts.append(post)
-        time.sleep(0.1)  # Small delay to avoid rate limits
-    return posts
-
-def get_recent_mentions(subreddits, keywords=["Cleverbridge", "Merchant of Record", "FastSpring","payment methods", "scaling", "payment services","scaling payments"], limit=10):
-    mentions = []
-    seen_ids = set()
-
-    for subreddit_name in subreddits:
-        subreddit = reddit.subreddit(subreddit_name)
-        # Use subreddit.search for keyword-based search
-        for keyword in keywords:
-            # PRAW's search returns a generator, so we need to limit results per keyword
-            for post in subreddit.search(keyword, sort="new", limit=limit):
-                if post.id in seen_ids:
-                    continue  # Skip duplicates
-                content = (post.title + " " + (post.selftext or "")).lower()
-                if keyword.lower() in content:
-                    seen_ids.add(post.id)
-                    sentiment_score = TextBlob(post.title + " " + post.selftext).sentiment.polarity
-                    sentiment = (
-                        "positive" if sentiment_score > 0.2 else
-                        "negative" if sentiment_score < -0.2 else
-                        "neutral"
-                    )
-
-                    mention = {
-                        "id": post.id,
-                        "subreddit": f"r/{subreddit_name}",
-                        "title": post.title,
-                        "author": post.author.name if post.author else "anonymous",
-                        "sentiment": sentiment,
-                        "score": round(sentiment_score, 2),
-                        "upvotes": post.score,
-                        "comments": post.num_comments,
-                        "createdAt": datetime.datetime.utcfromtimestamp(post.created_utc).strftime("%b %d, %Y, %I:%M %p UTC"),
-                        "status": "neutral",
-                        "keywords": [keyword.lower()],
-                        "url": f"https://reddit.com{post.permalink}"
-                    }
-
-                    mentions.append(mention)
-
-    return mentions
+    """
+    Fetch multiple Reddit posts by their IDs. Cached posts are read locally; only
+    uncached posts and posts with expired stats go to Reddit, via concurrent bulk
+    /api/info lookups.
+    """
+    post_ids = list(dict.fromkeys(post_ids))
+    if not post_ids:
+        return []
+    fresh, stale, missing = post_cache.lookup(post_ids)
+    to_fetch = list(stale) + missing
+    fetched = {}
+    if to_fetch:
+        chunks = [to_fetch[i:i + MAX_INFO_IDS] for i in range(0, len(to_fetch), MAX_INFO_IDS)]
+        with ThreadPoolExecutor(max_workers=min(REDDIT_FETCH_WORKERS, len(chunks))) as pool:
+            batches = list(pool.map(_fetch_info_chunk, chunks))
+        fetched = {post["id"]: post for batch in batches for post in batch}
+        post_cache.store([post for post_id, post in fetched.items() if post_id not in stale])
+        post_cache.refresh_stats([post for post_id, post in fetched.items() if post_id in stale])
+    # Keep the caller's order; a stale post Reddit no longer returns keeps its cached copy
+    by_id = {**stale, **fresh, **fetched}
+    return [by_id[post_id] for post_id in post_ids if post_id in by_id]
+
+@metrics.timed("reddit.get_recent_mentions")
+def get_recent_mentions(subreddits, keywords=["Cleverbridge", "Merchant of Record", "FastSpring","payment methods", "scaling", "payment services","scaling payments"], limit=10, marks=None, queries=None, limiter=None):
+    """
+    Search the subreddits for the keywords using batched multireddit/OR queries
+    (see query_planner). Each mention lists every keyword it matched.
+
+    If `marks` is given ({(subreddit, keyword): (created_utc, fullname)}, lowercased,
+    as returned by watermarks.load), only posts newer than the mark of at least one
+    matched pair are returned, pagination stops once a query reaches posts older than
+    all of its pairs' marks, and `marks` is advanced in place for the caller to save.
+    A query's newest result advances the mark of every pair it covers, so pairs
+    without matches stop paging too.
+
+    `queries` restricts the search to part of the plan (one ingestion shard) and
+    `limiter` replaces the shared rate limiter for it. Mentions still list every keyword
+    they match, so shards agree on each post.
+
+    Cross-posts and reposts are clustered with dedup.assign_clusters; near-duplicates
+    carry `duplicate_of` pointing at the canonical post.
+    """
+    mentions = {}
+    texts = {}
+    # Map multireddit results back to the configured subreddit names
+    subreddit_names = {name.lower(): name for name in subreddits}
+    matcher = get_matcher(keywords)
+    advanced = {}
+
+    for query in (queries if queries is not None else plan_queries(subreddits, keywords)):
+        floor = 0
+        if marks is not None:
+            floor = min(
+                marks.get((subreddit.lower(), keyword.lower()), (0, None))[0]
+                for subreddit in query.subreddits for keyword in query.keywords
+            )
+        subreddit = clients.get_reddit().subreddit(query.subreddit_path)
+        listing = subreddit.search(query.query, sort="new", limit=results_limit(query, limit))
+        newest = None
+        for post in rate_limited(listing, limiter=limiter):
+            if post.created_utc <= floor:
+                break  # Everything from here on was seen by every pair in this query
+            if newest is None:
+                newest = (post.created_utc, f"t3_{post.id}")
+            text = post.title + " " + (post.selftext or "")
+            matched = matcher.find_all(text)
+            if not matched:
+                continue  # Reddit search also matches on fields we don't show
+            if post.id in mentions:
+                continue  # Already seen via another query chunk
+            subreddit_key = post.subreddit.display_name.lower()
+            if marks is not None:
+                pair_marks = [marks.get((subreddit_key, keyword), (0, None))[0] for keyword in matched]
+                if post.created_utc <= min(pair_marks):
+                    continue  # Already processed in an earlier poll
+            subreddit_name = subreddit_names.get(subreddit_key, post.subreddit.display_name)
+            mentions[post.id] = submission_to_mention(post, subreddit_name, matched)
+            texts[post.id] = text
+
+        if marks is not None and newest is not None:
+            # Results are newest first, so the first one marks how far every pair was scanned
+            for subreddit_name in query.subreddits:
+                for keyword in query.keywords:
+                    advanced[(subreddit_name.lower(), keyword.lower())] = newest
+
+    if marks is not None:
+        for pair, mark in advanced.items():
+            if mark[0] > marks.get(pair, (0, None))[0]:
+                marks[pair] = mark
+    return dedup.assign_clusters(list(mentions.values()), texts)
 
 
 # Optional: test block
@@ -0,0 +1,110 @@
+import atexit
+import hashlib
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+# Scores are cached by a hash of the scored text; the same text always gets the same score
+SENTIMENT_CACHE_SIZE = int(os.getenv("SENTIMENT_CACHE_SIZE", "100000"))
+# Batches with at least this many uncached texts are spread over a process pool
+SENTIMENT_POOL_THRESHOLD = int(os.getenv("SENTIMENT_POOL_THRESHOLD", "5000"))
+SENTIMENT_POOL_WORKERS = int(os.getenv("SENTIMENT_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_analyzer = None
+_analyzer_lock = threading.Lock()
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_counters = {"hits": 0, "misses": 0}
+_pool = None
+
+
+def get_analyzer():
+    """Process-wide VADER analyzer; the module and its lexicon are loaded on first use, not at startup"""
+    global _analyzer
+    if _analyzer is None:
+        with _analyzer_lock:
+            if _analyzer is None:
+                from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+                _analyzer = SentimentIntensityAnalyzer()
+    return _analyzer
+
+
+def _key(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def _score_chunk(texts):
+    analyzer = get_analyzer()
+    return [analyzer.polarity_scores(text)["compound"] for text in texts]
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _analyzer_lock:
+            if _pool is None:
+                # Spawned, not forked: this process already runs the ingestion and stream threads
+                # and holds client and SQLite locks, which a forked child could inherit held
+                _pool = ProcessPoolExecutor(max_workers=SENTIMENT_POOL_WORKERS,
+                                            mp_context=multiprocessing.get_context("spawn"))
+                atexit.register(_pool.shutdown, wait=False)
+    return _pool
+
+
+def score_texts(texts: List[str]) -> List[float]:
+    """VADER compound score for each text, using the cache and a process pool for large batches"""
+    keys = [_key(text) for text in texts]
+    scores = {}
+    with _cache_lock:
+        for key in keys:
+            if key in _cache:
+                _cache.move_to_end(key)
+                scores[key] = _cache[key]
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in scores:
+            missing.setdefault(key, text)
+
+    if missing:
+        missing_texts = list(missing.values())
+        if len(missing_texts) >= SENTIMENT_POOL_THRESHOLD and SENTIMENT_POOL_WORKERS > 1:
+            chunk_size = -(-len(missing_texts) // (SENTIMENT_POOL_WORKERS * 4))
+            chunks = [missing_texts[i:i + chunk_size] for i in range(0, len(missing_texts), chunk_size)]
+            computed = [score for chunk in _get_pool().map(_score_chunk, chunks) for score in chunk]
+        else:
+            computed = _score_chunk(missing_texts)
+        with _cache_lock:
+            for key, score in zip(missing, computed):
+                scores[key] = score
+                _cache[key] = score
+            while len(_cache) > SENTIMENT_CACHE_SIZE:
+                _cache.popitem(last=False)
+
+    with _cache_lock:
+        _counters["hits"] += len(texts) - len(missing)
+        _counters["misses"] += len(missing)
+    return [scores[key] for key in keys]
+
+
+def score_text(text: str) -> float:
+    return score_texts([text])[0]
+
+
+def label(compound: float) -> str:
+    if compound > 0.05:
+        return 'positive'
+    if compound < -0.05:
+        return 'negative'
+    return 'neutral'
+
+
+def stats():
+    with _cache_lock:
+        counters = dict(_counters)
+        counters["size"] = len(_cache)
+    lookups = counters["hits"] + counters["misses"]
+    counters["hit_ratio"] = round(counters["hits"] / lookups, 3) if lookups else 0.0
+    return counters
@@ -0,0 +1,129 @@
+import hashlib
+import time
+
+# Try relative imports first (for local development), fall back to absolute (for Railway)
+try:
+    from . import mention_store
+    from .query_planner import assign_shards, plan_queries
+    from .rate_limiter import INGESTION_SHARDS, TokenBucket, budget_share
+except ImportError:
+    import mention_store
+    from query_planner import assign_shards, plan_queries
+    from rate_limiter import INGESTION_SHARDS, TokenBucket, budget_share
+
+# The (subreddit, keyword) search space is split into this many shards. Each shard is
+# searched under its own lease, so with several workers (uvicorn --workers) the shards
+# run in parallel; a single worker works through them one after another. The count
+# (INGESTION_SHARDS) is read in rate_limiter.py, which splits the Reddit budget by it.
+
+# Last run of each shard, for scheduling and for GET /ingestion/shards
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingestion_shards (
+    shard INTEGER PRIMARY KEY,
+    queries INTEGER NOT NULL,
+    pairs INTEGER NOT NULL,
+    last_run_at REAL NOT NULL,
+    last_duration REAL NOT NULL,
+    last_mentions INTEGER NOT NULL,
+    owner TEXT
+);
+"""
+
+mention_store.register_schema(SCHEMA)
+
+_limiters = {}
+
+
+def lease_name(shard):
+    return f"ingestion_shard:{shard}"
+
+
+def plan(subreddits, keywords, limit, shard_count=INGESTION_SHARDS):
+    """The search queries of each shard for the current configuration"""
+    return assign_shards(plan_queries(subreddits, keywords), shard_count, limit)
+
+
+def _fingerprint(subreddits, keywords, limit, shard_count):
+    config = "\n".join(sorted(name.lower() for name in subreddits)) + "\0" + \
+        "\n".join(sorted(keyword.lower() for keyword in keywords)) + f"\0{limit}\0{shard_count}"
+    return hashlib.blake2b(config.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def rebalance_if_changed(subreddits, keywords, limit, shard_count=INGESTION_SHARDS):
+    """
+    When the monitored subreddits or keywords changed since the last run, make every
+    shard due so pairs that moved to another shard, or are new, are searched right away.
+    Watermarks are kept per pair, so moved pairs continue where they left off.
+    Returns True if the configuration changed.
+    """
+    fingerprint = _fingerprint(subreddits, keywords, limit, shard_count)
+    if mention_store.get_meta("shard_fingerprint") == fingerprint:
+        return False
+    with mention_store.connect() as conn:
+        conn.execute("DELETE FROM ingestion_shards WHERE shard >= ?", (shard_count,))
+        conn.execute("UPDATE ingestion_shards SET last_run_at = 0")
+    mention_store.set_meta("shard_fingerprint", fingerprint)
+    print(f"Monitoring configuration changed, rebalanced {shard_count} ingestion shard(s)")
+    return True
+
+
+def due_shards(interval_seconds, requested_at, shard_count=INGESTION_SHARDS):
+    """Shards not run within `interval_seconds` or not since a refresh was requested at `requested_at`"""
+    with mention_store.connect() as conn:
+        last_runs = dict(conn.execute("SELECT shard, last_run_at FROM ingestion_shards").fetchall())
+    now = time.time()
+    return [
+        shard for shard in range(shard_count)
+        if last_runs.get(shard, 0) < requested_at or now - last_runs.get(shard, 0) >= interval_seconds
+    ]
+
+
+def record_run(shard, queries, started_at, mentions, owner):
+    with mention_store.connect() as conn:
+        conn.execute(
+            """
+            INSERT INTO ingestion_shards (shard, queries, pairs, last_run_at, last_duration, last_mentions, owner)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(shard) DO UPDATE SET
+                queries = excluded.queries,
+                pairs = excluded.pairs,
+                last_run_at = excluded.last_run_at,
+                last_duration = excluded.last_duration,
+                last_mentions = excluded.last_mentions,
+                owner = excluded.owner
+            """,
+            (shard, len(queries), sum(len(q.subreddits) * len(q.keywords) for q in queries),
+             started_at, time.time() - started_at, mentions, owner),
+        )
+
+
+def limiter(shard, shard_count=INGESTION_SHARDS):
+    """
+    Rate limiter for one shard's searches, with one share of the Reddit budget (see
+    rate_limiter.budget_share); each bucket is also clamped by the X-Ratelimit headers,
+    which count the whole account. None, i.e. the shared limiter, when there is a single shard.
+    """
+    if shard_count == 1:
+        return None
+    if shard not in _limiters:
+        _limiters[shard] = TokenBucket(budget_share(shard_count))
+    return _limiters[shard]
+
+
+def limiter_stats():
+    """stats() of the shard limiters this process has used"""
+    return [bucket.stats() for bucket in _limiters.values()]
+
+
+def status(shard_count=INGESTION_SHARDS):
+    """Last run of every shard and the worker currently holding it, if any"""
+    now = time.time()
+    with mention_store.connect() as conn:
+        rows = {row["shard"]: dict(row) for row in conn.execute("SELECT * FROM ingestion_shards").fetchall()}
+        holders = dict(conn.execute(
+            "SELECT name, owner FROM leases WHERE name LIKE 'ingestion_shard:%' AND expires_at > ?", (now,)
+        ).fetchall())
+    return [
+        {**rows.get(shard, {"shard": shard, "last_run_at": None}), "running_on": holders.get(lease_name(shard))}
+        for shard in range(shard_count)
+    ]
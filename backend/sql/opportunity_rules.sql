@@ -0,0 +1,9 @@
+-- Opportunity scoring rules. The backend uses the newest row; without one (or without
+-- this table) it falls back to DEFAULT_RULES in opportunity_scoring.py.
+-- Run once in the Supabase SQL editor.
+
+CREATE TABLE IF NOT EXISTS opportunity_rules (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    rules JSONB NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
@@ -0,0 +1,19 @@
+-- Unified triage state, replacing flagged_posts, engaged_posts and ignored_posts.
+-- Run once in the Supabase SQL editor. The old tables are left in place until the
+-- backfilled data has been checked; drop them afterwards.
+
+CREATE TABLE IF NOT EXISTS post_state (
+    post_id TEXT NOT NULL,
+    state TEXT NOT NULL CHECK (state IN ('flagged', 'engaged', 'ignored')),
+    active BOOLEAN NOT NULL DEFAULT TRUE,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (post_id, state)
+);
+
+CREATE INDEX IF NOT EXISTS post_state_active_idx ON post_state (state) WHERE active;
+
+INSERT INTO post_state (post_id, state)
+    SELECT DISTINCT post_id, 'flagged' FROM flagged_posts
+    UNION SELECT DISTINCT post_id, 'engaged' FROM engaged_posts
+    UNION SELECT DISTINCT post_id, 'ignored' FROM ignored_posts
+ON CONFLICT (post_id, state) DO NOTHING;
@@ -0,0 +1,151 @@
+import os
+import socket
+import threading
+import time
+
+# Try relative imports first (for local development), fall back to absolute (for Railway)
+try:
+    from . import archive, dedup, events, mention_store, triage, ttl_cache
+    from .keyword_matcher import get_matcher
+    from .query_planner import chunk_subreddits
+    from .reddit_utils import rate_limited, submission_to_mention
+    from .ingestion import score_mentions
+    from . import clients
+except ImportError:
+    import archive
+    import dedup
+    import events
+    import mention_store
+    import triage
+    import ttl_cache
+    from keyword_matcher import get_matcher
+    from query_planner import chunk_subreddits
+    from reddit_utils import rate_limited, submission_to_mention
+    from ingestion import score_mentions
+    import clients
+
+# Opt-in: the monitor uses part of the same Reddit budget as search-based ingestion
+STREAM_MONITOR_ENABLED = os.getenv("STREAM_MONITOR_ENABLED", "false").lower() in ("1", "true", "yes")
+# Pause between polls when no stream had anything new
+STREAM_POLL_SECONDS = float(os.getenv("STREAM_POLL_SECONDS", "5"))
+# Lease held by the one worker that streams; renewed while it runs
+LEASE_SECONDS = 60
+# How long a worker without the lease waits before trying to take it over
+STANDBY_SECONDS = 15
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+_thread = None
+_stop = threading.Event()
+
+
+def _config_version():
+    """Changes whenever the subreddit or keyword caches are invalidated, from any worker"""
+    return (ttl_cache.version("subreddits"), ttl_cache.version("keywords"))
+
+
+def _rate_limited_listing(listing):
+    """
+    A listing method whose every call takes a rate-limit token per page fetched. A stream
+    poll fetches the listing again until a response has nothing new, so draining one
+    stream can cost several requests.
+    """
+    def fetch(**kwargs):
+        return list(rate_limited(listing(**kwargs)))
+    return fetch
+
+
+def _open_streams(subreddits):
+    """One submission stream per multireddit chunk, yielding None whenever a poll finds nothing new"""
+    # What subreddit.stream.submissions() builds, with the rate limiter around each request
+    from praw.models.util import stream_generator
+    return [
+        stream_generator(_rate_limited_listing(clients.get_reddit().subreddit("+".join(chunk)).new),
+                         skip_existing=True, pause_after=0)
+        for chunk in chunk_subreddits(subreddits)
+    ]
+
+
+def process_submission(post, subreddit_names, matcher, rules=None):
+    """Match, score and store one streamed submission. Returns the mention or None."""
+    text = post.title + " " + (post.selftext or "")
+    matched = matcher.find_all(text)
+    if not matched:
+        return None
+    display_name = post.subreddit.display_name
+    mention = submission_to_mention(post, subreddit_names.get(display_name.lower(), display_name), matched)
+    dedup.assign_clusters([mention], {mention["id"]: text})
+    mention = score_mentions([mention], rules)[0]
+    new_ids = mention_store.save_posts([mention], is_mention=True)
+    archive.record_mentions([mention])
+    triage.record([mention])
+    if new_ids:
+        events.publish_mentions([mention])
+    return mention
+
+
+def _stream_until_reconfigured(subreddits, keywords, rules, version):
+    subreddit_names = {name.lower(): name for name in subreddits}
+    matcher = get_matcher(keywords)
+    streams = _open_streams(subreddits)
+    lease_renewed_at = time.monotonic()
+    while not _stop.is_set():
+        # Round-robin: drain whatever each stream has, then move on when it reports no new posts
+        found = False
+        for stream in streams:
+            for post in stream:
+                if post is None:
+                    break
+                found = True
+                try:
+                    if process_submission(post, subreddit_names, matcher, rules):
+                        print(f"Stream monitor stored mention {post.id}")
+                except Exception as e:
+                    print(f"Stream monitor failed on {post.id}: {e}")
+        if not found:
+            _stop.wait(STREAM_POLL_SECONDS)
+        if _config_version() != version:
+            return
+        if time.monotonic() - lease_renewed_at > LEASE_SECONDS / 3:
+            if not mention_store.acquire_lease("stream_monitor", WORKER_ID, LEASE_SECONDS):
+                return
+            lease_renewed_at = time.monotonic()
+
+
+def _run(load_config, load_rules):
+    while not _stop.is_set():
+        try:
+            if not mention_store.acquire_lease("stream_monitor", WORKER_ID, LEASE_SECONDS):
+                _stop.wait(STANDBY_SECONDS)
+                continue
+            version = _config_version()
+            subreddits, keywords = load_config()
+            if not subreddits or not keywords:
+                _stop.wait(STANDBY_SECONDS)
+                continue
+            print(f"Stream monitor watching {len(subreddits)} subreddit(s) for {len(keywords)} keyword(s)")
+            _stream_until_reconfigured(subreddits, keywords, load_rules(), version)
+        except Exception as e:
+            print(f"Stream monitor error: {e}")
+            _stop.wait(STANDBY_SECONDS)
+    mention_store.release_lease("stream_monitor", WORKER_ID)
+
+
+def start(load_config, load_rules):
+    """
+    Start the monitor thread. `load_config` returns (subreddits, keywords) and
+    `load_rules` the opportunity rules; both are re-read on reconfiguration.
+    """
+    global _thread
+    if not STREAM_MONITOR_ENABLED or _thread is not None:
+        return None
+    _stop.clear()
+    _thread = threading.Thread(target=_run, args=(load_config, load_rules), name="stream-monitor", daemon=True)
+    _thread.start()
+    return _thread
+
+
+def stop():
+    global _thread
+    _stop.set()
+    _thread = None
@@ -0,0 +1,401 @@
+"""
+Offline benchmarks run against the fakes in fakes.py.
+
+    python tests/benchmarks.py            # run all benchmarks, from backend/
+    python tests/benchmarks.py search     # run one by name
+
+BENCH_FIXTURE=fixture.json python tests/benchmarks.py app replays submissions recorded with
+`python tests/fakes.py capture` instead of synthetic ones. The regressions they guard
+(API call counts, startup time) are asserted by the pytest tests in this directory.
+"""
+import json
+import os
+import random
+import resource
+import statistics
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+
+# Keep benchmark data out of the real local store
+os.environ.setdefault("LOCAL_STORE_PATH", os.path.join(tempfile.mkdtemp(prefix="bench-"), "local_store.db"))
+os.environ.setdefault("SESSION_SECRET_KEY", "benchmark")
+
+# The app modules live one directory up; fakes.py sits next to this file
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import clients
+import comment_ingestion
+import dedup
+import fakes
+import main
+import mention_records
+import mention_store
+import rate_limiter
+import reddit_utils
+import sentiment_engine
+import shards
+import triage
+from keyword_matcher import get_matcher
+from opportunity_scoring import score_opportunities
+from rate_limiter import TokenBucket
+from sentiment_analysis import analyze_sentiment
+from test_startup import DEFERRED_MODULES, STARTUP_BUDGET_SECONDS, probe_startup
+
+# The fake client has no real budget; don't let the shared limiter's waits skew timings
+reddit_utils.reddit_limiter = TokenBucket(rate_per_minute=10 ** 9)
+rate_limiter.REDDIT_REQUESTS_PER_MINUTE = 10 ** 9
+
+BENCH_SUBREDDITS = ["SaaS", "startups", "Entrepreneur", "smallbusiness", "ecommerce",
+                    "microsaas", "indiehackers", "webdev", "sideproject", "marketing",
+                    "sales", "stripe", "business", "productivity", "software",
+                    "shopify", "growthhacking", "digitalnomad", "fintech", "payments"]
+BENCH_KEYWORDS = ["Cleverbridge", "Merchant of Record", "FastSpring", "payment methods",
+                  "scaling", "payment services", "scaling payments", "Paddle", "MoR", "sales tax"]
+
+
+def _legacy_search(reddit, subreddits, keywords, limit):
+    """The pre-planner access pattern: one search per (subreddit, keyword) pair"""
+    for subreddit_name in subreddits:
+        subreddit = reddit.subreddit(subreddit_name)
+        for keyword in keywords:
+            list(subreddit.search(keyword, sort="new", limit=limit))
+
+
+def bench_search(limit=25):
+    """API calls for one mention fetch, per-pair searches vs planned batched queries"""
+    fake = fakes.FakeReddit(fakes.synthetic_submissions(BENCH_SUBREDDITS, BENCH_KEYWORDS))
+
+    start = time.perf_counter()
+    _legacy_search(fake, BENCH_SUBREDDITS, BENCH_KEYWORDS, limit)
+    legacy_calls, legacy_time = fake.api_calls, time.perf_counter() - start
+
+    fake.api_calls = 0
+    clients.install(reddit=fake)
+    start = time.perf_counter()
+    mentions = reddit_utils.get_recent_mentions(BENCH_SUBREDDITS, keywords=BENCH_KEYWORDS, limit=limit)
+    planned_calls, planned_time = fake.api_calls, time.perf_counter() - start
+    # A second poll with watermarks only pages until it reaches already-seen posts
+    marks = {}
+    reddit_utils.get_recent_mentions(BENCH_SUBREDDITS, keywords=BENCH_KEYWORDS, limit=limit, marks=marks)
+    fake.api_calls = 0
+    start = time.perf_counter()
+    new_mentions = reddit_utils.get_recent_mentions(BENCH_SUBREDDITS, keywords=BENCH_KEYWORDS, limit=limit, marks=marks)
+    incremental_calls, incremental_time = fake.api_calls, time.perf_counter() - start
+
+    print(f"search: {len(BENCH_SUBREDDITS)} subreddits x {len(BENCH_KEYWORDS)} keywords, limit={limit}")
+    print(f"  per-pair searches: {legacy_calls} API calls ({legacy_time * 1000:.1f} ms)")
+    print(f"  planned queries:   {planned_calls} API calls ({planned_time * 1000:.1f} ms), {len(mentions)} mentions")
+    print(f"  incremental poll:  {incremental_calls} API calls ({incremental_time * 1000:.1f} ms), {len(new_mentions)} new mentions")
+    return {"legacy_calls": legacy_calls, "planned_calls": planned_calls, "incremental_calls": incremental_calls}
+
+
+def bench_posts_by_ids(count=300, latency=0.05):
+    """Wall time and API calls for fetching tracked posts, one-by-one vs bulk /api/info"""
+    fake = fakes.FakeReddit(fakes.synthetic_submissions(BENCH_SUBREDDITS, BENCH_KEYWORDS), latency=latency)
+    post_ids = [s.id for s in fake.submissions[:count]]
+
+    start = time.perf_counter()
+    for post_id in post_ids:
+        fake.submission(post_id)
+        time.sleep(0.1)  # The old per-post delay
+    legacy_calls, legacy_time = fake.api_calls, time.perf_counter() - start
+
+    fake.api_calls = 0
+    clients.install(reddit=fake)
+    start = time.perf_counter()
+    posts = reddit_utils.get_posts_by_ids(post_ids)
+    bulk_calls, bulk_time = fake.api_calls, time.perf_counter() - start
+    fake.api_calls = 0
+    start = time.perf_counter()
+    reddit_utils.get_posts_by_ids(post_ids)
+    cached_calls, cached_time = fake.api_calls, time.perf_counter() - start
+
+    print(f"posts_by_ids: {count} posts, {latency * 1000:.0f} ms simulated latency per call")
+    print(f"  one-by-one: {legacy_calls} API calls ({legacy_time:.2f} s)")
+    print(f"  bulk info:  {bulk_calls} API calls ({bulk_time:.2f} s), {len(posts)} posts")
+    print(f"  cached:     {cached_calls} API calls ({cached_time:.2f} s)")
+    return {"legacy_calls": legacy_calls, "bulk_calls": bulk_calls, "cached_calls": cached_calls}
+
+
+def bench_sentiment(count=10000):
+    """Sentiment scoring throughput for `count` synthetic posts: cold, cached and process pool"""
+    submissions = fakes.synthetic_submissions(BENCH_SUBREDDITS, BENCH_KEYWORDS, per_subreddit=count // len(BENCH_SUBREDDITS))
+    posts = [{"title": s.title, "body": s.selftext} for s in submissions]
+
+    def run(label):
+        batch = [dict(post) for post in posts]
+        start = time.perf_counter()
+        analyze_sentiment(batch)
+        elapsed = time.perf_counter() - start
+        print(f"  {label:<15} {elapsed:.2f} s, {len(batch) / elapsed:,.0f} posts/s")
+        return elapsed
+
+    print(f"sentiment: {len(posts)} synthetic posts")
+    threshold = sentiment_engine.SENTIMENT_POOL_THRESHOLD
+    sentiment_engine.SENTIMENT_POOL_THRESHOLD = len(posts) + 1
+    try:
+        cold = run("single process")
+        cached = run("cached")
+        sentiment_engine._cache.clear()
+        sentiment_engine.SENTIMENT_POOL_THRESHOLD = 1
+        pooled = run(f"pool x{sentiment_engine.SENTIMENT_POOL_WORKERS}")
+    finally:
+        sentiment_engine.SENTIMENT_POOL_THRESHOLD = threshold
+    return {"posts": len(posts), "cold_s": cold, "cached_s": cached, "pooled_s": pooled}
+
+
+def bench_comments(comment_count=5000, threads=8):
+    """API calls, time and peak memory for scanning large comment threads on the worker pool"""
+    submissions = [fakes.synthetic_thread(f"thread{i}", "SaaS", BENCH_KEYWORDS, comment_count, seed=i)
+                   for i in range(threads)]
+    fake = fakes.FakeReddit(submissions, latency=0.02)
+    thread_infos = [{"id": s.id, "title": s.title, "subreddit_name": "SaaS", "num_comments": s.num_comments}
+                    for s in submissions]
+    matcher = get_matcher(BENCH_KEYWORDS)
+
+    clients.install(reddit=fake)
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=comment_ingestion.COMMENT_WORKERS) as pool:
+            found = [m for batch in pool.map(lambda t: comment_ingestion.scan_thread(t, matcher), thread_infos)
+                     for m in batch]
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    print(f"comments: {threads} threads x {comment_count} comments, {comment_ingestion.COMMENT_WORKERS} workers")
+    print(f"  {fake.api_calls} API calls ({fake.api_calls / threads:.0f} per thread), {elapsed:.2f} s, "
+          f"{len(found)} matching comments, peak {peak / 1e6:.1f} MB traced")
+    return {"api_calls": fake.api_calls, "matches": len(found), "seconds": elapsed, "peak_bytes": peak}
+
+
+def bench_dedup(indexed=20000, batch=200):
+    """Near-duplicate lookup cost as the signature index grows, and how many reposts are caught"""
+    rng = random.Random(3)
+    vocabulary = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(5000)]
+    texts = {f"post{i}": " ".join(rng.choices(vocabulary, k=25)) for i in range(indexed)}
+    mentions = [{"id": post_id, "created_utc": i} for i, post_id in enumerate(texts)]
+
+    results = {}
+    for size in (indexed // 10, indexed):
+        dedup.prune(window_days=-1)
+        start = time.perf_counter()
+        dedup.assign_clusters([dict(m) for m in mentions[:size]], texts)
+        build = time.perf_counter() - start
+        # Reposts: the first posts again under new IDs, with a closing word added
+        reposts = [{"id": f"repost{i}", "created_utc": indexed + i} for i in range(batch)]
+        repost_texts = {f"repost{i}": texts[f"post{i}"] + " thanks" for i in range(batch)}
+        start = time.perf_counter()
+        dedup.assign_clusters(reposts, repost_texts)
+        lookup = time.perf_counter() - start
+        caught = sum(1 for m in reposts if m.get("duplicate_of") == m["id"].replace("repost", "post"))
+        print(f"dedup: {size} indexed ({build:.2f} s to build), {batch} reposts checked in "
+              f"{lookup * 1000 / batch:.2f} ms each, {caught} clustered with their original "
+              f"(recall {caught / batch:.0%} at distance {dedup.SIMHASH_MAX_DISTANCE})")
+        results[size] = {"lookup_ms": lookup * 1000 / batch, "caught": caught, "recall": caught / batch}
+    return results
+
+
+def bench_shards(subreddits=50, keywords=200, shard_counts=(1, 2, 4, 8), limit=25, latency=0.02):
+    """
+    Mention search split into shards, each run in its own thread as a worker would run it.
+    Reports wall time, API calls, the busiest shard's query count and whether the merged
+    mentions match the unsharded search.
+    """
+    rng = random.Random(5)
+    subreddit_names = (BENCH_SUBREDDITS + [f"community{i}" for i in range(subreddits)])[:subreddits]
+    keyword_names = (BENCH_KEYWORDS + ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(5, 10)))
+                                       for _ in range(keywords)])[:keywords]
+    fake = fakes.FakeReddit(fakes.synthetic_submissions(subreddit_names, keyword_names), latency=latency)
+    clients.install(reddit=fake)
+
+    print(f"shards: {subreddits} subreddits x {keywords} keywords, limit={limit}, {latency * 1000:.0f} ms per API call")
+    def search(queries):
+        return reddit_utils.get_recent_mentions(subreddit_names, keywords=keyword_names, limit=limit,
+                                                queries=queries, limiter=TokenBucket(rate_per_minute=10 ** 9))
+
+    # Unsharded reference, which also warms the keyword matcher
+    expected = {post["id"] for post in search(None)}
+    results = {}
+    for count in shard_counts:
+        plan = shards.plan(subreddit_names, keyword_names, limit, count)
+        fake.api_calls = 0
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=count) as pool:
+            found = {post["id"] for mentions in pool.map(search, plan) for post in mentions}
+        elapsed = time.perf_counter() - start
+        busiest = max(len(queries) for queries in plan)
+        print(f"  {count} shard(s): {elapsed:.2f} s, {fake.api_calls} API calls, busiest shard {busiest} queries, "
+              f"{len(found)} mentions{'' if found == expected else ' (differs from the unsharded search)'}")
+        results[count] = {"seconds": elapsed, "api_calls": fake.api_calls, "mentions": len(found)}
+    return results
+
+
+def bench_triage(count=50000, limit=50, runs=20):
+    """Top `limit` un-actioned mentions from the triage queue vs loading and sorting every mention"""
+    rng = random.Random(9)
+    now = time.time()
+    posts = [{"id": f"triage{i}", "subreddit": "r/SaaS", "title": "t", "body": "", "score": 0.0,
+              "upvotes": rng.randrange(100), "comments": rng.randrange(30), "status": "neutral",
+              "opportunity_score": float(rng.randrange(6)), "created_utc": now - rng.randrange(86400 * 14)}
+             for i in range(count)]
+    mention_store.save_posts(posts, is_mention=True)
+    triage.record(posts)
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        queued = triage.top(["SaaS"], limit)
+    queue_ms = (time.perf_counter() - start) * 1000 / runs
+    start = time.perf_counter()
+    for _ in range(runs):
+        ranked = sorted(mention_store.load_mentions(["SaaS"]), key=lambda post: post["opportunity_score"], reverse=True)[:limit]
+    sort_ms = (time.perf_counter() - start) * 1000 / runs
+    print(f"triage: top {limit} of {count} mentions in {queue_ms:.2f} ms from the queue, "
+          f"{sort_ms:.1f} ms loading and sorting all of them")
+    return {"queue_ms": queue_ms, "sort_ms": sort_ms, "returned": len(queued), "sorted": len(ranked)}
+
+
+def bench_records(count=50000):
+    """Memory per retained mention: stored dicts as json.loads returns them vs Mention records"""
+    submissions = fakes.synthetic_submissions(BENCH_SUBREDDITS, BENCH_KEYWORDS, per_subreddit=count // len(BENCH_SUBREDDITS))
+    posts = [reddit_utils.submission_to_mention(s, keywords=BENCH_KEYWORDS[:2]) for s in submissions]
+    for post in score_opportunities(analyze_sentiment(posts)):
+        # The display fields every stored mention carried before they moved to the API boundary
+        mention_records.present(post)
+    rows = [json.dumps(post) for post in posts]
+
+    def traced(build):
+        tracemalloc.start()
+        kept = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return kept, size
+
+    dicts, dict_bytes = traced(lambda: [json.loads(row) for row in rows])
+    records, record_bytes = traced(lambda: [mention_records.Mention.from_dict(json.loads(row)) for row in rows])
+    start = time.perf_counter()
+    [record.to_dict() for record in records]
+    serialize_ms = (time.perf_counter() - start) * 1000
+    print(f"records: {len(rows)} mentions, {dict_bytes / len(rows):.0f} bytes each as dicts, "
+          f"{record_bytes / len(rows):.0f} bytes as Mention records; to_dict for all in {serialize_ms:.0f} ms")
+    return {"dict_bytes": dict_bytes / len(rows), "record_bytes": record_bytes / len(rows), "serialize_ms": serialize_ms}
+
+
+def _percentiles(samples):
+    ordered = sorted(samples)
+    return {f"p{p}": ordered[min(len(ordered) - 1, len(ordered) * p // 100)] for p in (50, 95, 99)}
+
+
+def _time_requests(client, path, count, headers=None):
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = client.get(path, headers=headers or {})
+        latencies.append((time.perf_counter() - start) * 1000)
+        if response.status_code not in (200, 304):
+            raise RuntimeError(f"GET {path} returned {response.status_code}")
+    return _percentiles(latencies), response
+
+
+def bench_app(subreddits=50, keywords=200, engaged=10000, requests=20, reddit_latency=0.01, supabase_latency=0.005):
+    """
+    End to end against fake Reddit and Supabase clients: an ingestion run, then repeated
+    /dashboard-data and /recent-mentions requests. Reports latency percentiles, API calls,
+    Supabase queries and peak RSS.
+    """
+    rng = random.Random(5)
+    subreddit_names = (BENCH_SUBREDDITS + [f"community{i}" for i in range(subreddits)])[:subreddits]
+    keyword_names = (BENCH_KEYWORDS + ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(5, 10)))
+                                       for _ in range(keywords)])[:keywords]
+    fixture = os.getenv("BENCH_FIXTURE")
+    if fixture:
+        submissions = fakes.load_submissions(fixture)
+    else:
+        submissions = fakes.synthetic_submissions(subreddit_names, keyword_names,
+                                                  per_subreddit=max(200, engaged * 2 // subreddits))
+        # Spread the synthetic month up to now, so the dashboard window sees its last days
+        shift = time.time() - max(s.created_utc for s in submissions)
+        for submission in submissions:
+            submission.created_utc += shift
+    engaged_ids = [s.id for s in rng.sample(submissions, min(engaged, len(submissions)))]
+
+    reddit = fakes.FakeReddit(submissions, latency=reddit_latency)
+    db = fakes.FakeSupabase({
+        "monitored_subreddits": [{"name": name} for name in subreddit_names],
+        "keywords": [{"name": name} for name in keyword_names],
+        "post_state": [{"post_id": post_id, "state": "engaged", "active": True} for post_id in engaged_ids],
+    }, latency=supabase_latency)
+    clients.install(reddit=reddit, supabase=db, async_supabase=db.async_client())
+
+    print(f"app: {subreddits} subreddits, {keywords} keywords, {len(engaged_ids)} engaged posts, "
+          f"{len(submissions)} submissions{' from ' + fixture if fixture else ''}")
+    results = {}
+    for label in ("cold ingestion", "next ingestion"):
+        reddit.api_calls, db.queries = 0, 0
+        start = time.perf_counter()
+        for shard in range(shards.INGESTION_SHARDS):
+            main.run_ingestion_shard(shard)
+        main.run_ingestion()
+        elapsed = time.perf_counter() - start
+        print(f"  {label:<22} {elapsed:.2f} s, {reddit.api_calls} Reddit API calls, {db.queries} Supabase queries")
+        results[label] = {"seconds": elapsed, "api_calls": reddit.api_calls, "queries": db.queries}
+
+    client = TestClient(main.app)
+    for path in ("/dashboard-data", "/recent-mentions"):
+        db.queries = 0
+        latencies, response = _time_requests(client, path, requests)
+        queries = db.queries / requests
+        cached, _ = _time_requests(client, path, requests, headers={"If-None-Match": response.headers["etag"]})
+        print(f"  {path:<22} p50 {latencies['p50']:.1f} ms, p95 {latencies['p95']:.1f} ms, "
+              f"p99 {latencies['p99']:.1f} ms, {queries:.1f} Supabase queries, {len(response.content) / 1e6:.1f} MB; "
+              f"304 p50 {cached['p50']:.1f} ms")
+        results[path] = {**latencies, "not_modified_p50": cached["p50"], "queries": queries}
+
+    # ru_maxrss is in kilobytes on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"  peak RSS {peak_rss:.0f} MB")
+    results["peak_rss_mb"] = peak_rss
+    return results
+
+
+def bench_startup(runs=5):
+    """
+    Cold import time of main.py, measured in fresh interpreters as every worker pays it.
+    test_startup.py fails when it exceeds STARTUP_BUDGET_SECONDS or loads a deferred module.
+    """
+    samples = [probe_startup() for _ in range(runs)]
+    median = statistics.median(sample["seconds"] for sample in samples)
+    loaded, built = samples[-1]["loaded"], samples[-1]["clients"]
+    print(f"startup: import main in {median * 1000:.0f} ms (median of {runs}, budget {STARTUP_BUDGET_SECONDS * 1000:.0f} ms)")
+    print(f"  loaded at import: {', '.join(loaded) or 'none of ' + ', '.join(DEFERRED_MODULES)}; "
+          f"clients built: {', '.join(built) or 'none'}")
+    return {"seconds": median, "loaded": loaded, "clients": built}
+
+
+BENCHMARKS = {
+    "search": bench_search,
+    "posts_by_ids": bench_posts_by_ids,
+    "sentiment": bench_sentiment,
+    "comments": bench_comments,
+    "dedup": bench_dedup,
+    "shards": bench_shards,
+    "triage": bench_triage,
+    "records": bench_records,
+    "app": bench_app,
+    "startup": bench_startup,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
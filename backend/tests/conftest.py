@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# Tests import the app modules from backend/ and never touch the real local store
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ["LOCAL_STORE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="tests-"), "local_store.db")
+os.environ.setdefault("SESSION_SECRET_KEY", "tests")
@@ -0,0 +1,474 @@
+"""
+Offline stand-ins for the Reddit and Supabase clients, used by the tests and benchmarks.py to measure
+API-call counts and latency without network access. Install them with clients.install().
+
+    python tests/fakes.py capture fixture.json SaaS startups   # record live submissions for replay
+"""
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+# PRAW fetches listings in pages of up to 100 items, one API call per page
+LISTING_PAGE_SIZE = 100
+
+
+class FakeAuthor:
+    def __init__(self, name):
+        self.name = name
+
+
+class FakeSubredditRef:
+    def __init__(self, display_name):
+        self.display_name = display_name
+
+
+class FakeComment:
+    def __init__(self, id, body, author="someone", score=1, created_utc=0.0, replies=()):
+        self.id = id
+        self.body = body
+        self.author = FakeAuthor(author) if author else None
+        self.score = score
+        self.created_utc = created_utc
+        self.replies = list(replies)
+        self.permalink = f"/comments/x/_/{id}/"
+
+
+class FakeMoreComments:
+    """A "load more comments" placeholder; it has no body"""
+
+    def __init__(self, comments):
+        self.comments = comments
+
+
+class FakeCommentForest:
+    """
+    Top-level comments as PRAW returns them: the first `limit` are loaded, the rest sit
+    behind placeholders of 100 that replace_more() expands one API call at a time
+    """
+
+    def __init__(self, reddit, comments, limit):
+        self._reddit = reddit
+        self._items = list(comments[:limit])
+        rest = comments[limit:]
+        self._items += [FakeMoreComments(rest[i:i + 100]) for i in range(0, len(rest), 100)]
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def replace_more(self, limit=32):
+        for _ in range(limit):
+            index = next((i for i, item in enumerate(self._items) if isinstance(item, FakeMoreComments)), None)
+            if index is None:
+                break
+            self._reddit.record_call()
+            self._items[index:index + 1] = self._items[index].comments
+        return [item for item in self._items if isinstance(item, FakeMoreComments)]
+
+
+class FakeSubmission:
+    def __init__(self, id, subreddit, title, selftext="", author="someone", score=1, num_comments=0, created_utc=0.0,
+                 comment_tree=()):
+        self.id = id
+        self.name = f"t3_{id}"
+        self.subreddit = FakeSubredditRef(subreddit)
+        self.title = title
+        self.selftext = selftext
+        self.author = FakeAuthor(author) if author else None
+        self.score = score
+        self.num_comments = num_comments
+        self.created_utc = created_utc
+        self.permalink = f"/r/{subreddit}/comments/{id}/"
+        self.comment_tree = list(comment_tree)
+        self.comment_sort = "confidence"
+        self.comment_limit = None
+        self._reddit = None
+        self._comments = None
+
+    @property
+    def comments(self):
+        if self._comments is None:
+            self._comments = FakeCommentForest(self._reddit, self.comment_tree, self.comment_limit or 200)
+        return self._comments
+
+
+def _query_terms(query):
+    """Split an OR'd search expression into lowercase phrases"""
+    return [term.strip().strip('"').lower() for term in re.split(r"\s+OR\s+", query) if term.strip()]
+
+
+class FakeSubreddit:
+    def __init__(self, reddit, name):
+        self._reddit = reddit
+        self.display_name = name
+        self._names = {part.lower() for part in name.split("+")}
+
+    def _submissions(self):
+        if "all" in self._names:
+            return self._reddit.submissions
+        return [s for s in self._reddit.submissions if s.subreddit.display_name.lower() in self._names]
+
+    def new(self, limit=100):
+        results = sorted(self._submissions(), key=lambda s: s.created_utc, reverse=True)[:limit]
+        pages = max(1, -(-len(results) // LISTING_PAGE_SIZE))
+        for page in range(pages):
+            self._reddit.record_call()
+            yield from results[page * LISTING_PAGE_SIZE:(page + 1) * LISTING_PAGE_SIZE]
+
+    def search(self, query, sort="new", limit=100):
+        terms = _query_terms(query)
+        results = [
+            s for s in self._submissions()
+            if any(term in (s.title + " " + s.selftext).lower() for term in terms)
+        ]
+        if sort == "new":
+            results.sort(key=lambda s: s.created_utc, reverse=True)
+        if limit is not None:
+            results = results[:limit]
+        # One call per listing page, and at least one for an empty result
+        pages = max(1, -(-len(results) // LISTING_PAGE_SIZE))
+        for page in range(pages):
+            self._reddit.record_call()
+            for submission in results[page * LISTING_PAGE_SIZE:(page + 1) * LISTING_PAGE_SIZE]:
+                yield submission
+
+
+class FakeAuth:
+    """PRAW's reddit.auth: `limits` holds the X-Ratelimit-* values of the last response"""
+
+    def __init__(self):
+        self.limits = {"remaining": None, "reset_timestamp": None, "used": None}
+
+
+class FakeReddit:
+    """
+    Serves a fixed list of FakeSubmission objects and counts API calls. With `rate_limit`
+    set, it reports a budget of that many calls per `window_seconds` through auth.limits,
+    as Reddit does, and counts the calls made over budget in `throttled`.
+    """
+
+    def __init__(self, submissions=(), latency=0.0, rate_limit=None, window_seconds=600):
+        self.submissions = list(submissions)
+        self.by_id = {s.id: s for s in self.submissions}
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.window_seconds = window_seconds
+        self.api_calls = 0
+        self.throttled = 0
+        self.auth = FakeAuth()
+        self._window_used = 0
+        self._window_ends = 0.0
+        self._lock = threading.Lock()
+
+    def record_call(self):
+        with self._lock:
+            self.api_calls += 1
+            if self.rate_limit is not None:
+                now = time.time()
+                if now >= self._window_ends:
+                    self._window_ends = now + self.window_seconds
+                    self._window_used = 0
+                self._window_used += 1
+                if self._window_used > self.rate_limit:
+                    self.throttled += 1
+                self.auth.limits = {
+                    "remaining": max(0, self.rate_limit - self._window_used),
+                    "reset_timestamp": self._window_ends,
+                    "used": self._window_used,
+                }
+        if self.latency:
+            time.sleep(self.latency)
+
+    def subreddit(self, name):
+        return FakeSubreddit(self, name)
+
+    def submission(self, id):
+        # Counts as the one call that loads the submission together with its first comments
+        self.record_call()
+        submission = self.by_id[id]
+        submission._reddit = self
+        submission._comments = None
+        return submission
+
+    def info(self, fullnames):
+        # PRAW splits /api/info lookups into calls of 100 fullnames
+        fullnames = list(fullnames)
+        for i in range(0, len(fullnames), 100):
+            self.record_call()
+            for fullname in fullnames[i:i + 100]:
+                submission = self.by_id.get(fullname.split("_", 1)[-1])
+                if submission is not None:
+                    yield submission
+
+
+def synthetic_submissions(subreddits, keywords, per_subreddit=200, match_rate=0.3, seed=7):
+    """Generate submissions where roughly `match_rate` of posts mention one of the keywords"""
+    rng = random.Random(seed)
+    filler = ["billing", "growth", "launch", "pricing", "customers", "churn", "tax", "invoice", "team", "product"]
+    submissions = []
+    for subreddit in subreddits:
+        for i in range(per_subreddit):
+            words = rng.sample(filler, 5)
+            if rng.random() < match_rate:
+                words.insert(rng.randrange(len(words) + 1), rng.choice(keywords))
+            submissions.append(FakeSubmission(
+                id=f"{subreddit.lower()}{i}",
+                subreddit=subreddit,
+                title=" ".join(words).capitalize(),
+                selftext=" ".join(rng.sample(filler, 8)),
+                author=f"user{rng.randrange(1000)}",
+                score=rng.randrange(50),
+                num_comments=rng.randrange(20),
+                created_utc=1_700_000_000 + rng.randrange(86400 * 30),
+            ))
+    return submissions
+
+
+def synthetic_thread(id, subreddit, keywords, comment_count=5000, match_rate=0.02, seed=11):
+    """A submission with `comment_count` comments, a third of them replies, some mentioning a keyword"""
+    rng = random.Random(seed)
+    filler = ["billing", "growth", "launch", "pricing", "customers", "churn", "tax", "invoice", "team", "product"]
+    top_level = []
+    for i in range(comment_count):
+        words = rng.sample(filler, 6)
+        if rng.random() < match_rate:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(keywords))
+        comment = FakeComment(
+            id=f"{id}c{i}",
+            body=" ".join(words).capitalize(),
+            author=f"user{rng.randrange(1000)}",
+            score=rng.randrange(20),
+            created_utc=1_700_000_000 + i,
+        )
+        if top_level and rng.random() < 0.33:
+            rng.choice(top_level[-50:]).replies.append(comment)
+        else:
+            top_level.append(comment)
+    return FakeSubmission(id=id, subreddit=subreddit, title="Which payment provider?",
+                          num_comments=comment_count, created_utc=1_700_000_000, comment_tree=top_level)
+
+
+def capture_submissions(reddit, subreddits, limit=100):
+    """Newest submissions of each subreddit from a live PRAW client, as FakeSubmission objects"""
+    captured = []
+    for name in subreddits:
+        for post in reddit.subreddit(name).new(limit=limit):
+            captured.append(FakeSubmission(
+                id=post.id,
+                subreddit=post.subreddit.display_name,
+                title=post.title,
+                selftext=post.selftext,
+                author=post.author.name if post.author else None,
+                score=post.score,
+                num_comments=post.num_comments,
+                created_utc=post.created_utc,
+            ))
+    return captured
+
+
+def save_submissions(submissions, path):
+    with open(path, "w") as f:
+        json.dump([{
+            "id": s.id,
+            "subreddit": s.subreddit.display_name,
+            "title": s.title,
+            "selftext": s.selftext,
+            "author": s.author.name if s.author else None,
+            "score": s.score,
+            "num_comments": s.num_comments,
+            "created_utc": s.created_utc,
+        } for s in submissions], f)
+
+
+def load_submissions(path):
+    """Submissions recorded by save_submissions, for a FakeReddit to replay"""
+    with open(path) as f:
+        return [FakeSubmission(**item) for item in json.load(f)]
+
+
+class FakeResult:
+    def __init__(self, data):
+        self.data = data
+
+
+def _like(pattern):
+    """PostgREST (i)like pattern as a regex: % is any run of characters, _ any one character"""
+    return re.compile("".join(".*" if c == "%" else "." if c == "_" else re.escape(c) for c in pattern) + r"\Z",
+                      re.IGNORECASE | re.DOTALL)
+
+
+class FakeQuery:
+    """The subset of supabase-py's query builder the app uses, evaluated over in-memory rows"""
+
+    def __init__(self, db, table):
+        self._db = db
+        self._table = table
+        self._action = "select"
+        self._columns = None
+        self._payload = None
+        self._on_conflict = None
+        self._filters = []
+        self._order = None
+        self._limit = None
+
+    def select(self, *columns):
+        self._action = "select"
+        names = [name.strip() for column in columns for name in column.split(",")]
+        self._columns = None if not names or "*" in names else names
+        return self
+
+    def insert(self, rows):
+        self._action, self._payload = "insert", rows
+        return self
+
+    def upsert(self, rows, on_conflict="id"):
+        self._action, self._payload, self._on_conflict = "upsert", rows, on_conflict
+        return self
+
+    def update(self, values):
+        self._action, self._payload = "update", values
+        return self
+
+    def delete(self):
+        self._action = "delete"
+        return self
+
+    def eq(self, column, value):
+        self._filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def neq(self, column, value):
+        self._filters.append(lambda row: row.get(column) != value)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self._filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def ilike(self, column, pattern):
+        regex = _like(pattern)
+        self._filters.append(lambda row: regex.match(str(row.get(column, ""))) is not None)
+        return self
+
+    def order(self, column, desc=False):
+        self._order = (column, desc)
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def execute(self):
+        self._db.record_call()
+        return FakeResult(self._db.run(self))
+
+
+class FakeAsyncQuery(FakeQuery):
+    async def execute(self):
+        await self._db.record_call_async()
+        return FakeResult(self._db.run(self))
+
+
+class FakeSupabase:
+    """
+    In-memory Supabase: tables are lists of row dicts, shared with the async view from
+    async_client(). Counts queries and sleeps `latency` seconds per query.
+    """
+
+    def __init__(self, tables=None, latency=0.0):
+        self.tables = {name: [dict(row) for row in rows] for name, rows in (tables or {}).items()}
+        self.latency = latency
+        self.queries = 0
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def async_client(self):
+        return FakeAsyncSupabase(self)
+
+    def record_call(self):
+        with self._lock:
+            self.queries += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    async def record_call_async(self):
+        with self._lock:
+            self.queries += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def _new_row(self, row):
+        row = dict(row)
+        if "id" not in row:
+            row["id"] = self._next_id
+            self._next_id += 1
+        return row
+
+    def run(self, query):
+        with self._lock:
+            rows = self.tables.setdefault(query._table, [])
+            matching = [row for row in rows if all(f(row) for f in query._filters)]
+            if query._action == "select":
+                if query._order:
+                    column, desc = query._order
+                    matching.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+                if query._limit is not None:
+                    matching = matching[:query._limit]
+                if query._columns:
+                    return [{column: row.get(column) for column in query._columns} for row in matching]
+                return [dict(row) for row in matching]
+            if query._action == "update":
+                for row in matching:
+                    row.update(query._payload)
+                return [dict(row) for row in matching]
+            if query._action == "delete":
+                deleted = {id(row) for row in matching}
+                self.tables[query._table] = [row for row in rows if id(row) not in deleted]
+                return [dict(row) for row in matching]
+            payload = query._payload if isinstance(query._payload, list) else [query._payload]
+            if query._action == "insert":
+                inserted = [self._new_row(row) for row in payload]
+                rows.extend(inserted)
+                return [dict(row) for row in inserted]
+            # Upsert: rows matching on the conflict columns are updated, the rest inserted
+            keys = [column.strip() for column in query._on_conflict.split(",")]
+            index = {tuple(row.get(k) for k in keys): row for row in rows}
+            written = []
+            for item in payload:
+                existing = index.get(tuple(item.get(k) for k in keys))
+                if existing is not None:
+                    existing.update(item)
+                else:
+                    existing = self._new_row(item)
+                    rows.append(existing)
+                    index[tuple(existing.get(k) for k in keys)] = existing
+                written.append(dict(existing))
+            return written
+
+
+class FakeAsyncSupabase:
+    """The async client's view of a FakeSupabase; query.execute() is awaited"""
+
+    def __init__(self, db):
+        self._db = db
+
+    def table(self, name):
+        return FakeAsyncQuery(self._db, name)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4 or sys.argv[1] != "capture":
+        sys.exit("usage: python tests/fakes.py capture <fixture.json> <subreddit> [<subreddit> ...]")
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import clients
+    captured = capture_submissions(clients.get_reddit(), sys.argv[3:])
+    save_submissions(captured, sys.argv[2])
+    print(f"Captured {len(captured)} submissions to {sys.argv[2]}")
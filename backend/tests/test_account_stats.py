@@ -0,0 +1,38 @@
+import asyncio
+
+import httpx
+
+import account_stats
+import fakes
+from reddit_oauth import refresh_all_account_stats
+
+
+def _reddit(request):
+    if request.url.path == "/api/v1/me":
+        return httpx.Response(200, json={"total_karma": 42})
+    if "nohistory" in request.url.path:
+        # A token granted without the history scope
+        return httpx.Response(403, json={})
+    return httpx.Response(200, json={"data": {"children": [{}] * 3, "after": None}})
+
+
+def test_refresh_writes_stats_in_one_upsert_and_keeps_failed_counts():
+    db = fakes.FakeSupabase({"reddit_accounts": [
+        {"id": i, "username": f"user{i}", "access_token": "t", "status": "active", "karma": 0, "total_posts": 7}
+        for i in range(1, 6)
+    ] + [{"id": 6, "username": "nohistory", "access_token": "t", "status": "paused", "karma": 0, "total_posts": 7}]})
+    account_stats._client = httpx.AsyncClient(base_url=account_stats.REDDIT_OAUTH_BASE_URL,
+                                              transport=httpx.MockTransport(_reddit))
+    try:
+        rows, errors = asyncio.run(refresh_all_account_stats(db))
+    finally:
+        account_stats._client = None
+
+    # One select, one upsert for the full rows and one for the row whose count failed
+    assert db.queries == 3
+    assert len(rows) == 6 and list(errors) == [6]
+    stored = {row["id"]: row for row in db.tables["reddit_accounts"]}
+    assert len(stored) == 6
+    assert all(row["karma"] == 42 for row in stored.values())
+    assert [stored[i]["total_posts"] for i in range(1, 6)] == [3] * 5
+    assert stored[6]["total_posts"] == 7 and stored[6]["status"] == "paused"
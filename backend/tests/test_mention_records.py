@@ -0,0 +1,33 @@
+import time
+
+import pytest
+
+import mention_records
+import mention_store
+
+
+@pytest.fixture
+def hot_set():
+    now = time.time()
+    with mention_store.connect() as conn:
+        conn.execute("DELETE FROM posts")
+    posts = [
+        {"id": f"m{i}", "subreddit": "r/SaaS" if i % 2 else "r/startups", "title": f"post {i}",
+         "created_utc": now - i * 3600, "score": 0.0, "keywords": ["mor"]}
+        for i in range(100)
+    ]
+    mention_store.save_posts(posts, is_mention=True)
+    return mention_records.HotSet()
+
+
+def test_load_newest_first_within_limit(hot_set):
+    posts = hot_set.load(limit=10)
+    assert [post["id"] for post in posts] == [f"m{i}" for i in range(10)]
+    assert [post["id"] for post in posts] == [post["id"] for post in mention_store.load_mentions(limit=10)]
+
+
+def test_load_stops_at_since(hot_set):
+    since = time.time() - 24.5 * 3600
+    posts = hot_set.load(["SaaS"], since=since)
+    assert [post["id"] for post in posts] == [f"m{i}" for i in range(1, 25, 2)]
+    assert len(mention_store.load_mentions(["SaaS"], since=since)) == len(posts)
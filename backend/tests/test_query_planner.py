@@ -0,0 +1,83 @@
+import math
+
+import pytest
+
+import clients
+import fakes
+import query_planner
+import reddit_utils
+from rate_limiter import TokenBucket
+
+SUBREDDITS = [f"community{i}" for i in range(120)]
+# Seven characters quoted, so at most 46 fit in one 512-character OR expression
+KEYWORDS = [f"kw{i:03d}" for i in range(60)]
+KEYWORDS_PER_QUERY = (query_planner.MAX_QUERY_LENGTH + len(" OR ")) // (len('"kw000"') + len(" OR "))
+
+
+@pytest.fixture
+def reddit():
+    fake = fakes.FakeReddit()
+    clients.install(reddit=fake)
+    return fake
+
+
+def _search(subreddits, keywords, limit=25):
+    return reddit_utils.get_recent_mentions(subreddits, keywords=keywords, limit=limit,
+                                            limiter=TokenBucket(rate_per_minute=10 ** 9))
+
+
+def test_plan_covers_every_pair_once():
+    queries = query_planner.plan_queries(SUBREDDITS, KEYWORDS)
+    pairs = [(s, k) for query in queries for s in query.subreddits for k in query.keywords]
+    assert sorted(pairs) == sorted((s, k) for s in SUBREDDITS for k in KEYWORDS)
+    for query in queries:
+        assert len(query.query) <= query_planner.MAX_QUERY_LENGTH
+        assert len(query.subreddits) <= query_planner.MAX_SUBREDDITS_PER_QUERY
+
+
+def test_search_makes_one_call_per_planned_query(reddit):
+    # Few matches, so every query's results fit on one listing page
+    reddit.submissions = [
+        fakes.FakeSubmission(id=f"p{i}", subreddit=SUBREDDITS[i * 7 % len(SUBREDDITS)],
+                             title=f"Anyone using {KEYWORDS[i * 11 % len(KEYWORDS)]} here?", created_utc=1_700_000_000 + i)
+        for i in range(40)
+    ]
+    mentions = _search(SUBREDDITS, KEYWORDS)
+
+    bound = (math.ceil(len(SUBREDDITS) / query_planner.MAX_SUBREDDITS_PER_QUERY)
+             * math.ceil(len(KEYWORDS) / KEYWORDS_PER_QUERY))
+    assert reddit.api_calls <= bound
+    assert reddit.api_calls < len(SUBREDDITS) * len(KEYWORDS)
+    assert {post["id"] for post in mentions} == {submission.id for submission in reddit.submissions}
+
+
+def test_calls_follow_listing_pages_not_pairs(reddit):
+    subreddits = ["SaaS", "startups", "Entrepreneur", "smallbusiness", "ecommerce"]
+    keywords = ["Cleverbridge", "Merchant of Record", "FastSpring", "Paddle", "MoR"]
+    reddit.submissions = fakes.synthetic_submissions(subreddits, keywords)
+    _search(subreddits, keywords)
+
+    queries = query_planner.plan_queries(subreddits, keywords)
+    pages = sum(math.ceil(query_planner.results_limit(query, 25) / fakes.LISTING_PAGE_SIZE) for query in queries)
+    assert len(queries) == 1
+    assert reddit.api_calls <= pages
+
+
+def test_mentions_list_every_matched_keyword(reddit):
+    # The two keywords of p2 land in different OR chunks; the post is found by the first
+    # query and must still list both
+    first, last = KEYWORDS[0], KEYWORDS[-1]
+    assert not any(first in query.keywords and last in query.keywords
+                   for query in query_planner.plan_queries(SUBREDDITS[:1], KEYWORDS))
+    reddit.submissions = [
+        fakes.FakeSubmission(id="p1", subreddit=SUBREDDITS[0], title=f"{KEYWORDS[3]} or {KEYWORDS[5]}?",
+                             created_utc=1_700_000_001),
+        fakes.FakeSubmission(id="p2", subreddit=SUBREDDITS[0], title=f"Moving from {first}",
+                             selftext=f"We also tried {last} and {KEYWORDS[10]}", created_utc=1_700_000_002),
+        fakes.FakeSubmission(id="p3", subreddit=SUBREDDITS[0], title=f"Only {KEYWORDS[7]}", created_utc=1_700_000_003),
+    ]
+    mentions = {post["id"]: post for post in _search(SUBREDDITS[:1], KEYWORDS)}
+
+    assert set(mentions["p1"]["keywords"]) == {KEYWORDS[3], KEYWORDS[5]}
+    assert set(mentions["p2"]["keywords"]) == {first, last, KEYWORDS[10]}
+    assert mentions["p3"]["keywords"] == [KEYWORDS[7]]
@@ -0,0 +1,42 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Import time of main.py in a fresh interpreter, which every worker pays at boot
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "2.0"))
+# Modules that must stay unloaded until first use
+DEFERRED_MODULES = ("praw", "supabase", "vaderSentiment", "textblob")
+
+_STARTUP_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import main, clients
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "seconds": elapsed,
+    "loaded": [name for name in %r if name in sys.modules],
+    "clients": [name for name in ("_reddit", "_supabase", "_async_supabase") if getattr(clients, name) is not None],
+}))
+"""
+
+
+def probe_startup():
+    """Import main in a fresh interpreter: {seconds, loaded deferred modules, clients built}"""
+    output = subprocess.run([sys.executable, "-c", _STARTUP_PROBE % (DEFERRED_MODULES,)], cwd=BACKEND_DIR,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_import_main_stays_within_budget():
+    # The median of a few runs keeps one slow interpreter start from failing the test
+    seconds = statistics.median(probe_startup()["seconds"] for _ in range(3))
+    assert seconds < STARTUP_BUDGET_SECONDS
+
+
+def test_import_main_defers_clients_and_heavy_modules():
+    sample = probe_startup()
+    assert sample["loaded"] == []
+    assert sample["clients"] == []
@@ -0,0 +1,186 @@
+import json
+import math
+import os
+import time
+
+# Try relative imports first (for local development), fall back to absolute (for Railway)
+try:
+    from . import mention_store
+    from .post_state import STATES
+except ImportError:
+    import mention_store
+    from post_state import STATES
+
+# Un-actioned mentions ranked for triage, kept up to date as posts are stored and as
+# their state changes, so GET /triage reads the top N off an index.
+#
+# Priority is (1 + opportunity_score + TRIAGE_VELOCITY_WEIGHT * velocity) halved every
+# TRIAGE_HALF_LIFE_HOURS of post age. Its log, `rank`, is log2(base) + created_utc /
+# half-life: the decay shifts every post by the same amount, so the order never goes
+# stale and rank only changes when a post is re-scored or re-polled.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS triage_queue (
+    id TEXT PRIMARY KEY,
+    subreddit TEXT,
+    created_utc REAL NOT NULL,
+    opportunity_score REAL NOT NULL,
+    upvotes INTEGER NOT NULL,
+    comments INTEGER NOT NULL,
+    polled_at REAL NOT NULL,
+    velocity REAL NOT NULL DEFAULT 0,
+    states INTEGER NOT NULL DEFAULT 0,
+    rank REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_triage_queue_rank ON triage_queue (states, rank DESC);
+"""
+
+mention_store.register_schema(SCHEMA)
+
+TRIAGE_HALF_LIFE_HOURS = float(os.getenv("TRIAGE_HALF_LIFE_HOURS", "12"))
+# Priority added per upvote or comment gained per hour
+TRIAGE_VELOCITY_WEIGHT = float(os.getenv("TRIAGE_VELOCITY_WEIGHT", "0.5"))
+# Polls closer together than this keep the previous velocity; tiny gaps make it noisy
+MIN_POLL_GAP_SECONDS = 60
+MAX_LIMIT = 200
+
+_STATE_BITS = {state: 1 << i for i, state in enumerate(STATES)}
+
+
+def _rank(created_utc, opportunity_score, velocity):
+    base = 1.0 + max(opportunity_score, 0.0) + TRIAGE_VELOCITY_WEIGHT * velocity
+    return math.log2(base) + created_utc / (TRIAGE_HALF_LIFE_HOURS * 3600)
+
+
+def priority(rank, now=None):
+    """Decayed priority at `now` from a stored rank"""
+    return 2 ** (rank - (now or time.time()) / (TRIAGE_HALF_LIFE_HOURS * 3600))
+
+
+def record(posts, polled=True):
+    """
+    Queue or re-rank stored mentions. `polled` means upvotes/comments were just read
+    from Reddit, so the gain since the previous poll updates the velocity; a rescore
+    passes False. Near-duplicates are triaged through their canonical post.
+    """
+    posts = [post for post in posts if post.get("created_utc") is not None and "duplicate_of" not in post]
+    if not posts:
+        return
+    now = time.time()
+    with mention_store.connect() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        queued = {}
+        ids = [post["id"] for post in posts]
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            rows = conn.execute(
+                f"SELECT id, upvotes, comments, polled_at, velocity FROM triage_queue WHERE id IN ({','.join('?' * len(chunk))})",
+                chunk,
+            ).fetchall()
+            queued.update((row["id"], row) for row in rows)
+
+        values = []
+        for post in posts:
+            upvotes, comments = post.get("upvotes") or 0, post.get("comments") or 0
+            previous = queued.get(post["id"])
+            velocity, polled_at = 0.0, now
+            if previous is not None:
+                velocity, polled_at = previous["velocity"], previous["polled_at"]
+                if polled and now - previous["polled_at"] >= MIN_POLL_GAP_SECONDS:
+                    gained = max(upvotes - previous["upvotes"], 0) + max(comments - previous["comments"], 0)
+                    velocity, polled_at = gained * 3600 / (now - previous["polled_at"]), now
+                else:
+                    # Keep the baseline of the last counted poll
+                    upvotes, comments = previous["upvotes"], previous["comments"]
+            score = post.get("opportunity_score") or 0.0
+            values.append((post["id"], post.get("subreddit"), post["created_utc"], score, upvotes, comments,
+                           polled_at, velocity, _rank(post["created_utc"], score, velocity)))
+        conn.executemany(
+            """
+            INSERT INTO triage_queue (id, subreddit, created_utc, opportunity_score, upvotes, comments,
+                                      polled_at, velocity, rank)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                subreddit = excluded.subreddit,
+                created_utc = excluded.created_utc,
+                opportunity_score = excluded.opportunity_score,
+                upvotes = excluded.upvotes,
+                comments = excluded.comments,
+                polled_at = excluded.polled_at,
+                velocity = excluded.velocity,
+                rank = excluded.rank
+            """,
+            values,
+        )
+
+
+def backfill_from_store():
+    """One-time queueing of the mentions that were stored before the queue existed"""
+    if mention_store.get_meta("triage_backfilled"):
+        return
+    record(mention_store.load_mentions(), polled=False)
+    mention_store.set_meta("triage_backfilled", str(time.time()))
+
+
+def apply_state_changes(changes):
+    """Take flagged, engaged or ignored posts out of the queue and put cleared ones back"""
+    with mention_store.connect() as conn:
+        conn.executemany(
+            "UPDATE triage_queue SET states = CASE WHEN ? THEN states | ? ELSE states & ~? END WHERE id = ?",
+            [(change["active"], _STATE_BITS[change["state"]], _STATE_BITS[change["state"]], change["id"])
+             for change in changes],
+        )
+
+
+def sync_states(rows):
+    """
+    Match the queue to the full set of active post_state rows. The ingestion run calls
+    this so states changed outside the API, or before a post was queued, catch up.
+    """
+    masks = {}
+    for row in rows or []:
+        if row["state"] in _STATE_BITS:
+            masks[row["post_id"]] = masks.get(row["post_id"], 0) | _STATE_BITS[row["state"]]
+    with mention_store.connect() as conn:
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS triage_states (id TEXT PRIMARY KEY, states INTEGER NOT NULL)")
+        conn.execute("DELETE FROM triage_states")
+        conn.executemany("INSERT INTO triage_states (id, states) VALUES (?, ?)", masks.items())
+        conn.execute(
+            """
+            UPDATE triage_queue
+            SET states = COALESCE((SELECT states FROM triage_states WHERE triage_states.id = triage_queue.id), 0)
+            WHERE states != COALESCE((SELECT states FROM triage_states WHERE triage_states.id = triage_queue.id), 0)
+            """
+        )
+
+
+def prune():
+    """Drop queue entries whose post was pruned from the store"""
+    with mention_store.connect() as conn:
+        conn.execute("DELETE FROM triage_queue WHERE id NOT IN (SELECT id FROM posts)")
+
+
+def top(subreddits, limit=50):
+    """
+    The `limit` highest-priority un-actioned mentions in the monitored subreddits. Walks
+    the rank index from the top, so the cost follows `limit`, not the queue size.
+    """
+    limit = max(1, min(limit, MAX_LIMIT))
+    names = [f"r/{name}".lower() for name in subreddits]
+    now = time.time()
+    with mention_store.connect() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT triage_queue.rank, triage_queue.velocity, posts.data
+            FROM triage_queue JOIN posts ON posts.id = triage_queue.id
+            WHERE triage_queue.states = 0 AND lower(triage_queue.subreddit) IN ({','.join('?' * len(names))})
+            ORDER BY triage_queue.rank DESC
+            LIMIT ?
+            """,
+            names + [limit],
+        ).fetchall()
+    posts = []
+    for row in rows:
+        post = json.loads(row["data"])
+        post["triage"] = {"priority": round(priority(row["rank"], now), 4), "velocity": round(row["velocity"], 2)}
+        posts.append(post)
+    return posts
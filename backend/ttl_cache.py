@@ -0,0 +1,90 @@
+import functools
+import threading
+import time
+
+# Try relative imports first (for local development), fall back to absolute (for Railway)
+try:
+    from . import mention_store
+except ImportError:
+    import mention_store
+
+# One version counter per cache name, shared by every worker process through the local
+# store. Bumping it invalidates that cache everywhere on the next call.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+mention_store.register_schema(SCHEMA)
+
+
+def version(name):
+    """Current shared version of a cache"""
+    with mention_store.connect() as conn:
+        row = conn.execute("SELECT version FROM cache_versions WHERE name = ?", (name,)).fetchone()
+    return row["version"] if row else 0
+
+
+def invalidate(name):
+    """Bump a cache's version so every worker drops its entries"""
+    with mention_store.connect() as conn:
+        conn.execute(
+            """
+            INSERT INTO cache_versions (name, version) VALUES (?, 1)
+            ON CONFLICT(name) DO UPDATE SET version = cache_versions.version + 1
+            """,
+            (name,),
+        )
+
+
+def invalidate_all():
+    for name in list(_registry):
+        invalidate(name)
+
+
+_registry = {}
+# Per-process hit/miss counters of each cache
+_counters = {}
+
+
+def ttl_cache(name, ttl_seconds):
+    """
+    Cache a function's results per arguments for `ttl_seconds`. Entries are keyed by the
+    cache's shared version, so invalidate(name) from any worker takes effect everywhere.
+    The wrapper keeps lru_cache's cache_clear() for callers that use it.
+    """
+    def decorator(func):
+        entries = {}
+        lock = threading.Lock()
+        counters = _counters.setdefault(name, {"hits": 0, "misses": 0})
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            key = (version(name), args)
+            now = time.monotonic()
+            with lock:
+                entry = entries.get(key)
+                if entry is not None and entry[0] > now:
+                    counters["hits"] += 1
+                    return entry[1]
+                counters["misses"] += 1
+            value = func(*args)
+            with lock:
+                # Entries from older versions can never be hit again
+                for stale in [k for k in entries if k[0] != key[0]]:
+                    del entries[stale]
+                entries[key] = (now + ttl_seconds, value)
+            return value
+
+        wrapper.cache_clear = lambda: invalidate(name)
+        _registry[name] = wrapper
+        return wrapper
+
+    return decorator
+
+
+def stats():
+    """Hit/miss counters of every cache in this worker process"""
+    return {name: dict(counters) for name, counters in _counters.items()}
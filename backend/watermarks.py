@@ -0,0 +1,59 @@
+import time
+
+# Try relative imports first (for local development), fall back to absolute (for Railway)
+try:
+    from . import mention_store
+except ImportError:
+    import mention_store
+
+# Newest post already processed for each (subreddit, keyword) pair
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS watermarks (
+    subreddit TEXT NOT NULL,
+    keyword TEXT NOT NULL,
+    created_utc REAL NOT NULL,
+    fullname TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (subreddit, keyword)
+);
+"""
+
+mention_store.register_schema(SCHEMA)
+
+
+def load(subreddits, keywords):
+    """Return {(subreddit, keyword): (created_utc, fullname)} for the pairs that have a mark, keys lowercased"""
+    wanted_subreddits = {name.lower() for name in subreddits}
+    wanted_keywords = {keyword.lower() for keyword in keywords}
+    with mention_store.connect() as conn:
+        rows = conn.execute("SELECT subreddit, keyword, created_utc, fullname FROM watermarks").fetchall()
+    return {
+        (row["subreddit"], row["keyword"]): (row["created_utc"], row["fullname"])
+        for row in rows
+        if row["subreddit"] in wanted_subreddits and row["keyword"] in wanted_keywords
+    }
+
+
+def save(marks):
+    """Persist marks, never moving an existing mark backwards"""
+    now = time.time()
+    with mention_store.connect() as conn:
+        conn.executemany(
+            """
+            INSERT INTO watermarks (subreddit, keyword, created_utc, fullname, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(subreddit, keyword) DO UPDATE SET
+                created_utc = excluded.created_utc,
+                fullname = excluded.fullname,
+                updated_at = excluded.updated_at
+            WHERE excluded.created_utc > watermarks.created_utc
+            """,
+            [(subreddit, keyword, created_utc, fullname, now)
+             for (subreddit, keyword), (created_utc, fullname) in marks.items()],
+        )
+
+
+def reset():
+    """Forget all marks so the next poll rescans the newest posts"""
+    with mention_store.connect() as conn:
+        conn.execute("DELETE FROM watermarks")